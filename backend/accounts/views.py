@@ -4,7 +4,7 @@ from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from .serializers import UserRegistrationSerializer
 from django.conf import settings
-import requests
+from api import outbound
 import jwt
 from datetime import datetime, timedelta
 import json
@@ -60,7 +60,6 @@ class GoogleAuthView(APIView):
                               status=status.HTTP_400_BAD_REQUEST)
 
             # 使用授權碼換取TOKEN
-            token_url = 'https://oauth2.googleapis.com/token'
             token_data = {
                 'code': code,
                 'client_id': settings.SOCIAL_AUTH_GOOGLE_OAUTH2_KEY,
@@ -69,7 +68,7 @@ class GoogleAuthView(APIView):
                 'grant_type': 'authorization_code'
             }
 
-            token_response = requests.post(token_url, data=token_data)
+            token_response = outbound.post('oauth2.googleapis.com', '/token', data=token_data)
             if not token_response.ok:
                 return Response({'error': '無法獲取訪問TOKEN'}, 
                               status=status.HTTP_400_BAD_REQUEST)
@@ -78,9 +77,9 @@ class GoogleAuthView(APIView):
             access_token = token_data.get('access_token')
 
             # 使用TOKEN獲取用戶資料
-            userinfo_url = 'https://www.googleapis.com/oauth2/v3/userinfo'
-            userinfo_response = requests.get(
-                userinfo_url,
+            userinfo_response = outbound.get(
+                'www.googleapis.com',
+                '/oauth2/v3/userinfo',
                 headers={'Authorization': f'Bearer {access_token}'}
             )
 
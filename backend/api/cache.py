@@ -0,0 +1,244 @@
+"""
+外部 API 查詢結果的共用快取
+
+資料存放在 Redis，所有 gunicorn worker 共用同一份快取。
+每個命名空間另外維護一個以最後存取時間排序的 sorted set，
+項目數超過上限時淘汰最久未使用的資料（LRU），並記錄命中/未命中次數。
+設定 stale_ttl 時，過期的資料會再保留一段時間，上游故障時仍可回傳舊資料。
+Redis 無法連線時快取會自動失效，請求直接打到上游。
+"""
+import hashlib
+import json
+import logging
+import time
+
+import redis
+from django.conf import settings
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# 前端可帶上 X-Cache-Bypass: 1 強制重新查詢（結果仍會寫回快取）
+BYPASS_HEADER = 'HTTP_X_CACHE_BYPASS'
+
+
+def wants_bypass(request):
+    """請求是否要求略過快取"""
+    return request.META.get(BYPASS_HEADER, '').strip().lower() in ('1', 'true', 'yes')
+
+
+class ResultCache:
+    """以 Redis 為後端、具 TTL 與 LRU 淘汰的結果快取"""
+
+    def __init__(self, namespace, ttl, max_entries, stale_ttl=0):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+
+    @property
+    def index_key(self):
+        return f'{self.namespace}:lru'
+
+    @property
+    def stats_key(self):
+        return f'{self.namespace}:stats'
+
+    def data_key(self, key):
+        return f'{self.namespace}:data:{key}'
+
+    def make_key(self, *parts):
+        """將查詢參數組合成固定長度的快取鍵"""
+        raw = '|'.join('' if part is None else str(part) for part in parts)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _parse(self, raw):
+        """解析快取內容，沒有資料或格式不符（例如舊版本寫入的資料）時回傳 None"""
+        if raw is None:
+            return None
+        try:
+            entry = json.loads(raw)
+            return {'value': entry['value'], 'expires_at': float(entry['expires_at'])}
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def _decode(self, entry, allow_stale):
+        if entry is None or (not allow_stale and entry['expires_at'] < time.time()):
+            return None
+        return entry['value']
+
+    def _discard(self, pipe, key):
+        pipe.delete(self.data_key(key))
+        pipe.zrem(self.index_key, key)
+
+    def _encode(self, value, ttl, now):
+        return json.dumps({'value': value, 'expires_at': now + ttl})
+
+    def get(self, key, allow_stale=False):
+        """讀取快取，未命中時回傳 None；allow_stale 時可讀到已過期的資料"""
+        try:
+            client = get_redis()
+            raw = client.get(self.data_key(key))
+            entry = self._parse(raw)
+            value = self._decode(entry, allow_stale)
+            pipe = client.pipeline(transaction=False)
+            if raw is not None and entry is None:
+                # 無法解析的資料視為未命中並刪除
+                self._discard(pipe, key)
+            if value is None:
+                pipe.hincrby(self.stats_key, 'misses', 1)
+            else:
+                pipe.zadd(self.index_key, {key: time.time()})
+                pipe.hincrby(self.stats_key, 'stale_hits' if allow_stale else 'hits', 1)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"讀取快取 {self.namespace} 失敗: {str(e)}")
+            return None
+        return value
+
+    def lookup(self, key):
+        """讀取快取並回傳 (value, 是否未過期)，沒有資料時回傳 (None, False)"""
+        try:
+            client = get_redis()
+            raw = client.get(self.data_key(key))
+            entry = self._parse(raw)
+            fresh = entry is not None and entry['expires_at'] >= time.time()
+            pipe = client.pipeline(transaction=False)
+            if raw is not None and entry is None:
+                self._discard(pipe, key)
+            if entry is None:
+                pipe.hincrby(self.stats_key, 'misses', 1)
+            else:
+                pipe.zadd(self.index_key, {key: time.time()})
+                pipe.hincrby(self.stats_key, 'hits' if fresh else 'stale_hits', 1)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"讀取快取 {self.namespace} 失敗: {str(e)}")
+            return None, False
+        return (entry['value'] if entry is not None else None), fresh
+
+    def exists(self, key):
+        """是否有未過期的資料（不計入命中統計，也不更新 LRU 順序）"""
+        try:
+            return self._decode(self._parse(get_redis().get(self.data_key(key))), allow_stale=False) is not None
+        except redis.RedisError:
+            return False
+
+    def set(self, key, value, ttl=None):
+        """寫入快取，必要時淘汰最久未使用的項目"""
+        ttl = ttl or self.ttl
+        now = time.time()
+        try:
+            client = get_redis()
+            pipe = client.pipeline(transaction=False)
+            pipe.set(self.data_key(key), self._encode(value, ttl, now), ex=ttl + self.stale_ttl)
+            pipe.zadd(self.index_key, {key: now})
+            # 已過期的資料不再佔用索引
+            pipe.zremrangebyscore(self.index_key, 0, now - self.ttl - self.stale_ttl)
+            pipe.zcard(self.index_key)
+            size = pipe.execute()[-1]
+            if size > self.max_entries:
+                self._evict(client, size - self.max_entries)
+        except redis.RedisError as e:
+            logger.warning(f"寫入快取 {self.namespace} 失敗: {str(e)}")
+
+    def get_many(self, keys):
+        """批次讀取快取，只回傳命中的項目"""
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            client = get_redis()
+            values = client.mget([self.data_key(key) for key in keys])
+            found = {}
+            pipe = client.pipeline(transaction=False)
+            for key, raw in zip(keys, values):
+                entry = self._parse(raw)
+                if raw is not None and entry is None:
+                    self._discard(pipe, key)
+                value = self._decode(entry, allow_stale=False)
+                if value is not None:
+                    found[key] = value
+            if found:
+                now = time.time()
+                pipe.zadd(self.index_key, {key: now for key in found})
+                pipe.hincrby(self.stats_key, 'hits', len(found))
+            if len(found) < len(keys):
+                pipe.hincrby(self.stats_key, 'misses', len(keys) - len(found))
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"批次讀取快取 {self.namespace} 失敗: {str(e)}")
+            return {}
+        return found
+
+    def set_many(self, mapping, ttl=None):
+        """批次寫入快取（同一批使用相同 TTL）"""
+        if not mapping:
+            return
+        ttl = ttl or self.ttl
+        now = time.time()
+        try:
+            client = get_redis()
+            pipe = client.pipeline(transaction=False)
+            for key, value in mapping.items():
+                pipe.set(self.data_key(key), self._encode(value, ttl, now), ex=ttl + self.stale_ttl)
+            pipe.zadd(self.index_key, {key: now for key in mapping})
+            pipe.zremrangebyscore(self.index_key, 0, now - self.ttl - self.stale_ttl)
+            pipe.zcard(self.index_key)
+            size = pipe.execute()[-1]
+            if size > self.max_entries:
+                self._evict(client, size - self.max_entries)
+        except redis.RedisError as e:
+            logger.warning(f"批次寫入快取 {self.namespace} 失敗: {str(e)}")
+
+    def delete(self, key):
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            self._discard(pipe, key)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"刪除快取 {self.namespace} 失敗: {str(e)}")
+
+    def _evict(self, client, count):
+        evicted = client.zpopmin(self.index_key, count)
+        if evicted:
+            client.delete(*(self.data_key(key) for key, _ in evicted))
+            logger.info(f"快取 {self.namespace} 淘汰 {len(evicted)} 筆資料")
+
+    def stats(self):
+        """回傳命中/未命中次數與目前項目數"""
+        try:
+            client = get_redis()
+            pipe = client.pipeline(transaction=False)
+            pipe.hgetall(self.stats_key)
+            pipe.zcard(self.index_key)
+            counters, entries = pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"讀取快取統計 {self.namespace} 失敗: {str(e)}")
+            return {'available': False}
+        hits = int(counters.get('hits', 0))
+        misses = int(counters.get('misses', 0))
+        total = hits + misses
+        return {
+            'available': True,
+            'hits': hits,
+            'misses': misses,
+            'stale_hits': int(counters.get('stale_hits', 0)),
+            'hit_rate': round(hits / total, 3) if total else None,
+            'entries': entries,
+        }
+
+
+spotify_search_cache = ResultCache(
+    'spotify:search',
+    ttl=settings.SPOTIFY_SEARCH_CACHE_TTL,
+    max_entries=settings.SPOTIFY_SEARCH_CACHE_MAX_ENTRIES,
+    stale_ttl=settings.SPOTIFY_SEARCH_CACHE_STALE_TTL,
+)
+
+spotify_preview_cache = ResultCache(
+    'spotify:preview',
+    ttl=settings.SPOTIFY_PREVIEW_CACHE_TTL,
+    max_entries=settings.SPOTIFY_PREVIEW_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,168 @@
+"""
+本地歌曲資料（Track catalog）
+
+顯示播放列表時只從資料庫讀取歌曲資料，不在請求中呼叫 Spotify。
+缺少或過舊的資料由 hydrator 在背景補齊，每 50 首呼叫一次 Spotify /v1/tracks。
+背景工作在固定大小的執行緒池中執行；每首歌曲以 cache.add 取得補齊的權利，
+同時瀏覽同一個播放列表的請求（包含其他 worker）不會重複補齊相同的歌曲。
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .models import PlaylistTrack, Track
+from .ratelimit import BACKGROUND, spotify_priority
+
+logger = logging.getLogger(__name__)
+
+# Spotify /v1/tracks 每次最多 50 個 ID
+TRACKS_BATCH_SIZE = 50
+
+HYDRATE_CLAIM_KEY = 'tracks:hydrating:{track_id}'
+HYDRATE_CLAIM_TIMEOUT = 60  # 秒
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='track-hydrator')
+
+TRACK_UPDATE_FIELDS = [
+    'name', 'artists', 'album_id', 'album_name', 'image_url',
+    'duration_ms', 'preview_url', 'external_url', 'fetched_at',
+]
+
+
+def track_from_spotify(data, fetched_at=None):
+    """將 Spotify 的 track 物件轉為 Track"""
+    album = data.get('album') or {}
+    images = album.get('images') or []
+    return Track(
+        spotify_id=data['id'],
+        name=data['name'],
+        artists=[{'id': artist.get('id'), 'name': artist.get('name')} for artist in data.get('artists', [])],
+        album_id=album.get('id') or '',
+        album_name=album.get('name') or '',
+        image_url=images[0]['url'] if images else None,
+        duration_ms=data.get('duration_ms') or 0,
+        preview_url=data.get('preview_url'),
+        external_url=(data.get('external_urls') or {}).get('spotify'),
+        fetched_at=fetched_at or timezone.now(),
+    )
+
+
+def save_tracks(tracks_data):
+    """將 Spotify 回傳的 track 物件寫入（或更新）本地資料"""
+    now = timezone.now()
+    tracks = [track_from_spotify(data, now) for data in tracks_data if data and data.get('id')]
+    if tracks:
+        Track.objects.bulk_create(
+            tracks,
+            update_conflicts=True,
+            unique_fields=['spotify_id'],
+            update_fields=TRACK_UPDATE_FIELDS,
+        )
+    return len(tracks)
+
+
+def playlist_catalog_updated_at():
+    """
+    播放列表曲目在本地歌曲資料中最後寫入的時間（Playlist 查詢用的子查詢）
+
+    背景補齊歌曲資料不會更新播放列表的 updated_at，ETag 需另外計入這個時間。
+    """
+    track_ids = PlaylistTrack.objects.filter(playlist=OuterRef(OuterRef('pk'))).values('track_id')
+    return Subquery(
+        Track.objects.filter(spotify_id__in=track_ids).order_by('-fetched_at').values('fetched_at')[:1]
+    )
+
+
+def stale_track_ids(track_ids, max_age=None):
+    """找出本地沒有或超過 max_age 的歌曲"""
+    max_age = max_age if max_age is not None else settings.TRACK_CATALOG_MAX_AGE
+    fresh = set(
+        Track.objects.filter(
+            spotify_id__in=track_ids,
+            fetched_at__gte=timezone.now() - timedelta(seconds=max_age),
+        ).values_list('spotify_id', flat=True)
+    )
+    return [track_id for track_id in dict.fromkeys(track_ids) if track_id not in fresh]
+
+
+def hydrate_tracks(get_client, track_ids, max_age=None):
+    """補齊缺少或過舊的歌曲資料，回傳更新的筆數"""
+    missing = stale_track_ids(track_ids, max_age)
+    if not missing:
+        return 0
+
+    client = get_client()
+    if not client:
+        logger.warning("Spotify 客戶端無法使用，略過歌曲資料補齊")
+        return 0
+
+    saved = 0
+    for start in range(0, len(missing), TRACKS_BATCH_SIZE):
+        batch = missing[start:start + TRACKS_BATCH_SIZE]
+        results = client.tracks(batch).get('tracks') or []
+        saved += save_tracks(results)
+    logger.info(f"已補齊 {saved}/{len(missing)} 首歌曲資料")
+    return saved
+
+
+def claim_track_ids(track_ids):
+    """取得補齊這些歌曲的權利，回傳成功取得的 ID（其他請求正在補齊的歌曲會被略過）"""
+    claimed = []
+    for track_id in track_ids:
+        try:
+            if cache.add(HYDRATE_CLAIM_KEY.format(track_id=track_id), 1, timeout=HYDRATE_CLAIM_TIMEOUT):
+                claimed.append(track_id)
+        except Exception as e:
+            logger.warning(f"取得歌曲補齊鎖失敗: {str(e)}")
+            release_track_ids(claimed)
+            return []
+    return claimed
+
+
+def release_track_ids(track_ids):
+    try:
+        cache.delete_many([HYDRATE_CLAIM_KEY.format(track_id=track_id) for track_id in track_ids])
+    except Exception:
+        pass  # 鎖本身有逾時
+
+
+def schedule_hydration(get_client, track_ids):
+    """在背景補齊歌曲資料，不阻塞目前的請求；回傳排入背景工作的歌曲數"""
+    track_ids = claim_track_ids(list(dict.fromkeys(track_ids)))
+    if not track_ids:
+        return 0
+
+    def run():
+        try:
+            with spotify_priority(BACKGROUND):
+                hydrate_tracks(get_client, track_ids)
+        except Exception as e:
+            logger.error(f"背景補齊歌曲資料失敗: {str(e)}")
+        finally:
+            release_track_ids(track_ids)
+            connection.close()
+
+    _executor.submit(run)
+    return len(track_ids)
+
+
+def load_track_catalog(track_ids, get_client=None):
+    """
+    以一次查詢取得歌曲資料 {spotify_id: Track}
+
+    有傳入 get_client 時，缺少的歌曲會在背景補齊，下次請求即可取得。
+    """
+    track_ids = list(dict.fromkeys(track_ids))
+    if not track_ids:
+        return {}
+    catalog = Track.objects.in_bulk(track_ids)
+    missing = [track_id for track_id in track_ids if track_id not in catalog]
+    if missing and get_client is not None:
+        schedule_hydration(get_client, missing)
+    return catalog
@@ -0,0 +1,153 @@
+"""
+外部服務斷路器
+
+每個上游服務（Spotify、TMDB）一個斷路器，狀態存放在 Redis，所有 worker 共用：
+- closed：正常呼叫，視窗內失敗次數達門檻即開啟
+- open：直接拒絕呼叫（拋出 CircuitOpen），不再讓 worker 等待逾時
+- half-open：開啟一段時間後只放行一個試探請求，成功即關閉，失敗則重新開啟
+Redis 無法使用時斷路器不介入，所有呼叫照常進行。
+"""
+import logging
+import time
+
+import redis
+import requests
+from django.conf import settings
+from spotipy.exceptions import SpotifyException
+
+from .exceptions import CircuitOpen
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def is_upstream_failure(exc):
+    """只有連線錯誤、逾時、5xx 與 429 才算上游故障，4xx 是請求本身的問題"""
+    if isinstance(exc, SpotifyException):
+        return exc.http_status is None or exc.http_status >= 500 or exc.http_status == 429
+    if isinstance(exc, requests.RequestException):
+        response = exc.response
+        return response is None or response.status_code >= 500 or response.status_code == 429
+    return False
+
+
+def is_client_error(exc):
+    """上游有回應但拒絕這個請求（429 以外的 4xx），代表上游本身正常"""
+    if isinstance(exc, SpotifyException):
+        status_code = exc.http_status
+    elif isinstance(exc, requests.RequestException) and exc.response is not None:
+        status_code = exc.response.status_code
+    else:
+        return False
+    return status_code is not None and 400 <= status_code < 500 and status_code != 429
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold, failure_window, recovery_timeout):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.failure_window = failure_window
+        self.recovery_timeout = recovery_timeout
+        self.key = f'circuit:{name}'
+        self.probe_key = f'circuit:{name}:probe'
+
+    def _state_from(self, data):
+        opened_at = data.get('opened_at')
+        if not opened_at:
+            return CLOSED
+        if time.time() - float(opened_at) < self.recovery_timeout:
+            return OPEN
+        return HALF_OPEN
+
+    def before_call(self):
+        """
+        呼叫上游前檢查斷路器，不允許時拋出 CircuitOpen
+
+        回傳目前是否有需要在成功後清除的失敗紀錄。
+        """
+        try:
+            client = get_redis()
+            data = client.hgetall(self.key)
+            state = self._state_from(data)
+            if state == HALF_OPEN:
+                # 只有一個 worker 能取得試探機會
+                if not client.set(self.probe_key, 1, nx=True, ex=self.recovery_timeout):
+                    state = OPEN
+        except redis.RedisError as e:
+            logger.warning(f"讀取 {self.name} 斷路器狀態失敗: {str(e)}")
+            return False
+        if state == OPEN:
+            raise CircuitOpen(self.name)
+        return bool(data)
+
+    def record_success(self):
+        try:
+            get_redis().delete(self.key, self.probe_key)
+        except redis.RedisError:
+            pass
+
+    def record_failure(self):
+        try:
+            client = get_redis()
+            data = client.hgetall(self.key)
+            pipe = client.pipeline(transaction=False)
+            if self._state_from(data) == HALF_OPEN:
+                failures = self.failure_threshold
+            else:
+                failures = int(data.get('failures', 0)) + 1
+                pipe.hincrby(self.key, 'failures', 1)
+                pipe.expire(self.key, self.failure_window)
+            if failures >= self.failure_threshold:
+                pipe.hset(self.key, mapping={'opened_at': time.time(), 'failures': failures})
+                pipe.expire(self.key, self.recovery_timeout + self.failure_window)
+                pipe.delete(self.probe_key)
+                logger.error(f"{self.name} 斷路器開啟，{self.recovery_timeout} 秒內不再呼叫")
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"更新 {self.name} 斷路器狀態失敗: {str(e)}")
+
+    def call(self, func, *args, **kwargs):
+        """透過斷路器呼叫上游"""
+        dirty = self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if is_upstream_failure(e):
+                self.record_failure()
+            elif dirty and is_client_error(e):
+                # 與 TmdbClient 相同，4xx 視為上游正常，試探請求也因此結束
+                self.record_success()
+            raise
+        if dirty:
+            self.record_success()
+        return result
+
+    def status(self):
+        """提供健康檢查使用的狀態"""
+        try:
+            data = get_redis().hgetall(self.key)
+        except redis.RedisError:
+            return {'state': 'unknown'}
+        opened_at = data.get('opened_at')
+        return {
+            'state': self._state_from(data),
+            'failures': int(data.get('failures', 0)),
+            'opened_at': float(opened_at) if opened_at else None,
+        }
+
+
+def _breaker(name):
+    return CircuitBreaker(
+        name,
+        failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+        failure_window=settings.CIRCUIT_BREAKER_FAILURE_WINDOW,
+        recovery_timeout=settings.CIRCUIT_BREAKER_RECOVERY_TIMEOUT,
+    )
+
+
+spotify_breaker = _breaker('spotify')
+tmdb_breaker = _breaker('tmdb')
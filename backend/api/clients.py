@@ -0,0 +1,239 @@
+"""
+Spotify / TMDB 客戶端
+
+客戶端在第一次使用時才建立，匯入模組時不會有任何網路連線，
+worker 啟動、manage.py 指令與測試都不必等待外部服務。
+需要時可呼叫 warm() 預先建立並測試連線（例如 gunicorn worker 啟動後）。
+"""
+import json
+import logging
+import threading
+import time
+from urllib.parse import urlencode
+
+import requests
+import spotipy
+from django.conf import settings
+
+from .circuit import spotify_breaker, tmdb_breaker
+from .coalesce import coalesce
+from .outbound import session_for
+from .ratelimit import BACKGROUND, current_priority, spotify_priority, spotify_scheduler
+from .spotify_auth import SharedClientCredentials, SharedTokenCacheHandler
+from .tmdb_cache import conditional_headers, schedule_revalidation, tmdb_http_cache, ttl_for
+
+logger = logging.getLogger(__name__)
+
+
+class LazyClient:
+    """執行緒安全、第一次使用時才建立的客戶端"""
+
+    def __init__(self, name, factory, probe=None, retry_cooldown=5):
+        self.name = name
+        self.retry_cooldown = retry_cooldown  # 建立失敗後的冷卻時間（秒）
+        self._factory = factory
+        self._probe = probe
+        self._client = None
+        self._last_failure = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """取得客戶端，無法建立時回傳 None"""
+        client = self._client
+        if client is not None:
+            return client
+
+        with self._lock:
+            if self._client is not None:
+                return self._client
+            if time.monotonic() - self._last_failure < self.retry_cooldown:
+                return None
+            try:
+                self._client = self._factory()
+            except Exception as e:
+                logger.error(f"初始化 {self.name} 客戶端失敗: {str(e)}")
+            if self._client is None:
+                self._last_failure = time.monotonic()
+            else:
+                logger.info(f"{self.name} 客戶端初始化成功")
+            return self._client
+
+    def warm(self):
+        """預先建立客戶端並測試連線"""
+        client = self.get()
+        if client is None:
+            return False
+        if self._probe:
+            try:
+                self._probe(client)
+            except Exception as e:
+                logger.warning(f"{self.name} 連線測試失敗: {str(e)}")
+                return False
+        return True
+
+    def reset(self):
+        """丟棄目前的客戶端，下次使用時重新建立"""
+        with self._lock:
+            self._client = None
+            self._last_failure = 0.0
+
+
+class GuardedSpotify(spotipy.Spotify):
+    """
+    所有 Spotify API 呼叫都經過斷路器與全域流量控制，相同的 GET 請求會合併為一次
+
+    429 不在 HTTP 層重試（否則會在請求中 sleep Retry-After 秒），
+    改由流量控制暫停所有 worker。
+    """
+
+    def _internal_call(self, method, url, payload, params):
+        call = super()._internal_call
+
+        def guarded():
+            return spotify_breaker.call(
+                spotify_scheduler.call, url, call, method, url, payload, params
+            )
+
+        if method != 'GET':
+            return guarded()
+        # 依優先權分開合併：使用者的請求不會排在被限流的背景工作後面等待
+        key = f'spotify:{current_priority()}:{url}?{urlencode(sorted((params or {}).items()))}'
+        return coalesce(key, guarded)
+
+
+class TmdbClient:
+    """TMDB API 客戶端，重複使用同一個 HTTP 連線，經過斷路器與 HTTP 快取"""
+
+    BASE_URL = 'https://api.themoviedb.org/3'
+
+    def __init__(self, api_key, timeout=None):
+        self.api_key = api_key
+        self.timeout = timeout  # None 時使用 outbound 的預設逾時
+        self.session = session_for('api.themoviedb.org')
+
+    def get(self, path, params=None, timeout=None, headers=None):
+        dirty = tmdb_breaker.before_call()
+        try:
+            response = self.session.get(
+                f'{self.BASE_URL}{path}',
+                params={'api_key': self.api_key, **(params or {})},
+                headers=headers,
+                timeout=timeout or self.timeout
+            )
+        except requests.RequestException:
+            tmdb_breaker.record_failure()
+            raise
+        if response.status_code >= 500 or response.status_code == 429:
+            tmdb_breaker.record_failure()
+        elif dirty:
+            tmdb_breaker.record_success()
+        return response
+
+    def fetch(self, path, params=None, timeout=None):
+        """
+        取得 TMDB 資料（經過 HTTP 快取）
+
+        已過期的資料會先回傳，並在背景重新驗證；沒有快取時才同步呼叫 TMDB，
+        同時間相同的請求只會呼叫一次。從快取取得的回應 from_cache 為 True。
+        """
+        key = f'tmdb:{path}?{urlencode(sorted((params or {}).items()))}'
+        cache_key = tmdb_http_cache.make_key(key)
+        cached, fresh = tmdb_http_cache.lookup(cache_key)
+        if cached is None:
+            result = coalesce(key, lambda: self._fetch(path, params, timeout, cache_key))
+            return TmdbResponse(result['status_code'], result['body'])
+        if not fresh:
+            schedule_revalidation(
+                cache_key,
+                lambda: coalesce(key, lambda: self._fetch(path, params, timeout, cache_key, cached))
+            )
+        return TmdbResponse(cached['status_code'], cached['body'], from_cache=True)
+
+    def _fetch(self, path, params, timeout, cache_key, cached=None):
+        response = self.get(path, params, timeout, headers=conditional_headers(cached))
+        if response.status_code == 304 and cached:
+            result = cached
+        elif response.status_code == 200:
+            result = {
+                'status_code': 200,
+                'body': response.json(),
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+            }
+        else:
+            return {'status_code': response.status_code, 'body': response.text}
+        tmdb_http_cache.set(cache_key, result, ttl=ttl_for(path))
+        return result
+
+
+class TmdbResponse:
+    """可在 worker 之間共用的 TMDB 回應，只保留狀態碼與內容"""
+
+    def __init__(self, status_code, body, from_cache=False):
+        self.status_code = status_code
+        self.body = body
+        self.from_cache = from_cache
+
+    def json(self):
+        return self.body
+
+    @property
+    def text(self):
+        return self.body if isinstance(self.body, str) else json.dumps(self.body)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"TMDB API 錯誤: {self.status_code}")
+
+
+def _create_spotify():
+    if not settings.SPOTIFY_CLIENT_ID or not settings.SPOTIFY_CLIENT_SECRET:
+        logger.error("缺少 SPOTIFY_CLIENT_ID 或 SPOTIFY_CLIENT_SECRET")
+        return None
+    # access token 在第一次呼叫 API 時才取得，並與其他 worker 共用
+    # 連線池、逾時與重試由 outbound 的共用 Session 處理
+    return GuardedSpotify(
+        client_credentials_manager=SharedClientCredentials(
+            client_id=settings.SPOTIFY_CLIENT_ID,
+            client_secret=settings.SPOTIFY_CLIENT_SECRET,
+            cache_handler=SharedTokenCacheHandler(settings.SPOTIFY_CLIENT_ID),
+            requests_session=session_for('accounts.spotify.com'),
+            requests_timeout=None
+        ),
+        requests_session=session_for('api.spotify.com'),
+        requests_timeout=None
+    )
+
+
+def _probe_spotify(client):
+    client.search(q='test', limit=1, type='track')
+
+
+def _create_tmdb():
+    if not settings.TMDB_API_KEY:
+        logger.error("缺少 TMDB_API_KEY")
+        return None
+    return TmdbClient(settings.TMDB_API_KEY)
+
+
+def _probe_tmdb(client):
+    client.get('/configuration').raise_for_status()
+
+
+spotify_client = LazyClient('Spotify', _create_spotify, _probe_spotify)
+tmdb_client = LazyClient('TMDB', _create_tmdb, _probe_tmdb)
+
+
+def warm_all():
+    """預先建立所有客戶端，回傳各自的連線測試結果"""
+    # 連線測試不是使用者的請求，不佔用保留給使用者的額度
+    with spotify_priority(BACKGROUND):
+        results = {
+            'spotify': spotify_client.warm(),
+            'tmdb': tmdb_client.warm(),
+        }
+    # 之後由背景執行緒在 token 到期前換發
+    spotify = spotify_client.get()
+    if spotify is not None and isinstance(spotify.auth_manager, SharedClientCredentials):
+        spotify.auth_manager.start_keepalive()
+    return results
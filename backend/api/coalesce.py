@@ -0,0 +1,126 @@
+"""
+相同上游請求的合併（single-flight）
+
+同一時間多個相同參數的請求只會有一個真正呼叫上游，其他請求等待並共用結果：
+- 同一個 worker 內：以 Future 讓其他執行緒等待
+- 跨 worker：以 Redis 鎖選出一個 worker 呼叫上游，結果短暫寫入 Redis 供其他 worker 讀取
+上游呼叫失敗且有請求在等待時，由負責呼叫的請求替它們再呼叫一次（再失敗才拋出例外）；
+等待逾時時自行呼叫上游，不會永遠卡住。
+結果必須可以 JSON 序列化，且回傳的物件可能被多個請求共用，請勿修改。
+"""
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import redis
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+RESULT_TTL = 2  # 結果保留秒數，讓稍晚到達的請求也能共用
+POLL_INTERVAL = 0.05
+DEFAULT_WAIT_TIMEOUT = 15  # 需大於上游請求的逾時時間
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class _Call:
+    """同一個 worker 內進行中的呼叫"""
+
+    def __init__(self):
+        self.future = Future()
+        self.waiters = 0
+
+
+def coalesce(key, func, wait_timeout=DEFAULT_WAIT_TIMEOUT):
+    """以 key 合併相同的上游呼叫，回傳 func() 的結果"""
+    with _inflight_lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+        else:
+            call.waiters += 1
+
+    if not leader:
+        try:
+            return call.future.result(timeout=wait_timeout)
+        except FutureTimeout:
+            logger.warning(f"等待相同請求逾時，自行呼叫上游: {key}")
+            return func()
+
+    try:
+        result = _coalesce_across_workers(key, func, wait_timeout)
+    except BaseException as e:
+        _retry_for_waiters(key, func, wait_timeout, call, e)
+        raise
+    else:
+        call.future.set_result(result)
+        return result
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def _retry_for_waiters(key, func, wait_timeout, call, error):
+    """負責呼叫的請求失敗後，若有其他請求在等待，替它們再呼叫上游一次"""
+    with _inflight_lock:
+        waiters = call.waiters
+    if waiters and isinstance(error, Exception):
+        logger.warning(f"合併的請求失敗，替 {waiters} 個等待中的請求重新呼叫上游: {key}: {str(error)}")
+        try:
+            call.future.set_result(_coalesce_across_workers(key, func, wait_timeout))
+            return
+        except Exception as e:
+            error = e
+    call.future.set_exception(error)
+
+
+def _coalesce_across_workers(key, func, wait_timeout):
+    lock_key = f'coalesce:{key}:lock'
+    result_key = f'coalesce:{key}:result'
+    try:
+        client = get_redis()
+        raw = client.get(result_key)
+        if raw is not None:
+            return json.loads(raw)
+        acquired = client.set(lock_key, 1, nx=True, ex=wait_timeout)
+    except redis.RedisError as e:
+        logger.warning(f"請求合併無法使用 Redis: {str(e)}")
+        return func()
+
+    if acquired:
+        try:
+            result = func()
+            try:
+                client.set(result_key, json.dumps(result), ex=RESULT_TTL)
+            except redis.RedisError:
+                pass
+            return result
+        finally:
+            try:
+                client.delete(lock_key)
+            except redis.RedisError:
+                pass  # 鎖本身有逾時
+
+    # 其他 worker 正在呼叫上游，等待結果
+    deadline = time.monotonic() + wait_timeout
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.get(result_key)
+            pipe.exists(lock_key)
+            raw, locked = pipe.execute()
+        except redis.RedisError:
+            break
+        if raw is not None:
+            return json.loads(raw)
+        if not locked:
+            # 負責呼叫的 worker 失敗，沒有留下結果
+            break
+    return func()
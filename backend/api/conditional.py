@@ -0,0 +1,93 @@
+"""
+條件式 GET（ETag / Last-Modified）
+
+列表與詳細頁先以低成本的方式計算驗證值，與請求的 If-None-Match / If-Modified-Since
+相符時直接回傳 304，不查詢完整資料也不序列化：
+- 播放列表、片單：查詢範圍內 updated_at 的最大值與筆數（一次彙總查詢）；
+  播放列表的曲目與協作者變更時會一併更新播放列表的 updated_at（見 signals），
+  背景補齊的歌曲資料則以曲目的 fetched_at 最大值一併計入（見 catalog）
+- 貼文：按讚、評論都不會更新 updated_at，改用列表快取的版本號（見 feed_cache）
+回應依使用者而不同（is_liked、可見的私人資料），ETag 包含使用者 id 並加上 Vary: Authorization。
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    raw = '|'.join('' if part is None else str(part) for part in parts)
+    return f'W/"{hashlib.sha1(raw.encode("utf-8")).hexdigest()}"'
+
+
+def aggregate_validators(queryset, *parts, **timestamps):
+    """
+    以 updated_at 最大值與筆數計算 (etag, last_modified)，沒有任何資料時回傳 None
+
+    timestamps 為額外的 {名稱: 時間運算式}（例如相關資料的寫入時間），
+    在同一次查詢取最大值，一併計入 ETag 與 Last-Modified。
+    """
+    summary = queryset.order_by().aggregate(
+        last_modified=Max('updated_at'),
+        count=Count('pk'),
+        **{name: Max(expression) for name, expression in timestamps.items()},
+    )
+    if not summary['count']:
+        return None
+    extra = [summary[name] for name in timestamps]
+    last_modified = max([summary['last_modified'], *(value for value in extra if value)])
+    return make_etag(
+        summary['count'],
+        last_modified.isoformat(),
+        *(value.isoformat() if value else '' for value in extra),
+        *parts,
+    ), last_modified
+
+
+def user_key(request):
+    return request.user.id if request.user.is_authenticated else ''
+
+
+class ConditionalGetMixin:
+    """
+    為 ModelViewSet 的 list / retrieve 加上 ETag 與 Last-Modified
+
+    子類別實作 list_validators / detail_validators，回傳 (etag, last_modified) 或 None；
+    回傳 None 時照常處理請求（例如資料不存在時交給 retrieve 回傳 404）。
+    """
+
+    def list_validators(self, request):
+        return None
+
+    def detail_validators(self, request, pk):
+        return None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, self.list_validators(request), super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            validators = self.detail_validators(request, kwargs[self.lookup_field])
+        except (TypeError, ValueError):
+            validators = None  # 格式錯誤的 id 交給 retrieve 回傳 404
+        return self.conditional_response(request, validators, super().retrieve, *args, **kwargs)
+
+    def conditional_response(self, request, validators, render, *args, **kwargs):
+        if validators is None:
+            return render(request, *args, **kwargs)
+
+        etag, last_modified = validators
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = render(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        patch_vary_headers(response, ['Authorization'])
+        return response
@@ -0,0 +1,26 @@
+"""外部服務相關的例外"""
+
+
+class UpstreamUnavailable(Exception):
+    """外部服務暫時無法使用"""
+
+
+class SpotifyUnavailable(UpstreamUnavailable):
+    """Spotify 客戶端無法使用"""
+
+
+class CircuitOpen(UpstreamUnavailable):
+    """斷路器開啟中，暫停呼叫上游"""
+
+    def __init__(self, name):
+        self.name = name
+        super().__init__(f"{name} 暫時無法使用，請稍後再試")
+
+
+class RateLimited(UpstreamUnavailable):
+    """超過上游的呼叫額度，需等待 retry_after 秒"""
+
+    def __init__(self, name, retry_after=None):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"{name} 請求過於頻繁，請稍後再試")
@@ -0,0 +1,86 @@
+"""
+TMDB 精選電影（即將上映）
+
+每部電影的詳細資料（含各地區上映日期）以共用的執行緒池並行查詢，
+每個請求有各自的逾時，全部請求另有總等待時間；
+超過時間仍未完成的電影直接略過，不讓 worker 一直等待。
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+FEATURED_COUNT = 6
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.TMDB_DETAIL_CONCURRENCY,
+    thread_name_prefix='tmdb-detail',
+)
+
+
+def fetch_movie_details(tmdb, movie_ids, language='zh-TW'):
+    """並行取得電影詳細資料，回傳 {movie_id: detail}，失敗或逾時的電影不會出現在結果中"""
+    futures = {
+        _executor.submit(
+            tmdb.fetch,
+            f'/movie/{movie_id}',
+            {'language': language, 'append_to_response': 'release_dates'},
+            settings.TMDB_DETAIL_TIMEOUT,
+        ): movie_id
+        for movie_id in movie_ids
+    }
+    done, not_done = wait(futures, timeout=settings.TMDB_FEATURED_DEADLINE)
+
+    details = {}
+    for future in done:
+        movie_id = futures[future]
+        try:
+            response = future.result()
+        except Exception as e:
+            logger.warning(f"獲取電影 {movie_id} 詳細資料失敗: {str(e)}")
+            continue
+        if response.status_code == 200:
+            details[movie_id] = response.json()
+        else:
+            logger.warning(f"獲取電影 {movie_id} 詳細資料失敗: {response.status_code}")
+
+    if not_done:
+        for future in not_done:
+            future.cancel()
+        logger.warning(
+            f"{len(not_done)} 部電影詳細資料超過 {settings.TMDB_FEATURED_DEADLINE} 秒未回應，已略過"
+        )
+    return details
+
+
+def release_date_in(detail, region='TW'):
+    """取得指定地區的院線（或限定）上映日期"""
+    for country in (detail.get('release_dates') or {}).get('results', []):
+        if country['iso_3166_1'] == region:
+            for date in country['release_dates']:
+                if date.get('type') in [3, 2]:  # 3=theatrical, 2=limited
+                    return date.get('release_date', '').split('T')[0]
+            break
+    return None
+
+
+def format_featured_movies(movies, details, region='TW'):
+    """
+    只保留有詳細資料的電影並加上上映日期，依該地區的上映日期排序（最近的在前）
+
+    輸出欄位由 projections.FEATURED_MOVIE 決定。
+    """
+    formatted_movies = []
+    for movie in movies:
+        detail = details.get(movie['id'])
+        if detail is None:
+            continue
+        formatted_movies.append({
+            **movie,
+            'tw_release_date': release_date_in(detail, 'TW'),
+            'local_release_date': release_date_in(detail, region),
+        })
+    formatted_movies.sort(key=lambda x: x['local_release_date'] or x['release_date'])
+    return formatted_movies
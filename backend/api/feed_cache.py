@@ -0,0 +1,77 @@
+"""
+社群貼文列表的共用快取
+
+大部分請求是未登入訪客讀取各分類的第一頁，序列化後的頁面存放在 Redis，所有 worker 共用：
+- 快取內容一律是「未登入」的版本（is_liked 皆為 False），登入使用者取得後
+  再以一次查詢覆寫 is_liked，同一份快取可以同時服務所有使用者
+- 快取鍵包含版本號：貼文新增、修改、刪除時遞增全域版本；評論與按讚只遞增
+  該貼文分類與「全部」的版本。舊版本的資料不再被讀到，由 TTL 與 LRU 淘汰
+- 版本在交易提交後才遞增（見 signals），避免其他請求在提交前把舊資料寫回快取
+- 版本號同時作為貼文列表與詳細頁的 ETag（見 conditional）
+- 熱門列表（ordering=hot）與時間排序分開快取；熱門分數重新計算後同樣遞增分類版本
+Redis 無法連線時不使用快取，直接查詢資料庫。
+"""
+import logging
+
+import redis
+from django.conf import settings
+
+from .cache import ResultCache
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+ALL_CATEGORIES = '全部'
+GLOBAL_VERSION_KEY = 'posts:feed:version'
+CATEGORY_VERSION_KEY = 'posts:feed:version:{category}'
+
+post_feed_cache = ResultCache(
+    'posts:feed',
+    ttl=settings.POST_FEED_CACHE_TTL,
+    max_entries=settings.POST_FEED_CACHE_MAX_ENTRIES,
+)
+
+
+def normalize_category(category):
+    return category or ALL_CATEGORIES
+
+
+def versions(category):
+    """
+    (全域版本, 分類版本)，Redis 無法連線時回傳 None
+    """
+    category = normalize_category(category)
+    try:
+        global_version, category_version = get_redis().mget(
+            GLOBAL_VERSION_KEY, CATEGORY_VERSION_KEY.format(category=category)
+        )
+    except redis.RedisError as e:
+        logger.warning(f"讀取貼文列表快取版本失敗: {str(e)}")
+        return None
+    return int(global_version or 0), int(category_version or 0)
+
+
+def page_key(category, cursor, limit, ordering=''):
+    """
+    目前版本的快取鍵，Redis 無法連線時回傳 None
+    """
+    current = versions(category)
+    if current is None:
+        return None
+    return post_feed_cache.make_key(*current, normalize_category(category), ordering, cursor or '', limit)
+
+
+def invalidate(categories=None):
+    """
+    使快取失效：指定分類時遞增該分類與「全部」的版本，否則遞增全域版本
+    """
+    try:
+        if categories is None:
+            get_redis().incr(GLOBAL_VERSION_KEY)
+            return
+        pipe = get_redis().pipeline(transaction=False)
+        for category in {*categories, ALL_CATEGORIES}:
+            pipe.incr(CATEGORY_VERSION_KEY.format(category=category))
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"更新貼文列表快取版本失敗: {str(e)}")
@@ -0,0 +1,117 @@
+"""
+社群貼文熱門排序
+
+熱門程度 = (1 + 按讚數 + POST_HOT_COMMENT_WEIGHT × 評論數) × 2^(-貼文經過時數 / POST_HOT_HALF_LIFE_HOURS)
+
+直接儲存這個值需要隨時間不斷重新計算所有貼文。改為儲存它的對數加上一個與目前時間無關的常數：
+    score = log2(1 + 互動數) + 建立時間（小時）/ 半衰期
+任何時間點兩篇貼文的 score 大小關係都與衰減後的熱門程度相同，
+因此只有互動數變動（新貼文、評論、按讚）的貼文需要重新計算：
+- signals 在交易提交後把貼文 id 加入 Redis 的待更新集合
+- update_hot_scores 指令定期取出集合中的 id，重新計算後寫入 PostHotScore，
+  並使這些分類的列表快取失效
+- Redis 無法連線時遺漏的變更，以 update_hot_scores --full 全部重新計算
+熱門列表依 PostHotScore 的 (category, score) 索引以 cursor 分頁（見 pagination.HotKeysetPagination）。
+"""
+import logging
+import math
+
+import redis
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from . import feed_cache
+from .models import Comment, Post, PostHotScore
+from .posts import count_subquery
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+DIRTY_KEY = 'posts:hot:dirty'
+
+
+def hot_score(like_count, comment_count, created_at):
+    engagement = like_count + settings.POST_HOT_COMMENT_WEIGHT * comment_count
+    created_hours = created_at.timestamp() / 3600
+    return math.log2(1 + engagement) + created_hours / settings.POST_HOT_HALF_LIFE_HOURS
+
+
+def mark_dirty(post_ids):
+    """將貼文加入待更新集合"""
+    post_ids = list(post_ids)
+    if not post_ids:
+        return
+    try:
+        get_redis().sadd(DIRTY_KEY, *post_ids)
+    except redis.RedisError as e:
+        logger.warning(f"加入熱門分數待更新集合失敗: {str(e)}")
+
+
+def recompute(post_ids):
+    """重新計算指定貼文的熱門分數，回傳這些貼文的分類；已刪除的貼文會被略過"""
+    rows = (
+        Post.objects.filter(pk__in=post_ids)
+        .annotate(comment_count=count_subquery(Comment, 'post_id'))
+        .order_by()
+        .values_list('pk', 'category', 'like_count', 'comment_count', 'created_at')
+    )
+    scores = [
+        PostHotScore(post_id=pk, category=category, score=hot_score(likes, comments, created_at))
+        for pk, category, likes, comments, created_at in rows
+    ]
+    with transaction.atomic():
+        PostHotScore.objects.bulk_create(
+            scores,
+            update_conflicts=True,
+            unique_fields=['post'],
+            update_fields=['category', 'score', 'updated_at'],
+        )
+    return {score.category for score in scores}
+
+
+def update_dirty(batch_size=500):
+    """
+    重新計算待更新集合中的貼文，回傳處理的貼文數
+
+    寫入失敗時把取出的 id 放回集合，下次執行再處理。
+    """
+    total = 0
+    categories = set()
+    try:
+        while True:
+            try:
+                post_ids = [int(post_id) for post_id in get_redis().spop(DIRTY_KEY, batch_size)]
+            except redis.RedisError as e:
+                logger.warning(f"讀取熱門分數待更新集合失敗: {str(e)}")
+                break
+            if not post_ids:
+                break
+            try:
+                categories |= recompute(post_ids)
+            except DatabaseError:
+                mark_dirty(post_ids)
+                raise
+            total += len(post_ids)
+    finally:
+        # 分數變更後熱門列表的內容改變，使快取與 ETag 失效
+        if categories:
+            feed_cache.invalidate(categories)
+    return total
+
+
+def rebuild_all(batch_size=1000):
+    """依 id 分批重新計算所有貼文的熱門分數，回傳處理的貼文數"""
+    total = 0
+    last_id = 0
+    while True:
+        post_ids = list(
+            Post.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not post_ids:
+            break
+        recompute(post_ids)
+        last_id = post_ids[-1]
+        total += len(post_ids)
+    if total:
+        feed_cache.invalidate()
+    return total
@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import movie_snapshots
+from api.clients import tmdb_client
+
+
+class Command(BaseCommand):
+    help = '預先建立 TMDB 熱門與即將上映電影的快照（依 TMDB_SNAPSHOT_LOCALES 的語言與地區）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--locale',
+            action='append',
+            dest='locales',
+            help='language:region，例如 zh-TW:TW，可重複指定（預設為 TMDB_SNAPSHOT_LOCALES）',
+        )
+        parser.add_argument(
+            '--kind',
+            choices=list(movie_snapshots.BUILDERS),
+            action='append',
+            dest='kinds',
+            help='只建立指定的清單（預設全部）',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='每隔幾秒重新建立一次，0 表示只執行一次',
+        )
+
+    def handle(self, *args, **options):
+        locales = movie_snapshots.configured_locales()
+        if options['locales']:
+            locales = []
+            for item in options['locales']:
+                language, _, region = item.partition(':')
+                if not movie_snapshots.is_valid_locale(language, region.upper()):
+                    raise CommandError(f'無效的 locale: {item}')
+                locales.append((language, region.upper()))
+        kinds = options['kinds'] or list(movie_snapshots.BUILDERS)
+
+        while True:
+            self.build_all(kinds, locales)
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def build_all(self, kinds, locales):
+        tmdb = tmdb_client.get()
+        if not tmdb:
+            raise CommandError('無法初始化 TMDB 客戶端')
+
+        failed = 0
+        for language, region in locales:
+            for kind in kinds:
+                try:
+                    snapshot = movie_snapshots.build_snapshot(tmdb, kind, language, region)
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'{kind} {language}/{region} 建立失敗: {str(e)}')
+                    continue
+                self.stdout.write(f'{kind} {language}/{region} v{snapshot["version"]}')
+        total = len(kinds) * len(locales)
+        self.stdout.write(self.style.SUCCESS(f'已建立 {total - failed}/{total} 份電影快照'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.catalog import hydrate_tracks
+from api.clients import spotify_client
+from api.models import PlaylistTrack, SmartPlaylist
+from api.ratelimit import BACKGROUND, spotify_priority
+
+
+class Command(BaseCommand):
+    help = '補齊播放列表中缺少或過舊的歌曲資料'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age',
+            type=int,
+            default=None,
+            help='超過此秒數的歌曲資料會重新取得（預設為 TRACK_CATALOG_MAX_AGE）',
+        )
+
+    def handle(self, *args, **options):
+        track_ids = set(PlaylistTrack.objects.values_list('track_id', flat=True).distinct())
+        for ids in SmartPlaylist.objects.values_list('track_ids', flat=True):
+            track_ids.update(ids or [])
+
+        if not spotify_client.get():
+            raise CommandError('無法初始化 Spotify 客戶端')
+
+        with spotify_priority(BACKGROUND):
+            saved = hydrate_tracks(spotify_client.get, sorted(track_ids), max_age=options['max_age'])
+        self.stdout.write(self.style.SUCCESS(f'共 {len(track_ids)} 首歌曲，已更新 {saved} 首'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.post_search import rebuild_search_vectors
+
+
+class Command(BaseCommand):
+    help = '重新計算所有貼文的全文檢索向量（斷詞規則變更後執行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='每批讀取的貼文數',
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_search_vectors(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'已更新 {total} 篇貼文的搜尋索引'))
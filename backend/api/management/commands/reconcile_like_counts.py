@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from api.posts import reconcile_like_counts
+
+
+class Command(BaseCommand):
+    help = '依按讚紀錄重新計算貼文的 like_count，修正偏差'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='每批處理的貼文數',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只計算有偏差的貼文數，不寫入',
+        )
+
+    def handle(self, *args, **options):
+        fixed = reconcile_like_counts(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'{fixed} 篇貼文的按讚數有偏差')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'已修正 {fixed} 篇貼文的按讚數'))
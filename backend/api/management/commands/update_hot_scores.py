@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from api import hot_ranking
+
+
+class Command(BaseCommand):
+    help = '重新計算有新互動的貼文熱門分數（--full 時重新計算所有貼文）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='重新計算所有貼文，用於第一次建立資料或 Redis 中斷後修正',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='每批處理的貼文數',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='每隔幾秒處理一次待更新的貼文，0 表示只執行一次',
+        )
+
+    def handle(self, *args, **options):
+        if options['full']:
+            total = hot_ranking.rebuild_all(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'已重新計算 {total} 篇貼文的熱門分數'))
+
+        while True:
+            try:
+                total = hot_ranking.update_dirty(batch_size=options['batch_size'])
+            except DatabaseError as e:
+                if not options['interval']:
+                    raise CommandError(f'更新熱門分數失敗: {str(e)}')
+                # 未處理的貼文已放回待更新集合，下次再處理
+                self.stderr.write(f'更新熱門分數失敗: {str(e)}')
+                total = 0
+            if total or not options['interval']:
+                self.stdout.write(self.style.SUCCESS(f'已更新 {total} 篇貼文的熱門分數'))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
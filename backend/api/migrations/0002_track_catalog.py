@@ -0,0 +1,78 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SmartPlaylist",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255)),
+                ("description", models.TextField(blank=True)),
+                ("is_public", models.BooleanField(default=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("criteria", models.JSONField()),
+                ("track_ids", models.JSONField(default=list)),
+                ("auto_update", models.BooleanField(default=True)),
+                ("last_updated", models.DateTimeField(blank=True, null=True)),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="smart_playlists",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.CreateModel(
+            name="Track",
+            fields=[
+                (
+                    "spotify_id",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("name", models.CharField(max_length=500)),
+                ("artists", models.JSONField(default=list)),
+                ("album_id", models.CharField(blank=True, max_length=64)),
+                ("album_name", models.CharField(blank=True, max_length=500)),
+                ("image_url", models.URLField(blank=True, max_length=500, null=True)),
+                ("duration_ms", models.IntegerField(default=0)),
+                ("preview_url", models.URLField(blank=True, max_length=500, null=True)),
+                (
+                    "external_url",
+                    models.URLField(blank=True, max_length=500, null=True),
+                ),
+                ("fetched_at", models.DateTimeField()),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["fetched_at"], name="api_track_fetched_ca3b43_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:54
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0002_track_catalog"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name="Movie",
+            fields=[
+                ("tmdb_id", models.IntegerField(primary_key=True, serialize=False)),
+                ("title", models.CharField(max_length=500)),
+                ("original_title", models.CharField(blank=True, max_length=500)),
+                ("overview", models.TextField(blank=True)),
+                ("release_date", models.DateField(blank=True, null=True)),
+                (
+                    "poster_path",
+                    models.CharField(blank=True, max_length=200, null=True),
+                ),
+                (
+                    "backdrop_path",
+                    models.CharField(blank=True, max_length=200, null=True),
+                ),
+                ("vote_average", models.FloatField(default=0)),
+                ("vote_count", models.IntegerField(default=0)),
+                ("popularity", models.FloatField(default=0)),
+                (
+                    "search_vector",
+                    django.contrib.postgres.search.SearchVectorField(
+                        editable=False, null=True
+                    ),
+                ),
+                ("fetched_at", models.DateTimeField()),
+            ],
+            options={
+                "indexes": [
+                    django.contrib.postgres.indexes.GinIndex(
+                        fields=["search_vector"], name="movie_search_vector_gin"
+                    ),
+                    django.contrib.postgres.indexes.GinIndex(
+                        django.contrib.postgres.indexes.OpClass(
+                            django.db.models.functions.text.Upper("title"),
+                            name="gin_trgm_ops",
+                        ),
+                        name="movie_title_trgm",
+                    ),
+                    django.contrib.postgres.indexes.GinIndex(
+                        django.contrib.postgres.indexes.OpClass(
+                            django.db.models.functions.text.Upper("original_title"),
+                            name="gin_trgm_ops",
+                        ),
+                        name="movie_orig_title_trgm",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_movie_catalog"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="post",
+            name="api_post_categor_bfcec5_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="post",
+            name="api_post_created_a6ef6d_idx",
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["category", "-created_at", "id"], name="post_category_feed_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["-created_at", "id"], name="post_feed_idx"),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:01
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_like_count(apps, schema_editor):
+    Post = apps.get_model("api", "Post")
+    PostLike = Post.likes.through
+    likes = (
+        PostLike.objects.filter(post_id=OuterRef("pk"))
+        .order_by()
+        .values("post_id")
+        .annotate(count=Count("*"))
+        .values("count")
+    )
+    Post.objects.update(like_count=Coalesce(Subquery(likes, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_comment_thread_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="like_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_like_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:04
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+def build_search_vectors(apps, schema_editor):
+    from api.post_search import rebuild_search_vectors
+
+    rebuild_search_vectors(model=apps.get_model("api", "Post"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_post_like_count"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="post_search_idx"
+            ),
+        ),
+        migrations.RunPython(build_search_vectors, migrations.RunPython.noop),
+    ]
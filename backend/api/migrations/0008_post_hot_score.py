@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_post_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PostHotScore",
+            fields=[
+                (
+                    "post",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="hot",
+                        serialize=False,
+                        to="api.post",
+                    ),
+                ),
+                ("category", models.CharField(max_length=50)),
+                ("score", models.FloatField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["category", "-score", "post"],
+                        name="post_hot_category_idx",
+                    ),
+                    models.Index(fields=["-score", "post"], name="post_hot_idx"),
+                ],
+            },
+        ),
+    ]
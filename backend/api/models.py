@@ -1,5 +1,9 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.functions import Upper
+from django.utils import timezone
 from django.core.validators import MinLengthValidator, MaxLengthValidator
 
 User = get_user_model()
@@ -31,17 +35,53 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     likes = models.ManyToManyField(User, related_name='liked_posts', blank=True)
+    # 按讚數，與 likes 在同一個交易中更新（見 posts.toggle_like），
+    # 偏差可以用 reconcile_like_counts 指令修正
+    like_count = models.PositiveIntegerField(default=0)
+    # 標題與內容斷詞後的全文檢索向量，儲存時更新（見 post_search）
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['category']),
-            models.Index(fields=['created_at']),
+            # 貼文列表以 (created_at, id) 做 cursor 分頁，分類篩選與全部貼文各一個索引
+            models.Index(fields=['category', '-created_at', 'id'], name='post_category_feed_idx'),
+            models.Index(fields=['-created_at', 'id'], name='post_feed_idx'),
+            GinIndex(fields=['search_vector'], name='post_search_idx'),
         ]
 
     def __str__(self):
         return self.title
 
+    # 由其他流程在資料庫端維護的欄位，一般儲存不寫入
+    DERIVED_FIELDS = ('search_vector', 'like_count')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 記錄載入時的標題與內容，儲存時只有變更才重新計算 search_vector
+        instance._search_source = (instance.__dict__.get('title'), instance.__dict__.get('content'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        if not adding and kwargs.get('update_fields') is None:
+            # search_vector 只由 update_search_vector 寫入，一般儲存不改寫有 GIN 索引的欄位；
+            # like_count 只由 toggle_like 的 F() 與 reconcile_like_counts 寫入，避免以讀取時的舊值覆蓋
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DERIVED_FIELDS
+                and field.attname in self.__dict__
+            ]
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not {'title', 'content'} & set(update_fields):
+            return
+        if adding or getattr(self, '_search_source', None) != (self.title, self.content):
+            from .post_search import update_search_vector
+            update_search_vector(self)
+        self._search_source = (self.title, self.content)
+
     def clean(self):
         from django.core.exceptions import ValidationError
         if not self.title.strip():
@@ -64,7 +104,8 @@ class Comment(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['post']),
+            # 每篇貼文的評論依 (created_at, id) 分頁，列表內嵌的最新評論也使用此索引
+            models.Index(fields=['post', '-created_at', 'id'], name='comment_thread_idx'),
             models.Index(fields=['created_at']),
         ]
 
@@ -76,6 +117,26 @@ class Comment(models.Model):
         if not self.content.strip():
             raise ValidationError("評論內容不能為空")
 
+class PostHotScore(models.Model):
+    """
+    貼文的熱門分數，由 update_hot_scores 指令計算（見 hot_ranking）
+
+    分類與分數一起存放，熱門列表直接依 (category, score) 索引分頁，不需要排序整張貼文表。
+    """
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='hot')
+    category = models.CharField(max_length=50)
+    score = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', '-score', 'post'], name='post_hot_category_idx'),
+            models.Index(fields=['-score', 'post'], name='post_hot_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id}: {self.score:.4f}"
+
 class Playlist(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
@@ -92,6 +153,10 @@ class Playlist(models.Model):
     def __str__(self):
         return self.name
 
+    def touch(self):
+        """曲目或協作者變更時更新 updated_at，作為條件式 GET 的驗證值"""
+        Playlist.objects.filter(pk=self.pk).update(updated_at=timezone.now())
+
 class PlaylistTrack(models.Model):
     playlist = models.ForeignKey(Playlist, on_delete=models.CASCADE, related_name='tracks')
     track_id = models.CharField(max_length=255)  # Spotify track ID
@@ -106,6 +171,59 @@ class PlaylistTrack(models.Model):
     def __str__(self):
         return f"{self.track_id} in {self.playlist.name}"
 
+class Track(models.Model):
+    """本地的 Spotify 歌曲資料，顯示播放列表時不必逐首查詢 Spotify"""
+    spotify_id = models.CharField(max_length=64, primary_key=True)
+    name = models.CharField(max_length=500)
+    artists = models.JSONField(default=list)  # [{'id': ..., 'name': ...}]
+    album_id = models.CharField(max_length=64, blank=True)
+    album_name = models.CharField(max_length=500, blank=True)
+    image_url = models.URLField(max_length=500, blank=True, null=True)
+    duration_ms = models.IntegerField(default=0)
+    preview_url = models.URLField(max_length=500, blank=True, null=True)
+    external_url = models.URLField(max_length=500, blank=True, null=True)
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['fetched_at']),
+        ]
+
+    def __str__(self):
+        return self.name
+
+class Movie(models.Model):
+    """
+    本地的 TMDB 電影資料，由 TMDB 相關端點在取得資料時寫入
+
+    搜尋使用兩種索引：
+    - search_vector（simple 設定的 tsvector）：以空白分詞的英文等標題與簡介
+    - UPPER(title) / UPPER(original_title) 的 pg_trgm GIN 索引：
+      中文標題沒有空白分詞，以 trigram 加速 icontains 子字串比對
+    """
+    tmdb_id = models.IntegerField(primary_key=True)
+    title = models.CharField(max_length=500)
+    original_title = models.CharField(max_length=500, blank=True)
+    overview = models.TextField(blank=True)
+    release_date = models.DateField(null=True, blank=True)
+    poster_path = models.CharField(max_length=200, blank=True, null=True)
+    backdrop_path = models.CharField(max_length=200, blank=True, null=True)
+    vote_average = models.FloatField(default=0)
+    vote_count = models.IntegerField(default=0)
+    popularity = models.FloatField(default=0)
+    search_vector = SearchVectorField(null=True, editable=False)
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='movie_search_vector_gin'),
+            GinIndex(OpClass(Upper('title'), name='gin_trgm_ops'), name='movie_title_trgm'),
+            GinIndex(OpClass(Upper('original_title'), name='gin_trgm_ops'), name='movie_orig_title_trgm'),
+        ]
+
+    def __str__(self):
+        return self.title
+
 class PlaylistCollaborator(models.Model):
     playlist = models.ForeignKey(Playlist, on_delete=models.CASCADE, related_name='collaborators')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='collaborated_playlists')
@@ -144,6 +262,7 @@ class SmartPlaylist(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     criteria = models.JSONField()  # 存儲播放列表生成條件
+    track_ids = models.JSONField(default=list)  # 依條件產生的 Spotify track ID
     auto_update = models.BooleanField(default=True)
     last_updated = models.DateTimeField(null=True, blank=True)
 
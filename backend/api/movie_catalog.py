@@ -0,0 +1,127 @@
+"""
+本地電影資料（Movie catalog）
+
+TMDB 相關端點向 TMDB 取得新資料時順便寫入資料庫（讀到 HTTP 快取時不重複寫入），
+電影搜尋先查本地索引，本地結果不足一頁時才向 TMDB 搜尋（結果同樣寫回本地）。
+"""
+import logging
+from datetime import date
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Movie
+
+logger = logging.getLogger(__name__)
+
+MOVIE_UPDATE_FIELDS = [
+    'title', 'original_title', 'overview', 'release_date', 'poster_path',
+    'backdrop_path', 'vote_average', 'vote_count', 'popularity', 'fetched_at',
+]
+
+# TMDB 搜尋最多回傳 500 頁
+MAX_SEARCH_PAGE = 500
+
+# simple 設定不做語系處理，英文依空白分詞，中文則交給 trigram 索引
+SEARCH_CONFIG = 'simple'
+
+MOVIE_SEARCH_VECTOR = (
+    SearchVector('title', weight='A', config=SEARCH_CONFIG)
+    + SearchVector('original_title', weight='A', config=SEARCH_CONFIG)
+    + SearchVector('overview', weight='C', config=SEARCH_CONFIG)
+)
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def movie_from_tmdb(data, fetched_at=None):
+    """將 TMDB 的電影物件轉為 Movie"""
+    return Movie(
+        tmdb_id=data['id'],
+        title=data.get('title') or data.get('original_title') or '',
+        original_title=data.get('original_title') or '',
+        overview=data.get('overview') or '',
+        release_date=_parse_date(data.get('release_date')),
+        poster_path=data.get('poster_path'),
+        backdrop_path=data.get('backdrop_path'),
+        vote_average=data.get('vote_average') or 0,
+        vote_count=data.get('vote_count') or 0,
+        popularity=data.get('popularity') or 0,
+        fetched_at=fetched_at or timezone.now(),
+    )
+
+
+def movie_to_tmdb(movie):
+    """將 Movie 轉回 TMDB 格式，供 projections 使用"""
+    return {
+        'id': movie.tmdb_id,
+        'title': movie.title,
+        'original_title': movie.original_title,
+        'overview': movie.overview,
+        'release_date': movie.release_date.isoformat() if movie.release_date else '',
+        'poster_path': movie.poster_path,
+        'backdrop_path': movie.backdrop_path,
+        'vote_average': movie.vote_average,
+        'vote_count': movie.vote_count,
+        'popularity': movie.popularity,
+    }
+
+
+def save_movies(movies_data):
+    """將 TMDB 回傳的電影寫入（或更新）本地資料並更新搜尋向量"""
+    now = timezone.now()
+    movies = {}
+    for data in movies_data:
+        if data and data.get('id') and (data.get('title') or data.get('original_title')):
+            movies[data['id']] = movie_from_tmdb(data, now)
+    if not movies:
+        return 0
+    Movie.objects.bulk_create(
+        movies.values(),
+        update_conflicts=True,
+        unique_fields=['tmdb_id'],
+        update_fields=MOVIE_UPDATE_FIELDS,
+    )
+    Movie.objects.filter(tmdb_id__in=movies).update(search_vector=MOVIE_SEARCH_VECTOR)
+    return len(movies)
+
+
+def record_movies(movies_data):
+    """寫入本地電影資料，失敗時只記錄，不影響目前的請求"""
+    try:
+        return save_movies(movies_data)
+    except Exception as e:
+        logger.warning(f"寫入本地電影資料失敗: {str(e)}")
+        return 0
+
+
+def search_local(query, limit=20, offset=0):
+    """
+    搜尋本地電影
+
+    同時比對 tsvector 與標題子字串（中文），
+    依全文檢索排名、標題 trigram 相似度與熱門程度排序。
+    """
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    return list(
+        Movie.objects.filter(
+            Q(search_vector=search_query)
+            | Q(title__icontains=query)
+            | Q(original_title__icontains=query)
+        )
+        .annotate(
+            rank=SearchRank(F('search_vector'), search_query),
+            similarity=Greatest(
+                TrigramSimilarity('title', query),
+                TrigramSimilarity('original_title', query),
+            ),
+        )
+        .order_by('-rank', '-similarity', '-popularity', 'tmdb_id')[offset:offset + limit]
+    )
@@ -0,0 +1,190 @@
+"""
+TMDB 熱門 / 即將上映電影快照
+
+這兩份清單對所有使用者都相同，由 build_movie_snapshots 指令（或定期執行的 job）
+依語言與地區預先計算，以版本號存放在共用快取：
+- 每次建立新版本後才切換目前版本指標，讀取端不會讀到寫到一半的資料
+- 舊版本保留到 TTL 到期，必要時可手動切回
+請求直接讀取目前版本；沒有任何快照時才即時向 TMDB 查詢並寫入快照，
+快照過舊（例如定期 job 停止）時會在背景重新建立。
+"""
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from . import featured, projections
+from .movie_catalog import record_movies
+
+logger = logging.getLogger(__name__)
+
+TRENDING = 'trending'
+UPCOMING = 'upcoming'
+
+CURRENT_KEY = 'tmdb:snapshot:{kind}:{language}:{region}:current'
+VERSION_KEY = 'tmdb:snapshot:{kind}:{language}:{region}:v{version}'
+REBUILD_LOCK_KEY = 'tmdb:snapshot:{kind}:{language}:{region}:rebuilding'
+REBUILD_LOCK_TIMEOUT = 60  # 秒
+
+LANGUAGE_RE = re.compile(r'^[a-z]{2}(-[A-Z]{2})?$')
+REGION_RE = re.compile(r'^[A-Z]{2}$')
+
+
+class SnapshotError(Exception):
+    """TMDB 回應錯誤，無法建立快照"""
+
+
+def configured_locales():
+    """設定中需要預先建立快照的 (language, region)"""
+    locales = []
+    for item in settings.TMDB_SNAPSHOT_LOCALES.split(','):
+        language, _, region = item.strip().partition(':')
+        if language and region:
+            locales.append((language, region.upper()))
+    return locales
+
+
+def is_valid_locale(language, region):
+    return bool(LANGUAGE_RE.match(language)) and bool(REGION_RE.match(region))
+
+
+def is_allowed_locale(language, region):
+    """請求只能讀取設定中的語言與地區，避免任意組合各自建立快照並即時查詢 TMDB"""
+    return (language, region) in configured_locales()
+
+
+def _build_trending(tmdb, language, region):
+    response = tmdb.fetch('/trending/movie/week', params={'language': language})
+    if response.status_code != 200:
+        raise SnapshotError(f"TMDB API 錯誤: {response.status_code}")
+    results = response.json().get('results', [])
+    return {
+        'results': results,
+        'total_results': len(results),
+    }
+
+
+def _build_upcoming(tmdb, language, region):
+    response = tmdb.fetch(
+        '/movie/upcoming',
+        params={'language': language, 'page': 1, 'region': region}
+    )
+    if response.status_code != 200:
+        raise SnapshotError(f"TMDB API 錯誤: {response.status_code}")
+    movies = response.json().get('results', [])[:featured.FEATURED_COUNT]
+    details = featured.fetch_movie_details(tmdb, [movie['id'] for movie in movies], language)
+    formatted_movies = featured.format_featured_movies(movies, details, region)
+    return {
+        'results': formatted_movies,
+        'total_results': len(formatted_movies),
+    }
+
+
+BUILDERS = {
+    TRENDING: _build_trending,
+    UPCOMING: _build_upcoming,
+}
+
+# 快照保留 TMDB 原始欄位，回應時再依 Schema 投影（可指定欄位與圖片尺寸）
+SCHEMAS = {
+    TRENDING: projections.TRENDING_MOVIE,
+    UPCOMING: projections.FEATURED_MOVIE,
+}
+
+
+def build_snapshot(tmdb, kind, language, region):
+    """建立新版本的快照並切換為目前版本"""
+    started = time.monotonic()
+    data = BUILDERS[kind](tmdb, language, region)
+    record_movies(data['results'])
+    names = {'kind': kind, 'language': language, 'region': region}
+    version = int(time.time() * 1000)
+    snapshot = {
+        **names,
+        'version': version,
+        'generated_at': time.time(),
+        'data': data,
+    }
+    try:
+        cache.set(
+            VERSION_KEY.format(version=version, **names),
+            snapshot,
+            timeout=settings.TMDB_SNAPSHOT_TTL
+        )
+        cache.set(CURRENT_KEY.format(**names), version, timeout=settings.TMDB_SNAPSHOT_TTL)
+    except Exception as e:
+        logger.warning(f"儲存電影快照失敗: {str(e)}")
+    logger.info(
+        f"電影快照已更新: {kind} {language}/{region} v{version}, "
+        f"耗時 {time.monotonic() - started:.2f}s"
+    )
+    return snapshot
+
+
+def get_snapshot(kind, language, region):
+    """讀取目前版本的快照，沒有時回傳 None"""
+    names = {'kind': kind, 'language': language, 'region': region}
+    try:
+        version = cache.get(CURRENT_KEY.format(**names))
+        if version is None:
+            return None
+        return cache.get(VERSION_KEY.format(version=version, **names))
+    except Exception as e:
+        logger.warning(f"讀取電影快照失敗: {str(e)}")
+        return None
+
+
+def schedule_rebuild(get_client, kind, language, region):
+    """在背景重新建立快照，同一時間只有一個 worker 會執行"""
+    lock_key = REBUILD_LOCK_KEY.format(kind=kind, language=language, region=region)
+    try:
+        if not cache.add(lock_key, 1, timeout=REBUILD_LOCK_TIMEOUT):
+            return False
+    except Exception as e:
+        logger.warning(f"取得電影快照更新鎖失敗: {str(e)}")
+        return False
+
+    def run():
+        try:
+            tmdb = get_client()
+            if tmdb:
+                build_snapshot(tmdb, kind, language, region)
+        except Exception as e:
+            logger.error(f"背景更新電影快照失敗: {str(e)}")
+        finally:
+            try:
+                cache.delete(lock_key)
+            except Exception:
+                pass  # 鎖本身有逾時
+            connection.close()
+
+    threading.Thread(target=run, name=f'movie-snapshot-{kind}', daemon=True).start()
+    return True
+
+
+def load_snapshot(get_client, kind, language, region):
+    """
+    取得快照供請求使用
+
+    有快照時立即回傳，過舊則觸發背景更新；沒有快照時才即時建立。
+    get_client 回傳 None 時拋出 SnapshotError。
+    """
+    snapshot = get_snapshot(kind, language, region)
+    if snapshot is not None:
+        if snapshot_age(snapshot) > settings.TMDB_SNAPSHOT_STALE_AFTER:
+            schedule_rebuild(get_client, kind, language, region)
+        return snapshot
+
+    tmdb = get_client()
+    if not tmdb:
+        raise SnapshotError("TMDB API Key 未設置")
+    return build_snapshot(tmdb, kind, language, region)
+
+
+def snapshot_age(snapshot):
+    """快照已存在的秒數"""
+    return max(0, int(time.time() - snapshot['generated_at']))
@@ -0,0 +1,162 @@
+"""
+Spotify 最新音樂快照
+
+每個市場（country）的最新音樂清單預先計算後存放在共用快取中，
+請求直接讀取快照；快照過舊時由單一 worker 在背景重新整理，
+使用者不需要等待 Spotify。
+
+重新整理時使用 Spotify 的批次端點：
+1 次 new_releases + 每 20 張專輯 1 次 albums（專輯內已含曲目資訊），
+取代原本每張專輯各 2 次的逐一查詢。
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .exceptions import SpotifyUnavailable
+from .ratelimit import BACKGROUND, current_priority, spotify_priority
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = 'spotify:new_releases:{market}'
+REFRESH_LOCK_KEY = 'spotify:new_releases:{market}:refreshing'
+REFRESH_LOCK_TIMEOUT = 60  # 秒
+
+# Spotify /v1/albums 每次最多 20 個 ID
+ALBUM_BATCH_SIZE = 20
+
+# 批次請求的並行上限，避免單一 worker 對 Spotify 發出過多連線
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='spotify-batch')
+
+
+def allowed_markets():
+    """允許查詢的市場；每個市場各有一份快照，不接受任意值以免快取與 Spotify 請求被放大"""
+    return {market.strip().upper() for market in settings.SPOTIFY_NEW_RELEASES_MARKETS.split(',') if market.strip()}
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def fetch_new_release_tracks(client, market, limit=20):
+    """取得最新發行專輯的第一首歌曲"""
+    new_releases = client.new_releases(limit=limit, country=market)
+    if not new_releases or 'albums' not in new_releases:
+        raise ValueError("獲取最新發行專輯失敗：無效的回應格式")
+
+    album_ids = [album['id'] for album in new_releases['albums']['items'] if album]
+    batches = list(_chunks(album_ids, ALBUM_BATCH_SIZE))
+    # 執行緒池不會繼承呼叫端的優先權，需明確傳入
+    priority = current_priority()
+
+    def fetch_albums(ids):
+        with spotify_priority(priority):
+            return client.albums(ids, market=market)
+
+    albums = []
+    for result in _executor.map(fetch_albums, batches):
+        albums.extend(album for album in (result or {}).get('albums', []) if album)
+
+    tracks = []
+    for album in albums:
+        album_tracks = (album.get('tracks') or {}).get('items') or []
+        if not album_tracks:
+            continue
+        track = album_tracks[0]
+        tracks.append({
+            'id': track['id'],
+            'name': track['name'],
+            'artists': track['artists'],
+            'album': {
+                'id': album['id'],
+                'name': album['name'],
+                'images': album['images']
+            },
+            'preview_url': track.get('preview_url'),
+            'external_urls': track['external_urls'],
+            'duration_ms': track['duration_ms']
+        })
+    return tracks
+
+
+def refresh_snapshot(get_client, market):
+    """重新計算並儲存指定市場的快照"""
+    client = get_client()
+    if not client:
+        raise SpotifyUnavailable("無法初始化 Spotify 客戶端")
+
+    started = time.monotonic()
+    snapshot = {
+        'market': market,
+        'generated_at': time.time(),
+        'tracks': fetch_new_release_tracks(client, market),
+    }
+    try:
+        cache.set(
+            SNAPSHOT_KEY.format(market=market),
+            snapshot,
+            timeout=settings.SPOTIFY_NEW_RELEASES_SNAPSHOT_TTL
+        )
+    except Exception as e:
+        logger.warning(f"儲存最新音樂快照失敗: {str(e)}")
+    logger.info(
+        f"最新音樂快照已更新: market={market}, {len(snapshot['tracks'])} 首, "
+        f"耗時 {time.monotonic() - started:.2f}s"
+    )
+    return snapshot
+
+
+def schedule_refresh(get_client, market):
+    """在背景更新快照，同一時間只有一個 worker 會執行"""
+    lock_key = REFRESH_LOCK_KEY.format(market=market)
+    try:
+        if not cache.add(lock_key, 1, timeout=REFRESH_LOCK_TIMEOUT):
+            return False
+    except Exception as e:
+        logger.warning(f"取得快照更新鎖失敗: {str(e)}")
+        return False
+
+    def run():
+        try:
+            with spotify_priority(BACKGROUND):
+                refresh_snapshot(get_client, market)
+        except Exception as e:
+            logger.error(f"背景更新最新音樂快照失敗: {str(e)}")
+        finally:
+            try:
+                cache.delete(lock_key)
+            except Exception:
+                pass  # 鎖本身有逾時，刪除失敗也會自動釋放
+
+    threading.Thread(target=run, name=f'new-releases-{market}', daemon=True).start()
+    return True
+
+
+def get_snapshot(get_client, market):
+    """
+    取得指定市場的快照
+
+    有快照時立即回傳，過舊則觸發背景更新；沒有快照時才同步計算。
+    """
+    try:
+        snapshot = cache.get(SNAPSHOT_KEY.format(market=market))
+    except Exception as e:
+        logger.warning(f"讀取最新音樂快照失敗: {str(e)}")
+        snapshot = None
+
+    if snapshot is None:
+        return refresh_snapshot(get_client, market)
+
+    if snapshot_age(snapshot) > settings.SPOTIFY_NEW_RELEASES_REFRESH_INTERVAL:
+        schedule_refresh(get_client, market)
+    return snapshot
+
+
+def snapshot_age(snapshot):
+    """快照已存在的秒數"""
+    return max(0, int(time.time() - snapshot['generated_at']))
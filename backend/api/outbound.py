@@ -0,0 +1,156 @@
+"""
+對外 HTTP 請求的共用客戶端
+
+所有外部服務（TMDB、Google、Spotify）的請求都經過這裡：
+- 每個 host 一個 requests.Session，重複使用連線池（keep-alive）
+- 沒有指定 timeout 時套用預設的連線 / 讀取逾時
+- 連線失敗與 502/503/504 以指數退避加上隨機抖動（jitter）重試；
+  非冪等的方法（POST 等）只在連線失敗時重試，請求不會被送出兩次
+- 每個 host 的延遲分佈與錯誤次數記錄在 Redis，健康檢查可以讀取
+"""
+import logging
+import threading
+import time
+
+import redis
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+HOSTS_KEY = 'outbound:hosts'
+METRICS_KEY = 'outbound:metrics:{host}'
+
+# 延遲分佈的上界（毫秒），與 Prometheus histogram 相同為累積計數：
+# le_N 是延遲不超過 N 毫秒的請求數，le_inf 等於總請求數
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000)
+
+# 429 不在此重試，由各服務自行處理（例如 Spotify 的流量控制）
+RETRY_STATUS = (502, 503, 504)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _buckets(elapsed_ms):
+    """此次請求需要累加的所有 bucket"""
+    return [f'le_{bound}' for bound in LATENCY_BUCKETS_MS if elapsed_ms <= bound] + ['le_inf']
+
+
+def _error_kind(exc):
+    if isinstance(exc, requests.Timeout):
+        return 'timeout'
+    if isinstance(exc, requests.ConnectionError):
+        return 'connection'
+    return 'other'
+
+
+def record(host, elapsed_ms, status_code=None, error=None):
+    """記錄一次請求的延遲與結果"""
+    key = METRICS_KEY.format(host=host)
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.sadd(HOSTS_KEY, host)
+        pipe.hincrby(key, 'count', 1)
+        pipe.hincrbyfloat(key, 'sum_ms', round(elapsed_ms, 3))
+        for bucket in _buckets(elapsed_ms):
+            pipe.hincrby(key, bucket, 1)
+        if error is not None:
+            pipe.hincrby(key, f'error_{error}', 1)
+        else:
+            pipe.hincrby(key, f'status_{status_code // 100}xx', 1)
+        pipe.execute()
+    except redis.RedisError:
+        pass
+
+
+class OutboundSession(requests.Session):
+    """套用預設逾時並記錄延遲的 Session"""
+
+    def __init__(self, host):
+        super().__init__()
+        self.host = host
+        retry = Retry(
+            total=settings.OUTBOUND_RETRIES,
+            connect=settings.OUTBOUND_RETRIES,
+            read=False,
+            status=settings.OUTBOUND_RETRIES,
+            status_forcelist=RETRY_STATUS,
+            backoff_factor=settings.OUTBOUND_BACKOFF_FACTOR,
+            backoff_jitter=settings.OUTBOUND_BACKOFF_JITTER,
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=settings.OUTBOUND_POOL_MAXSIZE,
+            max_retries=retry,
+        )
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = (settings.OUTBOUND_CONNECT_TIMEOUT, settings.OUTBOUND_READ_TIMEOUT)
+        started = time.monotonic()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.RequestException as e:
+            record(self.host, (time.monotonic() - started) * 1000, error=_error_kind(e))
+            raise
+        record(self.host, (time.monotonic() - started) * 1000, status_code=response.status_code)
+        return response
+
+
+def session_for(host):
+    """取得指定 host 的共用 Session"""
+    session = _sessions.get(host)
+    if session is not None:
+        return session
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = OutboundSession(host)
+            _sessions[host] = session
+        return session
+
+
+def get(host, path, **kwargs):
+    return session_for(host).get(f'https://{host}{path}', **kwargs)
+
+
+def post(host, path, **kwargs):
+    return session_for(host).post(f'https://{host}{path}', **kwargs)
+
+
+def metrics():
+    """各 host 的請求統計：次數、平均延遲、延遲分佈、狀態碼與錯誤次數"""
+    try:
+        client = get_redis()
+        hosts = sorted(client.smembers(HOSTS_KEY))
+        pipe = client.pipeline(transaction=False)
+        for host in hosts:
+            pipe.hgetall(METRICS_KEY.format(host=host))
+        raw = pipe.execute()
+    except redis.RedisError:
+        return {'available': False}
+
+    result = {'available': True, 'hosts': {}}
+    for host, data in zip(hosts, raw):
+        count = int(data.get('count', 0))
+        latency = {
+            bucket: int(data.get(bucket, 0))
+            for bucket in [f'le_{bound}' for bound in LATENCY_BUCKETS_MS] + ['le_inf']
+        }
+        result['hosts'][host] = {
+            'count': count,
+            'avg_ms': round(float(data.get('sum_ms', 0)) / count, 1) if count else None,
+            'latency_ms': latency,
+            'status': {k[len('status_'):]: int(v) for k, v in data.items() if k.startswith('status_')},
+            'errors': {k[len('error_'):]: int(v) for k, v in data.items() if k.startswith('error_')},
+        }
+    return result
@@ -0,0 +1,137 @@
+"""
+以 (created_at, id) 為鍵的 cursor 分頁（keyset pagination）
+
+依 created_at 新到舊、id 小到大排序，cursor 記錄上一頁最後一筆的 (created_at, id)，
+下一頁直接從索引上的該位置往後讀，不使用 OFFSET，第 N 頁與第一頁的成本相同。
+回應格式為 {"results": [...], "next_cursor": "..."}，沒有下一頁時 next_cursor 為 None。
+熱門列表以相同方式依 (熱門分數, id) 分頁（HotKeysetPagination）。
+"""
+import base64
+import binascii
+import json
+import math
+from datetime import datetime
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+def _encode(data):
+    raw = json.dumps(data).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+
+
+def encode_cursor(created_at, pk):
+    return _encode({'created_at': created_at.isoformat(), 'id': pk})
+
+
+def decode_cursor(cursor):
+    """將 cursor 轉回 (created_at, id)，格式錯誤時拋出 ValueError"""
+    try:
+        data = _decode(cursor)
+        created_at = datetime.fromisoformat(data['created_at'])
+        pk = data['id']
+    except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError):
+        raise ValueError('無效的 cursor')
+    if not isinstance(pk, int) or created_at.tzinfo is None:
+        raise ValueError('無效的 cursor')
+    return created_at, pk
+
+
+def after_cursor(queryset, created_at, pk):
+    """
+    排在 (created_at, id) 之後的資料
+
+    created_at__lte 讓資料庫從索引上的位置開始掃描，
+    再排除同一時間點中 id 不大於 cursor 的資料。
+    """
+    return queryset.filter(created_at__lte=created_at).exclude(created_at=created_at, id__lte=pk)
+
+
+def encode_score_cursor(score, pk):
+    return _encode({'score': score, 'id': pk})
+
+
+def decode_score_cursor(cursor):
+    """將 cursor 轉回 (score, id)，格式錯誤時拋出 ValueError"""
+    try:
+        data = _decode(cursor)
+        score, pk = data['score'], data['id']
+    except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError):
+        raise ValueError('無效的 cursor')
+    if not isinstance(pk, int) or not isinstance(score, float) or not math.isfinite(score):
+        raise ValueError('無效的 cursor')
+    return score, pk
+
+
+def after_score_cursor(queryset, score, pk):
+    """排在 (score, id) 之後的資料，與 after_cursor 相同從索引上的位置開始掃描"""
+    return queryset.filter(hot__score__lte=score).exclude(hot__score=score, id__lte=pk)
+
+
+class KeysetPagination(BasePagination):
+    ordering = ('-created_at', 'id')
+    page_size = 20
+    max_page_size = 50
+
+    def get_page_size(self, request):
+        try:
+            return min(max(int(request.query_params.get('limit', self.page_size)), 1), self.max_page_size)
+        except ValueError:
+            return self.page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """cursor 無效時拋出 ValidationError（400）"""
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            try:
+                queryset = self.after(queryset, cursor)
+            except ValueError as e:
+                raise ValidationError({'error': str(e)})
+
+        page_size = self.get_page_size(request)
+        # 多取一筆判斷是否還有下一頁
+        items = list(queryset[:page_size + 1])
+        has_next = len(items) > page_size
+        items = items[:page_size]
+        self.next_cursor = self.cursor_for(items[-1]) if has_next else None
+        return items
+
+    def after(self, queryset, cursor):
+        return after_cursor(queryset, *decode_cursor(cursor))
+
+    def cursor_for(self, item):
+        return encode_cursor(item.created_at, item.pk)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'results': data,
+            'next_cursor': self.next_cursor,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'results': schema,
+                'next_cursor': {'type': 'string', 'nullable': True},
+            },
+        }
+
+
+class HotKeysetPagination(KeysetPagination):
+    """熱門列表，查詢需要 select_related('hot')（見 posts.hot_feed_queryset）"""
+    ordering = ('-hot__score', 'id')
+
+    def after(self, queryset, cursor):
+        return after_score_cursor(queryset, *decode_score_cursor(cursor))
+
+    def cursor_for(self, item):
+        return encode_score_cursor(item.hot.score, item.pk)
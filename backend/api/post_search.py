@@ -0,0 +1,144 @@
+"""
+社群貼文全文檢索
+
+PostgreSQL 的 simple 設定以空白分詞，整段中文會被當成一個詞，無法搜尋其中的字詞。
+因此寫入 search_vector 前先在應用程式端斷詞：
+- 中日韓文字切成重疊的二字詞（bigram），每段最後一個字另外保留單字，
+  例如「電影配樂」→ 電影、影配、配樂、樂
+- 其他文字依非文字字元切開並轉為小寫
+查詢以相同方式斷詞後全部 AND；只有一個中文字時以前綴比對（音:*）。
+search_vector 有 GIN 索引，依 ts_rank 排序，標題權重高於內容；
+標題與內容摘要的關鍵字以 <mark> 標示（在 Python 端處理，原文會先跳脫 HTML）。
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, Value
+from django.utils.html import escape
+
+from .models import Post
+
+SEARCH_CONFIG = 'simple'
+
+CJK_CHARS = '぀-ヿ㐀-䶿一-鿿豈-﫿가-힯'
+WORD_RE = re.compile(r'[^\W_]+')
+PART_RE = re.compile(f'[{CJK_CHARS}]+|[^{CJK_CHARS}]+')
+CJK_RE = re.compile(f'[{CJK_CHARS}]')
+
+MAX_QUERY_TERMS = 16
+SNIPPET_LENGTH = 120
+
+
+def _parts(text):
+    """將文字切成中日韓文字段落與其他單字"""
+    for word in WORD_RE.findall((text or '').lower()):
+        yield from PART_RE.findall(word)
+
+
+def is_cjk(part):
+    return bool(CJK_RE.match(part))
+
+
+def cjk_bigrams(run):
+    return [run[i:i + 2] for i in range(len(run) - 1)] + [run[-1]]
+
+
+def tokenize(text):
+    """寫入索引用的詞"""
+    tokens = []
+    for part in _parts(text):
+        tokens.extend(cjk_bigrams(part) if is_cjk(part) else [part])
+    return ' '.join(tokens)
+
+
+def post_search_vector(title, content):
+    return (
+        SearchVector(Value(tokenize(title)), weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Value(tokenize(content)), weight='B', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vector(post):
+    """重新計算單篇貼文的 search_vector"""
+    Post.objects.filter(pk=post.pk).update(search_vector=post_search_vector(post.title, post.content))
+
+
+def rebuild_search_vectors(batch_size=500, model=Post):
+    """重新計算所有貼文的 search_vector（斷詞規則變更後執行），回傳處理的貼文數"""
+    total = 0
+    last_id = 0
+    while True:
+        rows = list(
+            model.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', 'title', 'content')[:batch_size]
+        )
+        if not rows:
+            return total
+        for pk, title, content in rows:
+            model.objects.filter(pk=pk).update(search_vector=post_search_vector(title, content))
+        last_id = rows[-1][0]
+        total += len(rows)
+
+
+def query_terms(query):
+    """使用者輸入的關鍵字（中文段落或單字），用於查詢與標示"""
+    terms = []
+    for part in _parts(query):
+        if part not in terms:
+            terms.append(part)
+    return terms[:MAX_QUERY_TERMS]
+
+
+def build_query(terms):
+    """組成 tsquery，沒有可用的關鍵字時回傳 None"""
+    lexemes = []
+    for term in terms:
+        if is_cjk(term) and len(term) == 1:
+            lexemes.append(f'{term}:*')
+        elif is_cjk(term):
+            lexemes.extend(term[i:i + 2] for i in range(len(term) - 1))
+        else:
+            lexemes.append(term)
+    if not lexemes:
+        return None
+    return SearchQuery(' & '.join(dict.fromkeys(lexemes)), config=SEARCH_CONFIG, search_type='raw')
+
+
+def search_posts(queryset, terms, limit=20):
+    """依關鍵字搜尋貼文，依相關度與時間排序"""
+    search_query = build_query(terms)
+    if search_query is None:
+        return []
+    return list(
+        queryset.filter(search_vector=search_query)
+        .annotate(rank=SearchRank(F('search_vector'), search_query))
+        .order_by('-rank', '-created_at', 'id')[:limit]
+    )
+
+
+def _term_pattern(terms):
+    return re.compile('|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+
+
+def highlight(text, terms):
+    """以 <mark> 標示關鍵字，其餘文字跳脫 HTML"""
+    text = text or ''
+    if not terms:
+        return escape(text)
+    result, last = [], 0
+    for match in _term_pattern(terms).finditer(text):
+        result.append(escape(text[last:match.start()]))
+        result.append(f'<mark>{escape(match.group())}</mark>')
+        last = match.end()
+    result.append(escape(text[last:]))
+    return ''.join(result)
+
+
+def snippet(text, terms, length=SNIPPET_LENGTH):
+    """取第一個關鍵字附近的一段文字並標示"""
+    text = text or ''
+    match = _term_pattern(terms).search(text) if terms else None
+    start = max(0, match.start() - length // 3) if match else 0
+    excerpt = text[start:start + length]
+    prefix = '…' if start > 0 else ''
+    suffix = '…' if start + length < len(text) else ''
+    return prefix + highlight(excerpt, terms) + suffix
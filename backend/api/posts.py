@@ -0,0 +1,194 @@
+"""
+社群貼文列表的查詢
+
+列表一次取出整頁貼文需要的資料，查詢次數不隨貼文數量增加：
+- 作者以 JOIN 取得
+- 按讚數直接讀取 Post.like_count；目前使用者是否按讚與評論數以子查詢 annotate 計算，
+  不使用 JOIN + GROUP BY，資料庫只需計算該頁的貼文，分頁（LIMIT）可以直接走索引
+- 只內嵌每篇貼文最新的 POST_FEED_COMMENTS 則評論（連同作者），
+  以一次 window function（ROW_NUMBER）的 prefetch 載入；評論總數以子查詢計算
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, Count, Exists, F, IntegerField, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed
+
+from . import feed_cache
+from .models import Comment, Post
+
+PostLike = Post.likes.through
+
+# like-status 一次最多查詢的貼文數
+MAX_LIKE_STATUS_IDS = 300
+
+
+def count_subquery(model, field):
+    rows = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('*'))
+        .values('count')
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def latest_comments_prefetch():
+    """每篇貼文最新的幾則評論，Django 對切片的 Prefetch 會以 window function 一次查詢"""
+    comments = Comment.objects.select_related('author').order_by('-created_at', 'id')
+    return Prefetch(
+        'comments',
+        queryset=comments[:settings.POST_FEED_COMMENTS],
+        to_attr='latest_comments',
+    )
+
+
+def is_liked_expression(user):
+    """目前使用者是否按讚的註記，未登入時固定為 False"""
+    if user is not None and user.is_authenticated:
+        return Exists(PostLike.objects.filter(post_id=OuterRef('pk'), user_id=user.id))
+    return Value(False, output_field=BooleanField())
+
+
+def with_feed_data(queryset, user):
+    """加上列表序列化需要的 JOIN、註記與 prefetch"""
+    is_liked = is_liked_expression(user)
+    return (
+        queryset
+        .select_related('author')
+        .annotate(
+            comment_count=count_subquery(Comment, 'post_id'),
+            is_liked=is_liked,
+        )
+        .prefetch_related(latest_comments_prefetch())
+    )
+
+
+def feed_queryset(user, category=None):
+    """貼文列表，category 為空或「全部」時不篩選"""
+    queryset = Post.objects.all()
+    if category and category != '全部':
+        queryset = queryset.filter(category=category)
+    return with_feed_data(queryset, user)
+
+
+def hot_feed_queryset(user, category=None):
+    """
+    熱門貼文列表，只包含已計算熱門分數的貼文
+
+    分類以 PostHotScore 上的欄位篩選，資料庫依 (category, score) 索引依序讀取，
+    再以主鍵 JOIN 貼文，不需要排序整張表。
+    """
+    queryset = Post.objects.select_related('hot').filter(hot__isnull=False)
+    if category and category != '全部':
+        queryset = queryset.filter(hot__category=category)
+    return with_feed_data(queryset, user)
+
+
+def parse_post_ids(raw, limit=MAX_LIKE_STATUS_IDS):
+    """
+    解析以逗號分隔的貼文 id，去除重複並保留原本的順序
+
+    沒有提供 id、任一項目格式不正確或超過 limit 個項目時拋出 ValueError。
+    """
+    if not raw:
+        raise ValueError('需要提供 ids')
+    # 最多切出 limit + 1 個項目，過長的參數不必整個解析
+    items = raw.split(',', limit)
+    if len(items) > limit:
+        raise ValueError(f'ids 最多 {limit} 個')
+    post_ids = {}
+    for item in items:
+        item = item.strip()
+        if not (item.isascii() and item.isdigit()):
+            raise ValueError('ids 需為以逗號分隔的貼文 id')
+        post_ids[int(item)] = None
+    return list(post_ids)
+
+
+def like_statuses(user, post_ids):
+    """
+    多篇貼文的按讚數與目前使用者是否按讚（一次查詢）
+
+    回傳 {post_id: {'is_liked': bool, 'likes_count': int}}，不存在的貼文不會出現在結果中。
+    """
+    rows = (
+        Post.objects.filter(pk__in=post_ids)
+        .annotate(is_liked=is_liked_expression(user))
+        .order_by()
+        .values_list('pk', 'like_count', 'is_liked')
+    )
+    return {pk: {'is_liked': liked, 'likes_count': count} for pk, count, liked in rows}
+
+
+def liked_post_ids(user, post_ids):
+    """使用者按讚過的貼文 id（一次查詢）"""
+    if user is None or not user.is_authenticated or not post_ids:
+        return set()
+    return set(
+        PostLike.objects.filter(user_id=user.id, post_id__in=post_ids).values_list('post_id', flat=True)
+    )
+
+
+def toggle_like(post_id, user_id):
+    """
+    切換使用者對貼文的按讚狀態，回傳 (是否按讚, 最新按讚數)
+
+    刪除或新增 likes 關聯與更新 like_count 在同一個交易中完成，
+    like_count 以 F() 在資料庫端加減，並行的請求不會互相覆蓋。
+    同一使用者同時送出兩次時，likes 的唯一索引讓其中一次新增不生效（created=False），
+    按讚數只會加一次。
+    """
+    with transaction.atomic():
+        deleted, _ = PostLike.objects.filter(post_id=post_id, user_id=user_id).delete()
+        if deleted:
+            liked, delta = False, -deleted
+        else:
+            _, created = PostLike.objects.get_or_create(post_id=post_id, user_id=user_id)
+            liked, delta = True, int(created)
+        if delta:
+            Post.objects.filter(pk=post_id).update(like_count=F('like_count') + delta)
+            # 與 post.likes.add() / remove() 相同的通知，讓快取等接收者得知變更
+            m2m_changed.send(
+                sender=PostLike,
+                instance=Post(pk=post_id),
+                action='post_add' if liked else 'post_remove',
+                reverse=False,
+                model=PostLike._meta.get_field('user').related_model,
+                pk_set={user_id},
+                using=PostLike.objects.db,
+            )
+        like_count = Post.objects.filter(pk=post_id).values_list('like_count', flat=True).first()
+    return liked, like_count
+
+
+def reconcile_like_counts(batch_size=1000, dry_run=False):
+    """
+    依 likes 關聯重新計算 like_count，回傳修正的貼文數
+
+    依 id 分批處理，每批一個短交易，不會長時間鎖住整張表。
+    """
+    fixed = 0
+    last_id = 0
+    while True:
+        ids = list(
+            Post.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return fixed
+        last_id = ids[-1]
+        actual = count_subquery(PostLike, 'post_id')
+        drifted = (
+            Post.objects.filter(pk__in=ids)
+            .annotate(actual=actual)
+            .exclude(like_count=F('actual'))
+        )
+        if dry_run:
+            fixed += drifted.count()
+        else:
+            updated = Post.objects.filter(pk__in=drifted.values('pk')).update(like_count=actual)
+            if updated:
+                # update() 不會觸發 signals，直接使列表快取失效
+                feed_cache.invalidate()
+            fixed += updated
@@ -0,0 +1,66 @@
+"""
+Spotify 預覽網址批次查詢
+
+每 50 首歌曲只呼叫一次 Spotify /v1/tracks，結果寫入共用快取。
+沒有預覽版本的歌曲同樣會被快取（TTL 較短），避免反覆向 Spotify 查詢。
+"""
+import logging
+import re
+
+from django.conf import settings
+
+from .cache import spotify_preview_cache
+from .exceptions import SpotifyUnavailable
+
+logger = logging.getLogger(__name__)
+
+# Spotify /v1/tracks 每次最多 50 個 ID
+TRACKS_BATCH_SIZE = 50
+MAX_IDS_PER_REQUEST = 200
+
+TRACK_ID_RE = re.compile(r'^[A-Za-z0-9]{22}$')
+
+
+def parse_track_ids(raw):
+    """解析以逗號分隔的 track ID，去除重複與格式不正確的項目"""
+    track_ids = []
+    for track_id in (raw or '').split(','):
+        track_id = track_id.strip()
+        if TRACK_ID_RE.match(track_id) and track_id not in track_ids:
+            track_ids.append(track_id)
+    return track_ids
+
+
+def resolve_preview_urls(get_client, track_ids):
+    """
+    取得多首歌曲的預覽網址
+
+    回傳 {track_id: preview_url 或 None}，快取命中的歌曲不會呼叫 Spotify。
+    """
+    cached = spotify_preview_cache.get_many(track_ids)
+    previews = {track_id: entry['preview_url'] for track_id, entry in cached.items()}
+    missing = [track_id for track_id in track_ids if track_id not in cached]
+    if not missing:
+        return previews
+
+    client = get_client()
+    if not client:
+        raise SpotifyUnavailable("無法初始化 Spotify 客戶端")
+
+    found, not_found = {}, {}
+    for start in range(0, len(missing), TRACKS_BATCH_SIZE):
+        batch = missing[start:start + TRACKS_BATCH_SIZE]
+        results = client.tracks(batch).get('tracks') or []
+        # Spotify 對不存在的 ID 回傳 null，順序與請求一致
+        for track_id, track in zip(batch, results):
+            preview_url = track.get('preview_url') if track else None
+            previews[track_id] = preview_url
+            if preview_url:
+                found[track_id] = {'preview_url': preview_url}
+            else:
+                not_found[track_id] = {'preview_url': None}
+
+    spotify_preview_cache.set_many(found)
+    spotify_preview_cache.set_many(not_found, ttl=settings.SPOTIFY_PREVIEW_NEGATIVE_CACHE_TTL)
+    logger.info(f"向 Spotify 查詢 {len(missing)} 首歌曲的預覽網址，其中 {len(not_found)} 首無預覽")
+    return previews
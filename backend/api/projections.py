@@ -0,0 +1,217 @@
+"""
+TMDB 回應的欄位投影
+
+每個 TMDB 代理端點宣告一個 Schema，只輸出前端需要的欄位：
+- Field：直接取值（可指定來源欄位與轉換函式）
+- ImageField：由 TMDB 圖片路徑組成完整網址，尺寸可由請求指定
+- ListField：巢狀清單，可限制數量與過濾項目
+請求可帶 fields=id,title 只取部分欄位，poster_size / backdrop_size / profile_size 指定圖片尺寸；
+尺寸只套用在最外層的欄位，巢狀清單以欄位名稱為前綴另外指定，例如 similar_movies.poster_size=w154。
+"""
+import re
+
+IMAGE_BASE_URL = 'https://image.tmdb.org/t/p'
+
+# TMDB /configuration 提供的圖片尺寸
+IMAGE_SIZES = {
+    'poster': ('w92', 'w154', 'w185', 'w342', 'w500', 'w780', 'original'),
+    'backdrop': ('w300', 'w780', 'w1280', 'original'),
+    'profile': ('w45', 'w185', 'h632', 'original'),
+}
+
+
+IMAGE_SIZE_PARAM_RE = re.compile(r'^(?:(\w+)\.)?(poster|backdrop|profile)_size$')
+
+
+def image_url(path, size):
+    return f'{IMAGE_BASE_URL}/{size}{path}' if path else None
+
+
+def rating(value):
+    """評分四捨五入到小數一位"""
+    return round(float(value), 1) if value is not None else None
+
+
+def year(value):
+    return value[:4] if value else None
+
+
+def names(items):
+    return [item['name'] for item in items]
+
+
+def lookup(data, path, default=None):
+    """以 a.b 的路徑取值"""
+    for key in path.split('.'):
+        if not isinstance(data, dict) or key not in data:
+            return default
+        data = data[key]
+    return data
+
+
+class Field:
+    def __init__(self, source=None, transform=None, default=None):
+        self.source = source
+        self.transform = transform
+        self.default = default
+
+    def resolve(self, data, name, image_sizes):
+        value = lookup(data, self.source or name, self.default)
+        if self.transform and value is not None:
+            value = self.transform(value)
+        return value
+
+
+class ImageField(Field):
+    def __init__(self, kind, size, source=None):
+        super().__init__(source=source or f'{kind}_path')
+        self.kind = kind
+        self.size = size
+
+    def resolve(self, data, name, image_sizes):
+        return image_url(lookup(data, self.source), image_sizes.get(self.kind, self.size))
+
+
+class ListField(Field):
+    def __init__(self, schema, source=None, limit=None, where=None):
+        super().__init__(source=source, default=())
+        self.schema = schema
+        self.limit = limit
+        self.where = where
+
+    def resolve(self, data, name, image_sizes):
+        items = lookup(data, self.source or name) or ()
+        if self.where:
+            items = [item for item in items if self.where(item)]
+        return self.schema.project_many(items[:self.limit], image_sizes=image_sizes.get(name))
+
+
+class Schema:
+    def __init__(self, **fields):
+        self.fields = fields
+
+    def select(self, names):
+        """fields= 參數中屬於此 Schema 的欄位，沒有指定時回傳 None（全部輸出）"""
+        if not names:
+            return None
+        selected = [name for name in names if name in self.fields]
+        return selected or None
+
+    def project(self, data, only=None, image_sizes=None):
+        image_sizes = image_sizes or {}
+        names = only or self.fields
+        return {name: self.fields[name].resolve(data, name, image_sizes) for name in names}
+
+    def project_many(self, items, only=None, image_sizes=None):
+        return [self.project(item, only, image_sizes) for item in items]
+
+
+def parse_fields(raw):
+    """解析 fields=a,b,c"""
+    if not raw:
+        return None
+    return [name.strip() for name in raw.split(',') if name.strip()]
+
+
+def parse_image_sizes(params):
+    """
+    從請求參數取得各類圖片尺寸，無效的尺寸會被忽略
+
+    回傳 {'poster': 'w500', 'similar_movies': {'poster': 'w154'}}，巢狀清單的尺寸以欄位名稱分開。
+    """
+    sizes = {}
+    for key in params:
+        match = IMAGE_SIZE_PARAM_RE.match(key)
+        if not match:
+            continue
+        field, kind = match.groups()
+        size = params.get(key)
+        if size not in IMAGE_SIZES[kind]:
+            continue
+        if field:
+            sizes.setdefault(field, {})[kind] = size
+        else:
+            sizes[kind] = size
+    return sizes
+
+
+# 首頁熱門電影只需要卡片上顯示的欄位
+TRENDING_MOVIE = Schema(
+    id=Field(),
+    title=Field(),
+    overview=Field(),
+    poster_path=Field(),
+    poster_url=ImageField('poster', 'w342'),
+    release_date=Field(),
+    vote_average=Field(transform=rating),
+)
+
+MOVIE_SEARCH_RESULT = Schema(
+    id=Field(),
+    title=Field(),
+    original_title=Field(),
+    overview=Field(),
+    poster_path=Field(),
+    poster_url=ImageField('poster', 'w342'),
+    release_date=Field(),
+    vote_average=Field(transform=rating),
+)
+
+FEATURED_MOVIE = Schema(
+    id=Field(),
+    title=Field(),
+    overview=Field(),
+    poster_path=ImageField('poster', 'w500'),
+    backdrop_path=ImageField('backdrop', 'original'),
+    vote_average=Field(),
+    vote_count=Field(),
+    release_date=Field(),
+    tw_release_date=Field(),
+    local_release_date=Field(),
+)
+
+CAST_MEMBER = Schema(
+    id=Field(),
+    name=Field(),
+    character=Field(),
+    profile_path=ImageField('profile', 'w185'),
+)
+
+VIDEO = Schema(
+    id=Field(),
+    key=Field(),
+    site=Field(),
+    type=Field(),
+)
+
+SIMILAR_MOVIE = Schema(
+    id=Field(),
+    title=Field(),
+    poster_path=ImageField('poster', 'w185'),
+    vote_average=Field(transform=rating),
+)
+
+MOVIE_DETAIL = Schema(
+    id=Field(),
+    title=Field(),
+    original_title=Field(),
+    overview=Field(),
+    poster_path=ImageField('poster', 'w500'),
+    backdrop_path=ImageField('backdrop', 'original'),
+    vote_average=Field(transform=rating),
+    vote_count=Field(),
+    release_date=Field(),
+    release_year=Field(source='release_date', transform=year),
+    runtime=Field(),
+    genres=Field(transform=names, default=()),
+    production_countries=Field(transform=names, default=()),
+    spoken_languages=Field(transform=names, default=()),
+    budget=Field(),
+    revenue=Field(),
+    cast=ListField(CAST_MEMBER, source='credits.cast', limit=5),  # 只取前 5 位演員
+    videos=ListField(VIDEO, source='videos.results', limit=2, where=lambda video: video.get('site') == 'YouTube'),  # 只取前 2 個 YouTube 預告片
+    similar_movies=ListField(SIMILAR_MOVIE, source='similar.results', limit=6),  # 只取前 6 部類似電影
+    status=Field(),
+    tagline=Field(),
+    popularity=Field(),
+)
@@ -0,0 +1,200 @@
+"""
+Spotify API 的全域流量控制
+
+所有 worker 共用一個存放在 Redis 的 token bucket，每次呼叫 Spotify 前先取得額度：
+- 使用者觸發的請求（INTERACTIVE）可以用完所有額度，最多只等待很短的時間
+- 背景工作（BACKGROUND，例如快照更新、歌曲資料補齊）必須保留一部分額度給使用者，
+  可以等待較久
+- Spotify 回傳 429 時依 Retry-After 暫停所有 worker 的呼叫
+每個端點的呼叫、等待與被限流次數記錄在 Redis，健康檢查可以讀取。
+Redis 無法使用時不做限制。
+"""
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import redis
+from django.conf import settings
+from spotipy.exceptions import SpotifyException
+
+from .exceptions import RateLimited
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+_priority = ContextVar('spotify_priority', default=INTERACTIVE)
+
+BUCKET_KEY = 'spotify:ratelimit:bucket'
+BLOCKED_KEY = 'spotify:ratelimit:blocked_until'
+METRICS_KEY = 'spotify:ratelimit:metrics'
+
+# 回傳 {是否取得額度, 需要等待的秒數}
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local reserve = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local blocked_until = tonumber(redis.call('GET', KEYS[2]) or '0')
+if blocked_until > now then
+    return {0, tostring(blocked_until - now)}
+end
+
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or capacity
+local ts = tonumber(data[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local wait = 0
+if tokens - 1 >= reserve then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 + reserve - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+_ID_SEGMENT = re.compile(r'^[A-Za-z0-9]{22}$')
+
+
+def current_priority():
+    return _priority.get()
+
+
+@contextmanager
+def spotify_priority(priority):
+    """在此區塊內的 Spotify 呼叫使用指定的優先權"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def endpoint_name(url):
+    """將 Spotify URL 轉為端點名稱，ID 以 :id 取代（例如 tracks/:id）"""
+    path = url.split('/v1/', 1)[-1].split('?', 1)[0].strip('/')
+    return '/'.join(':id' if _ID_SEGMENT.match(part) else part for part in path.split('/'))
+
+
+class SpotifyScheduler:
+    def __init__(self):
+        self._script = None
+
+    def _bucket(self, client, reserve):
+        if self._script is None:
+            self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        allowed, wait = self._script(
+            keys=[BUCKET_KEY, BLOCKED_KEY],
+            args=[
+                settings.SPOTIFY_RATE_LIMIT_BURST,
+                settings.SPOTIFY_RATE_LIMIT_PER_SECOND,
+                reserve,
+            ],
+        )
+        return int(allowed) == 1, float(wait)
+
+    def acquire(self, endpoint):
+        """取得呼叫額度，超過可等待的時間則拋出 RateLimited"""
+        priority = current_priority()
+        if priority == BACKGROUND:
+            reserve = settings.SPOTIFY_RATE_LIMIT_BURST * settings.SPOTIFY_RATE_LIMIT_BACKGROUND_RESERVE
+            max_wait = settings.SPOTIFY_RATE_LIMIT_BACKGROUND_MAX_WAIT
+        else:
+            reserve = 0
+            max_wait = settings.SPOTIFY_RATE_LIMIT_INTERACTIVE_MAX_WAIT
+
+        waited = 0.0
+        try:
+            client = get_redis()
+            while True:
+                allowed, wait = self._bucket(client, reserve)
+                if allowed:
+                    break
+                if waited + wait > max_wait:
+                    self._record(endpoint, rejected=1, waited=waited)
+                    raise RateLimited('Spotify', retry_after=wait)
+                time.sleep(wait)
+                waited += wait
+        except redis.RedisError as e:
+            logger.warning(f"Spotify 流量控制無法使用 Redis: {str(e)}")
+            return
+        self._record(endpoint, calls=1, waited=waited)
+
+    def on_throttled(self, endpoint, exc):
+        """Spotify 回傳 429：依 Retry-After 暫停所有 worker"""
+        try:
+            retry_after = float(exc.headers['Retry-After'])
+        except (TypeError, ValueError):
+            retry_after = 1.0
+        logger.warning(f"Spotify 限流: {endpoint}，{retry_after} 秒後再試")
+        try:
+            client = get_redis()
+            now = time.time()
+            blocked_until = now + retry_after
+            current = float(client.get(BLOCKED_KEY) or 0)
+            if blocked_until > current:
+                client.set(BLOCKED_KEY, blocked_until, px=int(retry_after * 1000) + 1000)
+        except redis.RedisError:
+            pass
+        self._record(endpoint, throttled=1)
+        return retry_after
+
+    def _record(self, endpoint, calls=0, rejected=0, throttled=0, waited=0.0):
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            if calls:
+                pipe.hincrby(METRICS_KEY, f'{endpoint}:calls', calls)
+            if rejected:
+                pipe.hincrby(METRICS_KEY, f'{endpoint}:rejected', rejected)
+            if throttled:
+                pipe.hincrby(METRICS_KEY, f'{endpoint}:throttled', throttled)
+            if waited:
+                pipe.hincrbyfloat(METRICS_KEY, f'{endpoint}:waited_seconds', round(waited, 3))
+            pipe.execute()
+        except redis.RedisError:
+            pass
+
+    def call(self, url, func, *args, **kwargs):
+        """取得額度後呼叫 Spotify，並處理 429"""
+        endpoint = endpoint_name(url)
+        self.acquire(endpoint)
+        try:
+            return func(*args, **kwargs)
+        except SpotifyException as e:
+            # spotipy 重試次數用盡時也會回報 429，但沒有 Retry-After
+            if e.http_status == 429 and 'Retry-After' in e.headers:
+                retry_after = self.on_throttled(endpoint, e)
+                raise RateLimited('Spotify', retry_after=retry_after) from e
+            raise
+
+    def metrics(self):
+        """各端點的統計：{endpoint: {calls, rejected, throttled, waited_seconds}}"""
+        try:
+            client = get_redis()
+            raw = client.hgetall(METRICS_KEY)
+            blocked_until = float(client.get(BLOCKED_KEY) or 0)
+        except redis.RedisError:
+            return {'available': False}
+        endpoints = {}
+        for field, value in raw.items():
+            endpoint, metric = field.rsplit(':', 1)
+            endpoints.setdefault(endpoint, {})[metric] = float(value) if metric == 'waited_seconds' else int(value)
+        return {
+            'available': True,
+            'blocked_for': max(0.0, round(blocked_until - time.time(), 3)),
+            'endpoints': endpoints,
+        }
+
+
+spotify_scheduler = SpotifyScheduler()
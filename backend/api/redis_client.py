@@ -0,0 +1,23 @@
+"""
+共用的 Redis 連線
+
+所有 gunicorn worker 透過同一個 Redis 共享快取、鎖與計數器。
+連線在第一次使用時才建立，redis-py 的連線池本身是執行緒安全的。
+"""
+import redis
+from django.conf import settings
+
+_client = None
+
+
+def get_redis():
+    """取得共用的 Redis 客戶端（延遲建立）"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_connect_timeout=1,
+            socket_timeout=1,
+        )
+    return _client
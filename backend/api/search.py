@@ -0,0 +1,110 @@
+"""
+Spotify 搜尋分頁
+
+支援 track / album / artist 三種類型，以不透明的 cursor 分頁：
+回應中的 next_cursor 帶入下一次請求即可取得下一頁，沒有下一頁時為 None。
+每頁回傳後會在背景預先查詢下一頁並寫入快取，無限捲動時不需要等待 Spotify。
+"""
+import base64
+import binascii
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+
+from .cache import spotify_search_cache
+from .ratelimit import BACKGROUND, spotify_priority
+
+logger = logging.getLogger(__name__)
+
+# 搜尋類型對應到 Spotify 回應中的欄位
+SEARCH_TYPES = {
+    'track': 'tracks',
+    'album': 'albums',
+    'artist': 'artists',
+}
+
+# Spotify 搜尋的 offset + limit 不可超過 1000
+MAX_RESULTS = 1000
+
+PREFETCH_LOCK_KEY = 'spotify:search:prefetch:{key}'
+PREFETCH_LOCK_TIMEOUT = 30  # 秒
+
+_prefetch_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='spotify-prefetch')
+
+
+def encode_cursor(offset):
+    raw = json.dumps({'offset': offset}).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """將 cursor 轉回 offset，格式錯誤時拋出 ValueError"""
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        offset = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))['offset']
+    except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError):
+        raise ValueError('無效的 cursor')
+    if not isinstance(offset, int) or not 0 <= offset < MAX_RESULTS:
+        raise ValueError('無效的 cursor')
+    return offset
+
+
+def normalize_query(query):
+    return ' '.join(query.lower().split())
+
+
+def cache_key(query, search_type, market, limit, offset):
+    return spotify_search_cache.make_key(normalize_query(query), search_type, market, limit, offset)
+
+
+def fetch_page(client, query, search_type, market, limit, offset):
+    """向 Spotify 查詢一頁搜尋結果"""
+    field = SEARCH_TYPES[search_type]
+    limit = min(limit, MAX_RESULTS - offset)
+    results = client.search(q=query, type=search_type, limit=limit, offset=offset, market=market)
+    page = (results or {}).get(field) or {}
+    items = [item for item in page.get('items') or [] if item]
+    total = min(page.get('total') or 0, MAX_RESULTS)
+    next_offset = offset + limit
+    has_next = bool(items) and next_offset < total
+    return {
+        field: {
+            'items': items,
+            'total': total,
+        },
+        'next_cursor': encode_cursor(next_offset) if has_next else None,
+    }
+
+
+def schedule_prefetch(get_client, query, search_type, market, limit, cursor):
+    """在背景查詢下一頁並寫入快取，同一頁同一時間只有一個 worker 會查詢"""
+    if not cursor:
+        return False
+    offset = decode_cursor(cursor)
+    key = cache_key(query, search_type, market, limit, offset)
+    if spotify_search_cache.exists(key):
+        return False
+    try:
+        if not cache.add(PREFETCH_LOCK_KEY.format(key=key), 1, timeout=PREFETCH_LOCK_TIMEOUT):
+            return False
+    except Exception as e:
+        logger.warning(f"取得搜尋預取鎖失敗: {str(e)}")
+        return False
+
+    def run():
+        try:
+            client = get_client()
+            if not client:
+                return
+            with spotify_priority(BACKGROUND):
+                page = fetch_page(client, query, search_type, market, limit, offset)
+            spotify_search_cache.set(key, page)
+        except Exception as e:
+            logger.warning(f"預取搜尋結果失敗: {str(e)}")
+
+    _prefetch_executor.submit(run)
+    return True
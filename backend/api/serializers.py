@@ -1,6 +1,10 @@
 from rest_framework import serializers
-from .models import Post, Comment, Playlist, Watchlist, PlaylistTrack, PlaylistCollaborator, SmartPlaylist
+from .models import Post, Comment, Playlist, Watchlist, PlaylistTrack, PlaylistCollaborator, SmartPlaylist, Track
+from .catalog import load_track_catalog
+from .clients import spotify_client
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import models
 
 User = get_user_model()
 
@@ -18,20 +22,35 @@ class CommentSerializer(serializers.ModelSerializer):
 
 class PostSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
-    comments = CommentSerializer(many=True, read_only=True)
-    likes_count = serializers.SerializerMethodField()
+    comments = serializers.SerializerMethodField()
+    comment_count = serializers.SerializerMethodField()
+    likes_count = serializers.IntegerField(source='like_count', read_only=True)
     is_liked = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
         fields = ('id', 'title', 'content', 'author', 'category', 'created_at', 
-                 'comments', 'likes_count', 'is_liked')
+                 'comments', 'comment_count', 'likes_count', 'is_liked')
         read_only_fields = ('author',)
 
-    def get_likes_count(self, obj):
-        return obj.likes.count()
+    # 列表與詳細頁的查詢已經以 annotate / prefetch 算好（見 posts.with_feed_data），
+    # 只有剛建立或更新、沒有註記的貼文才另外查詢
+
+    def get_comments(self, obj):
+        """最新的幾則評論，完整評論由評論 API 分頁取得"""
+        comments = getattr(obj, 'latest_comments', None)
+        if comments is None:
+            comments = obj.comments.select_related('author').order_by('-created_at', 'id')[:settings.POST_FEED_COMMENTS]
+        return CommentSerializer(comments, many=True, context=self.context).data
+
+    def get_comment_count(self, obj):
+        if hasattr(obj, 'comment_count'):
+            return obj.comment_count
+        return obj.comments.count()
 
     def get_is_liked(self, obj):
+        if hasattr(obj, 'is_liked'):
+            return obj.is_liked
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.likes.filter(id=request.user.id).exists()
@@ -41,14 +60,57 @@ class PostSerializer(serializers.ModelSerializer):
         validated_data['author'] = self.context['request'].user
         return super().create(validated_data)
 
-class PlaylistTrackSerializer(serializers.ModelSerializer):
+class TrackSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Track
+        fields = [
+            'spotify_id', 'name', 'artists', 'album_id', 'album_name',
+            'image_url', 'duration_ms', 'preview_url', 'external_url'
+        ]
+
+class TrackCatalogListSerializer(serializers.ListSerializer):
+    """序列化多個播放列表前，以一次查詢載入所有歌曲資料"""
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        track_ids = [track_id for item in items for track_id in self.child.catalog_track_ids(item)]
+        self.context['track_catalog'] = load_track_catalog(track_ids, spotify_client.get)
+        return super().to_representation(items)
+
+class TrackCatalogMixin:
+    """從本地歌曲資料嵌入歌曲資訊，缺少的歌曲在背景向 Spotify 補齊"""
+
+    def catalog_track_ids(self, instance):
+        """需要嵌入的歌曲 ID，子類別依資料結構覆寫；預設不嵌入任何歌曲"""
+        return []
+
+    def get_track_catalog(self, instance):
+        if 'track_catalog' not in self.context:
+            self.context['track_catalog'] = load_track_catalog(
+                self.catalog_track_ids(instance), spotify_client.get
+            )
+        return self.context['track_catalog']
+
+    def embed_track(self, track_id):
+        track = self.context['track_catalog'].get(track_id)
+        return TrackSerializer(track).data if track else None
+
+class PlaylistTrackSerializer(TrackCatalogMixin, serializers.ModelSerializer):
     added_by = UserSerializer(read_only=True)
+    track = serializers.SerializerMethodField()
 
     class Meta:
         model = PlaylistTrack
-        fields = ['id', 'track_id', 'added_at', 'added_by', 'position']
+        fields = ['id', 'track_id', 'track', 'added_at', 'added_by', 'position']
         read_only_fields = ['added_at', 'added_by']
 
+    def catalog_track_ids(self, instance):
+        return [instance.track_id]
+
+    def get_track(self, obj):
+        self.get_track_catalog(obj)
+        return self.embed_track(obj.track_id)
+
 class PlaylistCollaboratorSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
@@ -57,7 +119,7 @@ class PlaylistCollaboratorSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'can_edit', 'added_at']
         read_only_fields = ['added_at']
 
-class PlaylistSerializer(serializers.ModelSerializer):
+class PlaylistSerializer(TrackCatalogMixin, serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
     tracks = PlaylistTrackSerializer(many=True, read_only=True)
     collaborators = PlaylistCollaboratorSerializer(many=True, read_only=True)
@@ -71,9 +133,18 @@ class PlaylistSerializer(serializers.ModelSerializer):
             'tracks', 'collaborators', 'track_count'
         ]
         read_only_fields = ['created_at', 'updated_at', 'owner']
+        list_serializer_class = TrackCatalogListSerializer
+
+    def catalog_track_ids(self, instance):
+        return [track.track_id for track in instance.tracks.all()]
+
+    def to_representation(self, instance):
+        self.get_track_catalog(instance)
+        return super().to_representation(instance)
 
     def get_track_count(self, obj):
-        return obj.tracks.count()
+        # 使用預先載入的曲目，避免額外的 COUNT 查詢
+        return len(obj.tracks.all())
 
 class PlaylistCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -99,8 +170,9 @@ class WatchlistSerializer(serializers.ModelSerializer):
             return self.context['request'].build_absolute_uri(obj.cover.url)
         return None 
 
-class SmartPlaylistSerializer(serializers.ModelSerializer):
+class SmartPlaylistSerializer(TrackCatalogMixin, serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
+    tracks = serializers.SerializerMethodField()
     track_count = serializers.SerializerMethodField()
 
     class Meta:
@@ -108,12 +180,23 @@ class SmartPlaylistSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'description', 'owner', 'is_public',
             'created_at', 'updated_at', 'criteria', 'auto_update',
-            'last_updated', 'track_count'
+            'last_updated', 'tracks', 'track_count'
         ]
         read_only_fields = ['created_at', 'updated_at', 'owner', 'last_updated']
+        list_serializer_class = TrackCatalogListSerializer
+
+    def catalog_track_ids(self, instance):
+        return instance.track_ids
+
+    def get_tracks(self, obj):
+        self.get_track_catalog(obj)
+        return [
+            {'track_id': track_id, 'track': self.embed_track(track_id)}
+            for track_id in obj.track_ids
+        ]
 
     def get_track_count(self, obj):
-        return obj.tracks.count()
+        return len(obj.track_ids)
 
 class SmartPlaylistCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,79 @@
+"""
+資料變更時使共用快取與條件式 GET 的驗證值失效
+
+貼文列表的版本在交易提交後才遞增，交易回滾時不會使快取失效。
+貼文、評論與按讚變更時，同樣在提交後把貼文加入熱門分數的待更新集合。
+播放列表的曲目與協作者變更時更新播放列表的 updated_at。
+"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import feed_cache, hot_ranking
+from .models import Comment, Playlist, PlaylistCollaborator, PlaylistTrack, Post
+
+PostLike = Post.likes.through
+
+
+def _post_categories(post_ids):
+    return set(Post.objects.filter(pk__in=post_ids).values_list('category', flat=True))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feed(sender, instance, **kwargs):
+    # 貼文修改可能變更分類，直接遞增全域版本
+    transaction.on_commit(feed_cache.invalidate)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_feed(sender, instance, **kwargs):
+    categories = _post_categories([instance.post_id])
+    transaction.on_commit(lambda: feed_cache.invalidate(categories))
+
+
+@receiver(m2m_changed, sender=PostLike)
+def invalidate_like_feed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Django 不會對 PostLike（自動建立的關聯表）送出 post_save / post_delete，
+    # likes.add() / remove() 與 posts.toggle_like 都以 m2m_changed 通知
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse and action == 'post_clear':
+        transaction.on_commit(feed_cache.invalidate)
+        return
+    categories = _post_categories((pk_set or ()) if reverse else [instance.pk])
+    transaction.on_commit(lambda: feed_cache.invalidate(categories))
+
+
+@receiver(post_save, sender=Post)
+def mark_post_hot(sender, instance, **kwargs):
+    # 新貼文需要建立分數，修改可能變更分類
+    post_ids = [instance.pk]
+    transaction.on_commit(lambda: hot_ranking.mark_dirty(post_ids))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def mark_comment_hot(sender, instance, **kwargs):
+    post_ids = [instance.post_id]
+    transaction.on_commit(lambda: hot_ranking.mark_dirty(post_ids))
+
+
+@receiver(m2m_changed, sender=PostLike)
+def mark_like_hot(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse and action == 'post_clear':
+        # 清除使用者的所有按讚時無法得知貼文，由 update_hot_scores --full 修正
+        return
+    post_ids = list(pk_set or ()) if reverse else [instance.pk]
+    transaction.on_commit(lambda: hot_ranking.mark_dirty(post_ids))
+
+
+@receiver(post_save, sender=PlaylistTrack)
+@receiver(post_delete, sender=PlaylistTrack)
+@receiver(post_save, sender=PlaylistCollaborator)
+@receiver(post_delete, sender=PlaylistCollaborator)
+def touch_playlist(sender, instance, **kwargs):
+    Playlist(pk=instance.playlist_id).touch()
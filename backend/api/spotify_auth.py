@@ -0,0 +1,184 @@
+"""
+跨 worker 共用的 Spotify client-credentials token
+
+所有 gunicorn worker 共用同一個 access token：
+- token 存放在 Redis，Redis 無法使用時改存本機檔案（以檔案鎖保護）
+- 到期前一段時間由單一 worker 在背景換發新 token（single-flight），
+  使用者的請求只會讀到仍然有效的 token
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import redis
+from django.conf import settings
+from spotipy.cache_handler import CacheHandler
+from spotipy.oauth2 import SpotifyClientCredentials
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = 30  # 換發 token 最長持有鎖的秒數
+LOCK_WAIT = 10  # token 已過期時等待其他 worker 換發的秒數
+
+
+class SharedTokenCacheHandler(CacheHandler):
+    """將 token 存放在 Redis，失敗時改用本機檔案"""
+
+    def __init__(self, client_id):
+        suffix = hashlib.sha1(client_id.encode('utf-8')).hexdigest()[:12]
+        self.key = f'spotify:token:{suffix}'
+        self.lock_key = f'{self.key}:lock'
+        base = settings.SPOTIFY_TOKEN_CACHE_DIR or tempfile.gettempdir()
+        self.file_path = os.path.join(base, f'sonicvision-spotify-token-{suffix}.json')
+        self.lock_path = f'{self.file_path}.lock'
+
+    def get_cached_token(self):
+        try:
+            raw = get_redis().get(self.key)
+            return json.loads(raw) if raw else None
+        except redis.RedisError as e:
+            logger.warning(f"從 Redis 讀取 Spotify token 失敗，改用檔案快取: {str(e)}")
+        return self._read_file()
+
+    def save_token_to_cache(self, token_info):
+        ttl = max(int(token_info['expires_at'] - time.time()), 1)
+        try:
+            get_redis().set(self.key, json.dumps(token_info), ex=ttl)
+            return
+        except redis.RedisError as e:
+            logger.warning(f"寫入 Redis 的 Spotify token 失敗，改用檔案快取: {str(e)}")
+        self._write_file(token_info)
+
+    def _read_file(self):
+        try:
+            with open(self.file_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_file(self, token_info):
+        # 先寫入暫存檔再取代，其他 process 不會讀到寫到一半的內容
+        tmp_path = f'{self.file_path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(token_info, f)
+            os.replace(tmp_path, self.file_path)
+        except OSError as e:
+            logger.error(f"寫入 Spotify token 檔案失敗: {str(e)}")
+
+    @contextmanager
+    def refresh_lock(self, blocking):
+        """跨 process 的換發鎖，回傳是否取得"""
+        try:
+            lock = get_redis().lock(self.lock_key, timeout=LOCK_TIMEOUT)
+            acquired = lock.acquire(blocking=blocking, blocking_timeout=LOCK_WAIT)
+        except redis.RedisError:
+            lock = None
+        if lock is not None:
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    try:
+                        lock.release()
+                    except redis.RedisError:
+                        pass  # 鎖本身有逾時
+            return
+
+        # Redis 無法使用時改用檔案鎖
+        with open(self.lock_path, 'w') as lock_file:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(lock_file, flags)
+                acquired = True
+            except BlockingIOError:
+                acquired = False
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class SharedClientCredentials(SpotifyClientCredentials):
+    """到期前在背景換發 token，並確保同一時間只有一個 worker 換發"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._refreshing = threading.Event()
+        self._keepalive_started = False
+
+    def needs_refresh(self, token_info):
+        return token_info['expires_at'] - time.time() < settings.SPOTIFY_TOKEN_REFRESH_MARGIN
+
+    def get_access_token(self, as_dict=False, check_cache=True):
+        token_info = self.cache_handler.get_cached_token() if check_cache else None
+        if token_info and not self.is_token_expired(token_info):
+            if self.needs_refresh(token_info):
+                self.refresh_in_background()
+        else:
+            token_info = self.refresh(blocking=True)
+        return token_info if as_dict else token_info['access_token']
+
+    def refresh(self, blocking):
+        """
+        換發 token
+
+        取得鎖後會再檢查一次快取，若其他 worker 已換發則直接使用。
+        非阻塞模式下若其他 worker 正在換發則回傳 None。
+        """
+        with self.cache_handler.refresh_lock(blocking) as acquired:
+            if not acquired and not blocking:
+                return None
+            token_info = self.cache_handler.get_cached_token()
+            if token_info and not self.needs_refresh(token_info):
+                return token_info
+            token_info = self._add_custom_values_to_token_info(self._request_access_token())
+            self.cache_handler.save_token_to_cache(token_info)
+            logger.info("已換發 Spotify access token")
+            return token_info
+
+    def refresh_in_background(self):
+        if self._refreshing.is_set():
+            return
+        self._refreshing.set()
+
+        def run():
+            try:
+                self.refresh(blocking=False)
+            except Exception as e:
+                logger.error(f"背景換發 Spotify token 失敗: {str(e)}")
+            finally:
+                self._refreshing.clear()
+
+        threading.Thread(target=run, name='spotify-token-refresh', daemon=True).start()
+
+    def start_keepalive(self):
+        """
+        啟動背景執行緒定期檢查 token，即使沒有流量也會在到期前換發，
+        閒置後的第一個請求不必等待換發
+        """
+        if self._keepalive_started:
+            return
+        self._keepalive_started = True
+        interval = max(settings.SPOTIFY_TOKEN_REFRESH_MARGIN // 3, 10)
+
+        def loop():
+            while True:
+                try:
+                    token_info = self.cache_handler.get_cached_token()
+                    if not token_info or self.needs_refresh(token_info):
+                        self.refresh(blocking=False)
+                except Exception as e:
+                    logger.warning(f"定期換發 Spotify token 失敗: {str(e)}")
+                time.sleep(interval)
+
+        threading.Thread(target=loop, name='spotify-token-keepalive', daemon=True).start()
@@ -1,3 +1,1333 @@
-from django.test import TestCase
+import http.server
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import redis
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from spotipy.exceptions import SpotifyException
+
+from . import feed_cache, hot_ranking
+from .catalog import hydrate_tracks, load_track_catalog
+from .cache import ResultCache
+from .circuit import CircuitBreaker
+from .clients import TmdbResponse
+from .coalesce import coalesce
+from .exceptions import CircuitOpen, RateLimited
+from .models import Comment, Movie, Playlist, PlaylistTrack, Post, PostHotScore, Track, Watchlist
+from .serializers import PostSerializer
+from .pagination import encode_cursor
+from .projections import IMAGE_SIZES, MOVIE_DETAIL, parse_image_sizes
+from .ratelimit import BACKGROUND, BLOCKED_KEY, INTERACTIVE, SpotifyScheduler, spotify_priority
+from .post_search import tokenize
+from .movie_catalog import save_movies
+from .outbound import OutboundSession, record
+from .posts import hot_feed_queryset, parse_post_ids, reconcile_like_counts, toggle_like
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# 需要真正 Redis 的測試（Lua script、鍵的 TTL）使用的獨立 db，每個測試前後會清空
+TEST_REDIS_URL = os.getenv('TEST_REDIS_URL') or urlsplit(settings.REDIS_URL)._replace(path='/15').geturl()
+
+
+class ViewsImportBenchmark(SimpleTestCase):
+    """匯入 api.views 不應該有任何網路連線"""
+
+    # 在獨立的 process 中量測，避免受到已匯入模組的影響
+    SCRIPT = textwrap.dedent('''
+        import json
+        import socket
+        import time
+
+        import django
+
+        django.setup()
+
+        attempts = []
+
+        def blocked(*args, **kwargs):
+            attempts.append(repr(args[1:] or args)[:200])
+            raise OSError('network disabled during import benchmark')
+
+        socket.socket.connect = blocked
+        socket.create_connection = blocked
+        socket.getaddrinfo = blocked
+
+        started = time.perf_counter()
+        import api.views  # noqa: F401
+        elapsed = time.perf_counter() - started
+
+        print(json.dumps({'elapsed': elapsed, 'attempts': attempts}))
+    ''')
+
+    def test_import_does_no_network_io(self):
+        result = subprocess.run(
+            [sys.executable, '-c', self.SCRIPT],
+            cwd=BACKEND_DIR,
+            env=os.environ.copy(),
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+
+        self.assertEqual(report['attempts'], [])
+        # 沒有網路等待時，匯入應在數秒內完成
+        self.assertLess(
+            report['elapsed'], 5.0, f"import api.views 耗時 {report['elapsed'] * 1000:.1f} ms"
+        )
+
+
+class FeedCacheDisabledMixin:
+    """
+    貼文列表快取存放在 REDIS_URL 指向的 Redis，與快取無關的測試停用快取，
+    避免讀到其他測試或前一次執行留下的頁面（TestCase 不執行 on_commit，版本不會遞增）
+    """
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('api.feed_cache.versions', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class PostListQueryCountTest(FeedCacheDisabledMixin, TestCase):
+    """貼文列表的查詢次數固定，不隨貼文、評論與按讚數量增加"""
+
+    # 貼文（含作者與註記）一次、評論（含作者）一次；登入使用者另外查詢一次按讚狀態
+    EXPECTED_QUERIES = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.users = [User.objects.create_user(username=f'user{i}', password='x') for i in range(5)]
+        cls.viewer = cls.users[0]
+
+    def create_posts(self, count):
+        for i in range(count):
+            author = self.users[i % len(self.users)]
+            post = Post.objects.create(title=f'貼文 {i}', content='內容', author=author, category='音樂')
+            for user in self.users[:i % len(self.users)]:
+                toggle_like(post.id, user.id)
+            Comment.objects.bulk_create([
+                Comment(post=post, author=user, content='評論') for user in self.users[:2]
+            ])
+
+    def fetch(self, user=None):
+        client = APIClient()
+        if user:
+            client.force_authenticate(user)
+        with self.assertNumQueries(self.EXPECTED_QUERIES + (1 if user else 0)):
+            response = client.get('/api/posts/', {'limit': 50})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_query_count_independent_of_page_size(self):
+        for total in (5, 50):
+            self.create_posts(total - Post.objects.count())
+            for user in (None, self.viewer):
+                self.assertEqual(len(self.fetch(user)), total)
+
+    def test_annotated_fields(self):
+        self.create_posts(5)
+        data = {post['title']: post for post in self.fetch(self.viewer)}
+        liked_by_viewer = set(self.viewer.liked_posts.values_list('title', flat=True))
+        for post in Post.objects.all():
+            item = data[post.title]
+            self.assertEqual(item['likes_count'], post.likes.count())
+            self.assertEqual(item['is_liked'], post.title in liked_by_viewer)
+            self.assertEqual(len(item['comments']), 2)
+            self.assertEqual(item['comment_count'], 2)
+            self.assertEqual(item['author']['username'], post.author.username)
+        for item in self.fetch():
+            self.assertFalse(item['is_liked'])
+
+
+class PostCursorPaginationTest(FeedCacheDisabledMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = get_user_model().objects.create_user(username='author', password='x')
+        posts = Post.objects.bulk_create([
+            Post(title=f'貼文 {i}', content='內容', author=cls.author, category='音樂' if i % 2 else '電影')
+            for i in range(25)
+        ])
+        # 一半的貼文使用相同的 created_at，確認同一時間點的資料不會重複或遺漏
+        Post.objects.filter(id__in=[post.id for post in posts[:12]]).update(created_at=posts[0].created_at)
+
+    def walk(self, params):
+        seen, cursor = [], None
+        while True:
+            response = self.client.get('/api/posts/', {**params, 'cursor': cursor} if cursor else params)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            seen.extend(post['id'] for post in data['results'])
+            cursor = data['next_cursor']
+            if not cursor:
+                return seen
+
+    def test_walks_every_post_once_in_order(self):
+        expected = list(Post.objects.order_by('-created_at', 'id').values_list('id', flat=True))
+        self.assertEqual(self.walk({'limit': 4}), expected)
+
+    def test_category_filter(self):
+        expected = list(
+            Post.objects.filter(category='電影').order_by('-created_at', 'id').values_list('id', flat=True)
+        )
+        self.assertEqual(self.walk({'limit': 5, 'category': '電影'}), expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/posts/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+
+    def test_deep_page_reads_from_cursor_position(self):
+        # 後面的頁面以 cursor 條件從索引上的位置開始讀，不使用 OFFSET
+        deep = Post.objects.order_by('-created_at', 'id')[20]
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/posts/', {'cursor': encode_cursor(deep.created_at, deep.id), 'limit': 4})
+        page_sql = next(query['sql'] for query in queries if query['sql'].startswith('SELECT "api_post"'))
+        self.assertIn('"api_post"."created_at" <=', page_sql)
+        self.assertIn('ORDER BY "api_post"."created_at" DESC, "api_post"."id" ASC LIMIT 5', page_sql)
+        self.assertNotIn('OFFSET', page_sql)
+
+
+@skipUnless(os.getenv('RUN_SLOW_BENCHMARKS'), '設定 RUN_SLOW_BENCHMARKS=1 才執行（需建立 2 萬篇貼文）')
+class PostPaginationBenchmark(FeedCacheDisabledMixin, TestCase):
+    """資料量增加時，第一頁與最後幾頁的延遲都應維持平穩"""
+
+    SIZES = (2_000, 20_000)
+    RUNS = 7
+
+    def page_latency(self, params):
+        timings = []
+        for _ in range(self.RUNS):
+            started = time.perf_counter()
+            response = self.client.get('/api/posts/', params)
+            timings.append(time.perf_counter() - started)
+            self.assertEqual(response.status_code, 200)
+        return statistics.median(timings)
+
+    def test_latency_flat_as_table_grows(self):
+        author = get_user_model().objects.create_user(username='author', password='x')
+        results = {}
+        for size in self.SIZES:
+            Post.objects.bulk_create(
+                [
+                    Post(title=f'貼文 {i}', content='內容', author=author, category='音樂')
+                    for i in range(size - Post.objects.count())
+                ],
+                batch_size=5_000,
+            )
+            # 大量寫入後更新統計資料（正式環境由 autovacuum 負責）
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE api_post')
+            # 從倒數第 100 筆的位置往後取一頁
+            deep = Post.objects.order_by('-created_at', 'id')[size - 100]
+            cursor = encode_cursor(deep.created_at, deep.id)
+            results[size] = {
+                'first': self.page_latency({'category': '音樂'}),
+                'deep': self.page_latency({'category': '音樂', 'cursor': cursor}),
+            }
+
+        report = ', '.join(
+            f"posts={size}: first={timing['first'] * 1000:.1f} ms, deep={timing['deep'] * 1000:.1f} ms"
+            for size, timing in results.items()
+        )
+        small, large = results[self.SIZES[0]], results[self.SIZES[-1]]
+        # 資料量 10 倍時不應有明顯成長（預留計時誤差）
+        self.assertLess(large['deep'], large['first'] * 3 + 0.02, report)
+        self.assertLess(large['first'], small['first'] * 3 + 0.02, report)
+        self.assertLess(large['deep'], small['deep'] * 3 + 0.02, report)
+
+
+@override_settings(POST_FEED_COMMENTS=3)
+class PostCommentThreadTest(FeedCacheDisabledMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = get_user_model().objects.create_user(username='author', password='x')
+        cls.busy = Post.objects.create(title='熱門', content='內容', author=cls.author, category='音樂')
+        cls.quiet = Post.objects.create(title='冷門', content='內容', author=cls.author, category='音樂')
+        Comment.objects.bulk_create(
+            [Comment(post=cls.busy, author=cls.author, content=f'評論 {i}') for i in range(30)]
+            + [Comment(post=cls.quiet, author=cls.author, content='唯一的評論')]
+        )
+
+    def test_feed_embeds_latest_comments_only(self):
+        with self.assertNumQueries(2):
+            data = {post['id']: post for post in self.client.get('/api/posts/').json()['results']}
+        latest = list(
+            self.busy.comments.order_by('-created_at', 'id').values_list('id', flat=True)[:3]
+        )
+        self.assertEqual([c['id'] for c in data[self.busy.id]['comments']], latest)
+        self.assertEqual(data[self.busy.id]['comment_count'], 30)
+        self.assertEqual(len(data[self.quiet.id]['comments']), 1)
+        self.assertEqual(data[self.quiet.id]['comment_count'], 1)
+
+    def test_comment_thread_pagination(self):
+        url = f'/api/posts/{self.busy.id}/comments/'
+        seen, params = [], {'limit': 7}
+        while True:
+            data = self.client.get(url, params).json()
+            seen.extend(comment['id'] for comment in data['results'])
+            if not data['next_cursor']:
+                break
+            params = {'limit': 7, 'cursor': data['next_cursor']}
+        expected = list(self.busy.comments.order_by('-created_at', 'id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+
+class PostLikeConcurrencyTest(TransactionTestCase):
+    """並行按讚時 like_count 必須與按讚紀錄一致"""
+
+    USERS = 12
+
+    def setUp(self):
+        User = get_user_model()
+        self.users = User.objects.bulk_create([User(username=f'liker{i}') for i in range(self.USERS)])
+        self.post = Post.objects.create(title='貼文', content='內容', author=self.users[0], category='音樂')
+
+    def run_parallel(self, calls):
+        barrier = threading.Barrier(len(calls))
+        errors = []
+
+        def run(user_id):
+            try:
+                barrier.wait()
+                toggle_like(self.post.id, user_id)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(user_id,)) for user_id in calls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def assert_consistent(self):
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, self.post.likes.count())
+        return self.post.like_count
+
+    def test_parallel_likes_from_many_users(self):
+        self.run_parallel([user.id for user in self.users])
+        self.assertEqual(self.assert_consistent(), self.USERS)
+
+        self.run_parallel([user.id for user in self.users[:5]])
+        self.assertEqual(self.assert_consistent(), self.USERS - 5)
+
+    def test_parallel_double_taps(self):
+        # 每位使用者同時送出兩次，結果可能是按讚或取消，但數字必須一致
+        self.run_parallel([user.id for user in self.users[:6] for _ in range(2)])
+        self.assert_consistent()
+
+    def test_reconcile_repairs_drift(self):
+        for user in self.users[:3]:
+            toggle_like(self.post.id, user.id)
+        Post.objects.filter(pk=self.post.pk).update(like_count=42)
+
+        self.assertEqual(reconcile_like_counts(dry_run=True), 1)
+        output = io.StringIO()
+        call_command('reconcile_like_counts', batch_size=1, stdout=output)
+        self.assertIn('已修正 1 篇', output.getvalue())
+        self.assertEqual(self.assert_consistent(), 3)
+        self.assertEqual(reconcile_like_counts(), 0)
+
+    def test_like_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.users[1])
+        url = f'/api/posts/{self.post.id}/like/'
+        self.assertEqual(client.post(url).json(), {'status': 'liked', 'likes_count': 1})
+        self.assertEqual(client.post(url).json(), {'status': 'unliked', 'likes_count': 0})
+        self.assertEqual(client.post('/api/posts/999999/like/').status_code, 404)
+
+    def test_edit_keeps_concurrent_likes(self):
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        original_update = PostSerializer.update
+
+        def update(serializer, instance, validated_data):
+            # 編輯請求讀取貼文後、儲存前，另一個請求按讚並提交
+            toggle_like(self.post.id, self.users[1].id)
+            return original_update(serializer, instance, validated_data)
+
+        with mock.patch.object(PostSerializer, 'update', update):
+            response = client.patch(f'/api/posts/{self.post.id}/', {'title': '新標題'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.title, '新標題')
+        self.assertEqual(self.assert_consistent(), 1)
+
+
+class PostSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = get_user_model().objects.create_user(username='author', password='x')
+
+        def create(title, content, category='音樂'):
+            return Post.objects.create(title=title, content=content, author=author, category=category)
+
+        cls.soundtrack = create('電影配樂推薦', '最近重聽了星際效應的配樂，漢斯季默真的厲害')
+        cls.concert = create('演唱會心得', '昨天的演唱會最後安可唱了電影主題曲')
+        cls.jazz = create('Jazz playlist', 'Some late night <b>jazz</b> for studying', category='分享')
+        cls.other = create('日常', '今天天氣很好')
+
+    def search(self, q, **params):
+        response = self.client.get('/api/posts/search/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_tokenize_cjk_bigrams(self):
+        self.assertEqual(tokenize('電影配樂 OST!'), '電影 影配 配樂 樂 ost')
+
+    def test_vector_rewritten_only_when_text_changes(self):
+        post = Post.objects.get(pk=self.other.pk)
+        post.category = '討論'
+        with CaptureQueriesContext(connection) as queries:
+            post.save()
+        self.assertFalse(any('search_vector' in query['sql'] for query in queries))
+
+        post.title = '日常配樂'
+        with CaptureQueriesContext(connection) as queries:
+            post.save()
+        self.assertTrue(any('to_tsvector' in query['sql'] for query in queries))
+        self.assertEqual([item['id'] for item in self.search('配樂')], [self.soundtrack.id, post.id])
+
+    def test_chinese_substring_ranked_by_title(self):
+        results = self.search('電影')
+        self.assertEqual([post['id'] for post in results], [self.soundtrack.id, self.concert.id])
+        self.assertEqual(results[0]['highlight']['title'], '<mark>電影</mark>配樂推薦')
+        self.assertIn('<mark>電影</mark>主題曲', results[1]['highlight']['content'])
+
+    def test_multiple_terms_and_single_character(self):
+        self.assertEqual([post['id'] for post in self.search('配樂 季默')], [self.soundtrack.id])
+        self.assertEqual([post['id'] for post in self.search('演唱會')], [self.concert.id])
+        self.assertEqual({post['id'] for post in self.search('曲')}, {self.concert.id})
+        self.assertEqual(self.search('火星'), [])
+
+    def test_latin_terms_category_and_escaping(self):
+        results = self.search('JAZZ', category='分享')
+        self.assertEqual([post['id'] for post in results], [self.jazz.id])
+        self.assertIn('&lt;b&gt;<mark>jazz</mark>&lt;/b&gt;', results[0]['highlight']['content'])
+        self.assertEqual(self.search('jazz', category='音樂'), [])
+
+    def test_vector_follows_edits(self):
+        self.other.title = '電影之夜'
+        self.other.save()
+        self.assertIn(self.other.id, [post['id'] for post in self.search('電影')])
+
+    def test_empty_query(self):
+        self.assertEqual(self.client.get('/api/posts/search/', {'q': ' ?! '}).status_code, 400)
+
+
+@skipUnless(os.getenv('RUN_SLOW_BENCHMARKS'), '設定 RUN_SLOW_BENCHMARKS=1 才執行（需建立 100 萬篇貼文）')
+class PostSearchBenchmark(TestCase):
+    """100 萬篇貼文時，搜尋延遲應維持在固定上限以下"""
+
+    ROWS = int(os.getenv('POST_SEARCH_BENCHMARK_ROWS', 1_000_000))
+    VOCABULARY = 5_000
+    RUNS = 5
+    MAX_LATENCY = 0.2  # 秒
+
+    # 常用字，組成隨機的二至四字詞
+    CHARS = (
+        '的一是在不了有和人這中大為上個國我以要他時來用們生到作地於出就分對成會可主發年動同工也能下過子說產種面而方後'
+        '多定行學法所民得經十三之進著等部度家電力裡如水化高自二理起小物現實加量都兩體制機當使點從業本去把性好應開它合還'
+        '因由其些然前外天政四日那社義事平形相全表間樣與關各重新線內數正心反你明看原又麼利比或但質氣第向道命此變條只沒結'
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(42)
+        words = set()
+        while len(words) < cls.VOCABULARY:
+            if rng.random() < 0.8:
+                words.add(''.join(rng.choice(cls.CHARS) for _ in range(rng.randint(2, 4))))
+            else:
+                words.add(''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 8))))
+        cls.words = sorted(words)
+        author = get_user_model().objects.create_user(username='author', password='x')
+        tokens = {word: tokenize(word) for word in cls.words}
+
+        # 以 COPY 寫入暫存表後一次轉入 api_post；單字之間以空白分隔，
+        # 整段的斷詞結果等於各單字斷詞結果相連，不需要逐篇呼叫 tokenize。
+        # 大量寫入時先移除 GIN 索引，寫入後再一次建立
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE bench_post (n int, title text, content text, title_tokens text, content_tokens text)'
+            )
+            for start in range(0, cls.ROWS, 100_000):
+                lines = []
+                for n in range(start, min(start + 100_000, cls.ROWS)):
+                    title = rng.choices(cls.words, k=4)
+                    content = rng.choices(cls.words, k=30)
+                    lines.append('\t'.join([
+                        str(n),
+                        ' '.join(title),
+                        ' '.join(content),
+                        ' '.join(tokens[word] for word in title),
+                        ' '.join(tokens[word] for word in content),
+                    ]))
+                cursor.copy_expert('COPY bench_post FROM STDIN', io.StringIO('\n'.join(lines) + '\n'))
+
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute('DROP INDEX post_search_idx')
+            cursor.execute(
+                """
+                INSERT INTO api_post (title, content, author_id, category, created_at, updated_at, like_count, search_vector)
+                SELECT title, content, %s, '音樂', now() - n * interval '1 second', now(), 0,
+                       setweight(to_tsvector('simple', title_tokens), 'A')
+                       || setweight(to_tsvector('simple', content_tokens), 'B')
+                FROM bench_post
+                """,
+                [author.id],
+            )
+            cursor.execute('CREATE INDEX post_search_idx ON api_post USING gin (search_vector)')
+            cursor.execute('ANALYZE api_post')
+
+    def latency(self, q):
+        timings = []
+        for _ in range(self.RUNS):
+            started = time.perf_counter()
+            response = self.client.get('/api/posts/search/', {'q': q})
+            timings.append(time.perf_counter() - started)
+            self.assertEqual(response.status_code, 200)
+        return statistics.median(timings), len(response.json()['results'])
+
+    def test_search_latency_at_one_million_posts(self):
+        rng = random.Random(7)
+        cjk_words = [word for word in self.words if tokenize(word) != word]
+        queries = (
+            [rng.choice(cjk_words) for _ in range(3)]
+            + [f'{rng.choice(cjk_words)} {rng.choice(cjk_words)}' for _ in range(3)]
+            + [rng.choice([word for word in self.words if word.isascii()])]
+        )
+        for q in queries:
+            elapsed, count = self.latency(q)
+            self.assertLess(elapsed, self.MAX_LATENCY, f"q={q!r}: {elapsed * 1000:.1f} ms, {count} results")
+
+
+class PostFeedInvalidationTest(TestCase):
+    """貼文、評論與按讚在交易提交後使列表快取失效"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='author', password='x')
+        cls.post = Post.objects.create(title='貼文', content='內容', author=cls.user, category='電影')
+
+    def invalidated(self, write):
+        with mock.patch('api.feed_cache.invalidate') as invalidate:
+            with self.captureOnCommitCallbacks(execute=True):
+                write()
+        return [call.args for call in invalidate.call_args_list]
+
+    def test_post_writes_bump_global_version(self):
+        self.assertEqual(
+            self.invalidated(lambda: Post.objects.create(title='新', content='內容', author=self.user, category='音樂')),
+            [()],
+        )
+        self.assertEqual(self.invalidated(self.post.delete), [()])
+
+    def test_comment_and_like_bump_category(self):
+        self.assertEqual(
+            self.invalidated(lambda: Comment.objects.create(post=self.post, author=self.user, content='評論')),
+            [({'電影'},)],
+        )
+        self.assertEqual(self.invalidated(lambda: toggle_like(self.post.id, self.user.id)), [({'電影'},)])
+        self.assertEqual(self.invalidated(lambda: toggle_like(self.post.id, self.user.id)), [({'電影'},)])
+        self.assertEqual(self.invalidated(lambda: self.user.liked_posts.add(self.post)), [({'電影'},)])
+
+
+class PostFeedCacheTest(TestCase):
+    """列表快取存放未登入版本的頁面，登入使用者命中快取後再覆寫 is_liked"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.author = User.objects.create_user(username='author', password='x')
+        cls.viewer = User.objects.create_user(username='viewer', password='x')
+        cls.posts = [
+            Post.objects.create(title=f'貼文 {i}', content='內容', author=cls.author, category='音樂')
+            for i in range(3)
+        ]
+        toggle_like(cls.posts[1].id, cls.viewer.id)
+
+    def setUp(self):
+        # 以記憶體取代 Redis，內容與 ResultCache 相同以 JSON 儲存
+        self.pages = {}
+        self.versions = [1, 1]
+        for patcher in (
+            mock.patch('api.feed_cache.versions', side_effect=lambda category: tuple(self.versions)),
+            mock.patch.object(
+                feed_cache.post_feed_cache, 'get',
+                side_effect=lambda key, allow_stale=False: json.loads(self.pages[key]) if key in self.pages else None,
+            ),
+            mock.patch.object(
+                feed_cache.post_feed_cache, 'set',
+                side_effect=lambda key, value: self.pages.__setitem__(key, json.dumps(value)),
+            ),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def fetch(self, user=None, queries=0):
+        client = APIClient()
+        if user:
+            client.force_authenticate(user)
+        with self.assertNumQueries(queries):
+            response = client.get('/api/posts/')
+        self.assertEqual(response.status_code, 200)
+        return response['X-Cache'], {post['id']: post['is_liked'] for post in response.json()['results']}
+
+    def test_hit_after_miss(self):
+        cache_status, anonymous = self.fetch(queries=2)
+        self.assertEqual(cache_status, 'MISS')
+        # ETag 與快取共用同一個快取鍵，每個請求只讀取一次版本號
+        self.assertEqual(feed_cache.versions.call_count, 1)
+        self.assertEqual(len(self.pages), 1)
+        self.assertEqual(self.fetch(), ('HIT', anonymous))
+
+    def test_is_liked_overlay_on_hit(self):
+        self.fetch(queries=2)
+        # 命中快取後只查詢一次按讚狀態
+        cache_status, liked = self.fetch(self.viewer, queries=1)
+        self.assertEqual(cache_status, 'HIT')
+        self.assertEqual(liked, {post.id: post == self.posts[1] for post in self.posts})
+        # 快取內容仍是未登入的版本
+        cache_status, anonymous = self.fetch()
+        self.assertEqual(cache_status, 'HIT')
+        self.assertFalse(any(anonymous.values()))
+
+    def test_logged_in_miss_caches_anonymous_page(self):
+        cache_status, liked = self.fetch(self.viewer, queries=3)
+        self.assertEqual(cache_status, 'MISS')
+        self.assertTrue(liked[self.posts[1].id])
+        cache_status, anonymous = self.fetch()
+        self.assertEqual(cache_status, 'HIT')
+        self.assertFalse(any(anonymous.values()))
+
+    def test_version_bump_misses(self):
+        self.fetch(queries=2)
+        post = Post.objects.create(title='新貼文', content='內容', author=self.author, category='音樂')
+        self.assertNotIn(post.id, self.fetch()[1])
+        self.versions[0] += 1
+        cache_status, anonymous = self.fetch(queries=2)
+        self.assertEqual(cache_status, 'MISS')
+        self.assertIn(post.id, anonymous)
+
+
+class PostLikeStatusTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.viewer = User.objects.create_user(username='viewer', password='x')
+        cls.other = User.objects.create_user(username='other', password='x')
+        cls.posts = [
+            Post.objects.create(title=f'貼文 {i}', content='內容', author=cls.other, category='音樂')
+            for i in range(3)
+        ]
+        toggle_like(cls.posts[0].id, cls.viewer.id)
+        toggle_like(cls.posts[0].id, cls.other.id)
+        toggle_like(cls.posts[1].id, cls.other.id)
+
+    def fetch(self, ids, user=None):
+        client = APIClient()
+        if user:
+            client.force_authenticate(user)
+        return client.get('/api/posts/like-status/', {'ids': ids})
+
+    def test_one_query_for_many_posts(self):
+        ids = ','.join(str(post.id) for post in self.posts) + ',999999'
+        with self.assertNumQueries(1):
+            response = self.fetch(ids, self.viewer)
+        self.assertEqual(response.json()['likes'], {
+            str(self.posts[0].id): {'is_liked': True, 'likes_count': 2},
+            str(self.posts[1].id): {'is_liked': False, 'likes_count': 1},
+            str(self.posts[2].id): {'is_liked': False, 'likes_count': 0},
+        })
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_anonymous(self):
+        likes = self.fetch(str(self.posts[0].id)).json()['likes']
+        self.assertEqual(likes, {str(self.posts[0].id): {'is_liked': False, 'likes_count': 2}})
+
+    def test_duplicates_collapsed(self):
+        post_id = str(self.posts[0].id)
+        self.assertEqual(list(self.fetch(f'{post_id}, {post_id},{post_id}').json()['likes']), [post_id])
+        self.assertEqual(parse_post_ids('3,1,3,2,1'), [3, 1, 2])
+
+    def test_invalid_ids(self):
+        valid = str(self.posts[0].id)
+        for ids in ('', 'abc', f'{valid},abc', f'{valid},,{valid}', f'{valid},', '²', f'{valid},-1'):
+            response = self.fetch(ids)
+            self.assertEqual(response.status_code, 400, ids)
+            self.assertIn('error', response.json())
+        self.assertEqual(self.fetch(','.join(str(i) for i in range(1, 302))).status_code, 400)
+        self.assertEqual(self.fetch(','.join(str(i) for i in range(1, 301))).status_code, 200)
+
+    def test_stops_after_limit(self):
+        # 超過上限後的內容不會被解析
+        with self.assertRaisesMessage(ValueError, 'ids 最多 3 個'):
+            parse_post_ids('1,2,3,4,' + 'x' * 10_000, limit=3)
+
+
+class ConditionalGetTest(TestCase):
+    """未變更的資源回傳 304，只執行驗證值的彙總查詢"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user(username='owner', password='x')
+        cls.playlist = Playlist.objects.create(name='播放列表', owner=cls.owner)
+        Track.objects.create(spotify_id='4uLU6hMCjMI75M1A2tKUQC', name='歌曲', fetched_at=timezone.now())
+        cls.watchlist = Watchlist.objects.create(name='片單', owner=cls.owner)
+
+    def assert_not_modified(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        return etag
+
+    def test_playlists(self):
+        list_etag = self.assert_not_modified('/api/playlists/')
+        detail_url = f'/api/playlists/{self.playlist.id}/'
+        detail_etag = self.assert_not_modified(detail_url)
+
+        # 新增曲目會更新播放列表的 updated_at
+        PlaylistTrack.objects.create(playlist=self.playlist, track_id='4uLU6hMCjMI75M1A2tKUQC')
+        self.assertEqual(self.client.get('/api/playlists/', HTTP_IF_NONE_MATCH=list_etag).status_code, 200)
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag).status_code, 200)
+
+    @mock.patch('api.catalog._executor')
+    def test_playlist_etag_follows_track_hydration(self, executor):
+        PlaylistTrack.objects.create(playlist=self.playlist, track_id='missing')
+        list_etag = self.assert_not_modified('/api/playlists/')
+        detail_url = f'/api/playlists/{self.playlist.id}/'
+        detail_etag = self.assert_not_modified(detail_url)
+
+        # 背景補齊歌曲資料不會更新播放列表，ETag 仍需改變
+        Track.objects.create(spotify_id='missing', name='補齊的歌曲', fetched_at=timezone.now())
+        for url, etag in (('/api/playlists/', list_etag), (detail_url, detail_etag)):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_watchlists(self):
+        etag = self.assert_not_modified('/api/watchlists/')
+        Watchlist.objects.create(name='新片單', owner=self.owner)
+        self.assertEqual(self.client.get('/api/watchlists/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assert_not_modified(f'/api/watchlists/{self.watchlist.id}/')
+
+    def test_missing_resource(self):
+        self.assertEqual(self.client.get('/api/playlists/999999/').status_code, 404)
+        self.assertEqual(self.client.get('/api/watchlists/abc/').status_code, 404)
+
+    @mock.patch.object(feed_cache.post_feed_cache, 'set')
+    @mock.patch.object(feed_cache.post_feed_cache, 'get', return_value=None)
+    def test_posts_use_feed_versions(self, cache_get, cache_set):
+        post = Post.objects.create(title='貼文', content='內容', author=self.owner, category='音樂')
+        with mock.patch('api.feed_cache.versions', return_value=(1, 1)):
+            response = self.client.get('/api/posts/')
+            etag = response['ETag']
+            self.assertEqual(self.client.get('/api/posts/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            detail_etag = self.client.get(f'/api/posts/{post.id}/')['ETag']
+            self.assertEqual(
+                self.client.get(f'/api/posts/{post.id}/', HTTP_IF_NONE_MATCH=detail_etag).status_code, 304
+            )
+        with mock.patch('api.feed_cache.versions', return_value=(1, 2)):
+            self.assertEqual(self.client.get('/api/posts/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+            self.assertEqual(
+                self.client.get(f'/api/posts/{post.id}/', HTTP_IF_NONE_MATCH=detail_etag).status_code, 200
+            )
+
+
+class PostHotRankingTest(FeedCacheDisabledMixin, TestCase):
+    """熱門分數依互動數與時間衰減排序，熱門列表依分數索引分頁"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.users = User.objects.bulk_create([User(username=f'fan{i}') for i in range(8)])
+        now = timezone.now()
+        # (分類, 幾小時前, 按讚數, 評論數)
+        specs = [
+            ('音樂', 1, 0, 0),
+            ('音樂', 2, 4, 0),
+            ('電影', 3, 1, 2),
+            ('音樂', 30, 8, 0),
+            ('電影', 72, 8, 3),
+            ('音樂', 5, 2, 1),
+        ]
+        cls.posts = []
+        for i, (category, hours, likes, comments) in enumerate(specs):
+            post = Post.objects.create(title=f'貼文 {i}', content='內容', author=cls.users[0], category=category)
+            Post.objects.filter(pk=post.pk).update(created_at=now - timezone.timedelta(hours=hours))
+            for user in cls.users[:likes]:
+                toggle_like(post.id, user.id)
+            Comment.objects.bulk_create([
+                Comment(post=post, author=cls.users[0], content='評論') for _ in range(comments)
+            ])
+            cls.posts.append(post)
+        hot_ranking.rebuild_all()
+
+    def expected_ids(self, category=None):
+        scores = PostHotScore.objects.all()
+        if category:
+            scores = scores.filter(category=category)
+        return list(scores.order_by('-score', 'post_id').values_list('post_id', flat=True))
+
+    def fetch_all(self, **params):
+        ids, cursor = [], None
+        while True:
+            query = {'ordering': 'hot', 'limit': 2, **params}
+            if cursor:
+                query['cursor'] = cursor
+            with self.assertNumQueries(2):
+                response = APIClient().get('/api/posts/', query)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(post['id'] for post in response.json()['results'])
+            cursor = response.json()['next_cursor']
+            if not cursor:
+                return ids
+
+    def test_score_decays_with_age(self):
+        created_at = timezone.now()
+        half_life = timezone.timedelta(hours=24)
+        with self.settings(POST_HOT_HALF_LIFE_HOURS=24, POST_HOT_COMMENT_WEIGHT=2):
+            # 早一個半衰期的貼文需要兩倍的 (1 + 互動數) 才同樣熱門
+            self.assertAlmostEqual(
+                hot_ranking.hot_score(3, 0, created_at),
+                hot_ranking.hot_score(7, 0, created_at - half_life),
+            )
+            self.assertAlmostEqual(
+                hot_ranking.hot_score(2, 0, created_at),
+                hot_ranking.hot_score(0, 1, created_at),
+            )
+            self.assertGreater(
+                hot_ranking.hot_score(0, 0, created_at),
+                hot_ranking.hot_score(5, 0, created_at - half_life * 3),
+            )
+
+    def test_pages_follow_scores(self):
+        self.assertEqual(self.fetch_all(), self.expected_ids())
+        self.assertEqual(self.fetch_all(category='電影'), self.expected_ids('電影'))
+        self.assertEqual(len(self.expected_ids()), len(self.posts))
+
+    def test_invalid_cursor(self):
+        response = APIClient().get('/api/posts/', {'ordering': 'hot', 'cursor': encode_cursor(timezone.now(), 1)})
+        self.assertEqual(response.status_code, 400)
+
+    def test_dirty_posts_are_recomputed(self):
+        post = self.posts[0]
+        with mock.patch('api.hot_ranking.mark_dirty') as mark_dirty:
+            with self.captureOnCommitCallbacks(execute=True):
+                Comment.objects.create(post=post, author=self.users[1], content='評論')
+                toggle_like(post.id, self.users[1].id)
+        self.assertEqual([call.args for call in mark_dirty.call_args_list], [([post.id],), ([post.id],)])
+
+        before = PostHotScore.objects.get(post=post).score
+        fake_redis = mock.Mock()
+        fake_redis.spop.side_effect = [[str(post.id).encode()], []]
+        with mock.patch('api.hot_ranking.get_redis', return_value=fake_redis), \
+                mock.patch('api.feed_cache.invalidate') as invalidate:
+            self.assertEqual(hot_ranking.update_dirty(), 1)
+        self.assertAlmostEqual(PostHotScore.objects.get(post=post).score - before, 2)
+        invalidate.assert_called_once_with({'音樂'})
+
+    @skipUnless(os.getenv('RUN_SLOW_BENCHMARKS'), '設定 RUN_SLOW_BENCHMARKS=1 才執行（需建立 5 千篇貼文，結果依查詢規劃而定）')
+    def test_page_uses_score_index(self):
+        posts = Post.objects.bulk_create([
+            Post(title=f'貼文 {i}', content='內容', author=self.users[0], category=('音樂', '電影')[i % 2])
+            for i in range(5000)
+        ])
+        hot_ranking.recompute([post.pk for post in posts])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE api_post')
+            cursor.execute('ANALYZE api_posthotscore')
+        for category in (None, '電影'):
+            queryset = hot_feed_queryset(None, category).order_by('-hot__score', 'id')[:21]
+            plan = queryset.explain()
+            self.assertIn('post_hot', plan)
+            self.assertNotIn('Sort', plan.splitlines()[1])
+
+
+class SnapshotParamsTest(SimpleTestCase):
+    """快照只接受設定中的市場與語言，其他值不會建立新的快照"""
+
+    @override_settings(SPOTIFY_NEW_RELEASES_MARKETS='TW,JP')
+    def test_unknown_market_rejected(self):
+        with mock.patch('api.new_releases.get_snapshot') as get_snapshot:
+            response = self.client.get('/api/spotify/new-releases/', {'market': 'zz'})
+        self.assertEqual(response.status_code, 400)
+        get_snapshot.assert_not_called()
+
+    @override_settings(TMDB_SNAPSHOT_LOCALES='zh-TW:TW,en-US:US')
+    def test_unknown_locale_rejected(self):
+        with mock.patch('api.movie_snapshots.load_snapshot') as load_snapshot:
+            for params in ({'language': 'ja-JP', 'region': 'JP'}, {'language': 'en-US', 'region': 'TW'}):
+                response = self.client.get('/api/tmdb/trending-movies/', params)
+                self.assertEqual(response.status_code, 400)
+        load_snapshot.assert_not_called()
+
+
+class ResultCacheFormatTest(SimpleTestCase):
+    """舊版本格式（直接存放 JSON 值）的快取資料視為未命中並刪除"""
+
+    def setUp(self):
+        self.client_mock = mock.MagicMock()
+        self.pipe = self.client_mock.pipeline.return_value
+        patcher = mock.patch('api.cache.get_redis', return_value=self.client_mock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = ResultCache('test', ttl=60, max_entries=10)
+
+    def test_old_entries_are_misses(self):
+        for raw in (json.dumps({'tracks': {'items': []}}), json.dumps([1, 2]), 'not json'):
+            self.pipe.reset_mock()
+            self.client_mock.get.return_value = raw
+            self.assertIsNone(self.cache.get('key'))
+            self.assertEqual(self.cache.lookup('key'), (None, False))
+            self.pipe.delete.assert_called_with(self.cache.data_key('key'))
+
+        self.client_mock.mget.return_value = [json.dumps({'a': 1}), self.cache._encode('ok', 60, time.time())]
+        self.assertEqual(self.cache.get_many(['old', 'new']), {'new': 'ok'})
+        self.pipe.delete.assert_called_with(self.cache.data_key('old'))
+
+
+class CoalesceTest(SimpleTestCase):
+    """等待中的請求在負責呼叫的請求失敗後重新合併呼叫一次"""
+
+    def setUp(self):
+        patcher = mock.patch('api.coalesce.get_redis', side_effect=redis.RedisError('offline'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_waiters_retry_after_leader_fails(self):
+        calls = []
+        started, release = threading.Event(), threading.Event()
+
+        def upstream():
+            calls.append(threading.current_thread().name)
+            if len(calls) == 1:
+                started.set()
+                release.wait(5)
+                raise ValueError('upstream failed')
+            return 'ok'
+
+        results = {}
+
+        def run(name):
+            try:
+                results[name] = coalesce('test:key', upstream)
+            except ValueError as e:
+                results[name] = e
+
+        leader = threading.Thread(target=run, args=('leader',))
+        leader.start()
+        started.wait(5)
+        waiters = [threading.Thread(target=run, args=(f'waiter{i}',)) for i in range(3)]
+        for thread in waiters:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in [leader, *waiters]:
+            thread.join(5)
+
+        self.assertIsInstance(results.pop('leader'), ValueError)
+        self.assertEqual(set(results.values()), {'ok'})
+        # 第一次失敗後只再呼叫上游一次
+        self.assertEqual(len(calls), 2)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TrackCatalogTest(TestCase):
+    """播放列表的歌曲資料從本地讀取，缺少的歌曲在背景補齊且不重複補齊"""
+
+    @staticmethod
+    def spotify_track(track_id):
+        return {
+            'id': track_id,
+            'name': f'歌曲 {track_id}',
+            'artists': [{'id': 'artist', 'name': '歌手'}],
+            'album': {'id': 'album', 'name': '專輯', 'images': [{'url': 'https://i.scdn.co/image/x'}]},
+            'duration_ms': 1000,
+            'external_urls': {'spotify': f'https://open.spotify.com/track/{track_id}'},
+        }
+
+    def setUp(self):
+        self.spotify = mock.Mock()
+        self.spotify.tracks.side_effect = lambda ids: {'tracks': [self.spotify_track(i) for i in ids]}
+        # 未指定 LOCATION 的 LocMemCache 共用同一份資料，清除其他測試留下的補齊標記
+        cache.clear()
+        patcher = mock.patch('api.catalog._executor')
+        self.executor = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_missing_tracks_hydrated_once(self):
+        Track.objects.create(spotify_id='known', name='歌曲', fetched_at=timezone.now())
+        with self.assertNumQueries(1):
+            catalog = load_track_catalog(['known', 'missing', 'known'], lambda: self.spotify)
+        self.assertEqual(list(catalog), ['known'])
+        self.assertEqual(self.executor.submit.call_count, 1)
+
+        # 補齊進行中，其他請求不會再排入相同的歌曲
+        load_track_catalog(['missing'], lambda: self.spotify)
+        self.assertEqual(self.executor.submit.call_count, 1)
+
+        run = self.executor.submit.call_args.args[0]
+        # 背景執行緒結束時會關閉自己的資料庫連線，這裡在測試的連線上執行
+        with mock.patch('api.catalog.connection'):
+            run()
+        self.assertEqual(Track.objects.get(spotify_id='missing').album_name, '專輯')
+        self.assertEqual(list(load_track_catalog(['missing'], lambda: self.spotify)), ['missing'])
+        self.assertEqual(self.executor.submit.call_count, 1)
+
+    def test_hydrate_in_batches(self):
+        track_ids = [f'track{i}' for i in range(60)]
+        self.assertEqual(hydrate_tracks(lambda: self.spotify, track_ids), 60)
+        self.assertEqual([len(call.args[0]) for call in self.spotify.tracks.call_args_list], [50, 10])
+        self.assertEqual(hydrate_tracks(lambda: self.spotify, track_ids), 0)
+
+
+class ProjectionImageSizeTest(SimpleTestCase):
+    def test_default_sizes_are_served_by_tmdb(self):
+        movie = {
+            'poster_path': '/p.jpg',
+            'similar': {'results': [{'id': 2, 'poster_path': '/s.jpg'}]},
+        }
+        data = MOVIE_DETAIL.project(movie, only=['poster_path', 'similar_movies'])
+        for url in (data['poster_path'], data['similar_movies'][0]['poster_path']):
+            self.assertIn(url.split('/')[-2], IMAGE_SIZES['poster'])
+
+    def test_sizes_are_scoped_per_field(self):
+        movie = {
+            'poster_path': '/p.jpg',
+            'similar': {'results': [{'id': 2, 'poster_path': '/s.jpg'}]},
+        }
+        sizes = parse_image_sizes({'poster_size': 'original', 'similar_movies.poster_size': 'w92', 'backdrop_size': 'w1'})
+        self.assertEqual(sizes, {'poster': 'original', 'similar_movies': {'poster': 'w92'}})
+        data = MOVIE_DETAIL.project(movie, only=['poster_path', 'similar_movies'], image_sizes=sizes)
+        self.assertTrue(data['poster_path'].endswith('/original/p.jpg'))
+        self.assertTrue(data['similar_movies'][0]['poster_path'].endswith('/w92/s.jpg'))
+        data = MOVIE_DETAIL.project(movie, only=['similar_movies'], image_sizes={'poster': 'original'})
+        self.assertTrue(data['similar_movies'][0]['poster_path'].endswith('/w185/s.jpg'))
+
+
+class MovieCatalogTest(TestCase):
+    """電影搜尋依 page 分頁，本地不足一頁時以 TMDB 補足；快取命中時不寫入本地資料"""
+
+    @classmethod
+    def setUpTestData(cls):
+        save_movies([
+            {'id': i, 'title': f'Starlight {i}', 'popularity': 100 - i} for i in range(1, 26)
+        ])
+
+    def setUp(self):
+        self.tmdb = mock.Mock()
+        patcher = mock.patch('api.views.tmdb_client.get', return_value=self.tmdb)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def search(self, page):
+        response = self.client.get('/api/movies/search/', {'q': 'Starlight', 'limit': 10, 'page': page})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_local_pages(self):
+        first, second = self.search(1), self.search(2)
+        self.assertEqual([movie['id'] for movie in first['results']], list(range(1, 11)))
+        self.assertEqual([movie['id'] for movie in second['results']], list(range(11, 21)))
+        self.assertEqual((first['source'], first['total_pages']), ('local', 2))
+        self.tmdb.fetch.assert_not_called()
+
+    def test_short_local_page_falls_through_to_tmdb(self):
+        remote = [{'id': 21, 'title': 'Starlight 21'}, {'id': 900, 'title': 'Starlight Express'}]
+        self.tmdb.fetch.return_value = TmdbResponse(200, {'results': remote, 'total_pages': 4}, from_cache=True)
+        with mock.patch('api.views.record_movies') as record_movies:
+            data = self.search(3)
+        self.assertEqual(self.tmdb.fetch.call_args.kwargs['params']['page'], 3)
+        self.assertEqual([movie['id'] for movie in data['results']], [21, 22, 23, 24, 25, 900])
+        self.assertEqual((data['source'], data['total_pages']), ('mixed', 4))
+        record_movies.assert_not_called()
+
+        self.tmdb.fetch.return_value = TmdbResponse(200, {'results': remote, 'total_pages': 4})
+        with mock.patch('api.views.record_movies') as record_movies:
+            self.search(3)
+        record_movies.assert_called_once_with(remote)
+
+    def test_detail_records_only_fresh_payloads(self):
+        detail = {'id': 5, 'title': 'Starlight 5', 'similar': {'results': []}}
+        for from_cache, calls in ((True, 0), (False, 1)):
+            self.tmdb.fetch.return_value = TmdbResponse(200, detail, from_cache=from_cache)
+            with mock.patch('api.views.record_movies') as record_movies:
+                self.assertEqual(self.client.get('/api/tmdb/movies/5/').status_code, 200)
+            self.assertEqual(record_movies.call_count, calls)
+        self.assertEqual(Movie.objects.count(), 25)
+
+
+class OutboundSessionTest(SimpleTestCase):
+    """502/503/504 只對冪等的方法重試；延遲分佈為累積計數"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.hits = []
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def respond(self):
+                cls.hits.append(self.command)
+                # 每個請求的前兩次回傳 503
+                code = 503 if len(cls.hits) % 3 else 200
+                self.send_response(code)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            do_GET = do_POST = respond
+
+            def log_message(self, *args):
+                pass
+
+        cls.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f'http://127.0.0.1:{cls.server.server_address[1]}/'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.hits.clear()
+        patcher = mock.patch('api.outbound.record')
+        self.record = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(OUTBOUND_RETRIES=2, OUTBOUND_BACKOFF_FACTOR=0, OUTBOUND_BACKOFF_JITTER=0.01)
+    def test_retries_idempotent_requests_only(self):
+        session = OutboundSession('127.0.0.1')
+        self.assertEqual(session.get(self.url).status_code, 200)
+        self.assertEqual(self.hits, ['GET'] * 3)
+
+        self.hits.clear()
+        self.assertEqual(session.post(self.url).status_code, 503)
+        self.assertEqual(self.hits, ['POST'])
+        # 每次呼叫（含重試）只記錄一次
+        self.assertEqual(self.record.call_count, 2)
+
+    def test_latency_buckets_are_cumulative(self):
+        pipe = mock.MagicMock()
+        with mock.patch('api.outbound.get_redis') as get_redis:
+            get_redis.return_value.pipeline.return_value = pipe
+            record('example.com', 120, status_code=200)
+        buckets = [call.args[1] for call in pipe.hincrby.call_args_list if call.args[1].startswith('le_')]
+        self.assertEqual(buckets, ['le_250', 'le_500', 'le_1000', 'le_2500', 'le_5000', 'le_inf'])
+
+
+class RedisTestMixin:
+    """
+    以 TEST_REDIS_URL 的 Redis 取代 redis_modules 中的 get_redis，無法連線時略過測試
+    """
+
+    redis_modules = ()
+
+    def setUp(self):
+        super().setUp()
+        self.redis = redis.Redis.from_url(
+            TEST_REDIS_URL, decode_responses=True, socket_connect_timeout=1, socket_timeout=1
+        )
+        try:
+            self.redis.flushdb()
+        except redis.RedisError:
+            self.skipTest(f'無法連線到測試用 Redis（TEST_REDIS_URL={TEST_REDIS_URL}）')
+        self.addCleanup(self.redis.flushdb)
+        for module in self.redis_modules:
+            patcher = mock.patch(f'{module}.get_redis', return_value=self.redis)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class CircuitBreakerTest(RedisTestMixin, SimpleTestCase):
+    """斷路器在 closed、open、half-open 之間的轉換"""
+
+    redis_modules = ('api.circuit',)
+
+    def setUp(self):
+        super().setUp()
+        self.now = 1_000_000.0
+        patcher = mock.patch('api.circuit.time')
+        patcher.start().time.side_effect = lambda: self.now
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker('test', failure_threshold=3, failure_window=60, recovery_timeout=30)
+        self.upstream = mock.Mock(return_value='ok')
+
+    def fail(self, exc=None):
+        self.upstream.side_effect = exc or requests.ConnectionError('逾時')
+        with self.assertRaises(type(self.upstream.side_effect)):
+            self.breaker.call(self.upstream)
+        self.upstream.side_effect = None
+
+    def open_circuit(self):
+        for _ in range(3):
+            self.fail()
+        self.assertEqual(self.breaker.status()['state'], 'open')
+
+    def test_opens_at_threshold(self):
+        self.fail()
+        self.fail()
+        self.assertEqual(self.breaker.status(), {'state': 'closed', 'failures': 2, 'opened_at': None})
+        self.fail()
+        self.assertEqual(self.breaker.status(), {'state': 'open', 'failures': 3, 'opened_at': self.now})
+        self.upstream.reset_mock()
+        with self.assertRaises(CircuitOpen):
+            self.breaker.call(self.upstream)
+        self.upstream.assert_not_called()
+
+    def test_client_errors_are_not_failures(self):
+        for _ in range(5):
+            self.fail(SpotifyException(404, -1, '找不到歌曲'))
+        self.assertEqual(self.breaker.status()['state'], 'closed')
+        self.assertEqual(self.breaker.status()['failures'], 0)
+
+    def test_single_probe_when_half_open(self):
+        self.open_circuit()
+        self.now += 31
+        self.assertEqual(self.breaker.status()['state'], 'half_open')
+        self.breaker.before_call()
+        # 試探請求進行中，其他 worker 仍被拒絕
+        with self.assertRaises(CircuitOpen):
+            self.breaker.before_call()
+
+    def test_probe_failure_reopens(self):
+        self.open_circuit()
+        self.now += 31
+        self.fail()
+        self.assertEqual(self.breaker.status()['opened_at'], self.now)
+        self.now += 29
+        with self.assertRaises(CircuitOpen):
+            self.breaker.call(self.upstream)
+        self.now += 2
+        self.assertEqual(self.breaker.call(self.upstream), 'ok')
+
+    def test_probe_success_closes(self):
+        self.open_circuit()
+        self.now += 31
+        self.assertEqual(self.breaker.call(self.upstream), 'ok')
+        self.assertEqual(self.breaker.status()['state'], 'closed')
+        self.assertFalse(self.redis.exists(self.breaker.key, self.breaker.probe_key))
+        self.assertEqual(self.breaker.call(self.upstream), 'ok')
+
+    def test_probe_client_error_closes(self):
+        # 上游有回應（4xx）代表已恢復，不應讓其他 worker 再等一個恢復週期
+        self.open_circuit()
+        self.now += 31
+        self.fail(SpotifyException(404, -1, '找不到歌曲'))
+        self.assertEqual(self.breaker.status()['state'], 'closed')
+        self.assertFalse(self.redis.exists(self.breaker.probe_key))
+        self.assertEqual(self.breaker.call(self.upstream), 'ok')
+
+
+@override_settings(
+    SPOTIFY_RATE_LIMIT_BURST=10,
+    SPOTIFY_RATE_LIMIT_PER_SECOND=0.01,  # 測試期間幾乎不會補充額度
+    SPOTIFY_RATE_LIMIT_BACKGROUND_RESERVE=0.3,
+    SPOTIFY_RATE_LIMIT_INTERACTIVE_MAX_WAIT=0.2,
+    SPOTIFY_RATE_LIMIT_BACKGROUND_MAX_WAIT=3,
+)
+class SpotifySchedulerTest(RedisTestMixin, SimpleTestCase):
+    """所有 worker 共用的 token bucket、背景工作的保留額度與 429 暫停"""
+
+    redis_modules = ('api.ratelimit',)
+    TRACK_URL = 'https://api.spotify.com/v1/tracks/4uLU6hMCjMI75M1A2tKUQC'
+
+    def setUp(self):
+        super().setUp()
+        self.scheduler = SpotifyScheduler()
+
+    def acquire_until_refused(self, priority):
+        """以指定優先權取得額度直到被拒絕，回傳 (成功次數, RateLimited)"""
+        granted = 0
+        with spotify_priority(priority):
+            while granted <= 10:
+                try:
+                    self.scheduler.acquire('tracks')
+                except RateLimited as e:
+                    return granted, e
+                granted += 1
+        self.fail('額度用完後仍未被拒絕')
+
+    def test_background_leaves_reserve_for_interactive(self):
+        granted, error = self.acquire_until_refused(BACKGROUND)
+        # 10 個額度中保留 3 個給使用者
+        self.assertEqual(granted, 7)
+        self.assertGreater(error.retry_after, 3)
+        granted, error = self.acquire_until_refused(INTERACTIVE)
+        self.assertEqual(granted, 3)
+        self.assertGreater(error.retry_after, 0.2)
+        metrics = self.scheduler.metrics()['endpoints']['tracks']
+        self.assertEqual((metrics['calls'], metrics['rejected']), (10, 2))
+
+    @override_settings(SPOTIFY_RATE_LIMIT_BURST=1, SPOTIFY_RATE_LIMIT_PER_SECOND=20)
+    def test_short_waits_are_absorbed(self):
+        # 需要等待的時間在 max_wait 內時等待後取得額度，不拋出例外
+        for _ in range(3):
+            self.scheduler.acquire('tracks')
+        self.assertGreater(self.scheduler.metrics()['endpoints']['tracks']['waited_seconds'], 0)
+
+    def test_retry_after_blocks_every_caller(self):
+        throttled = SpotifyException(429, -1, '請求過於頻繁', headers={'Retry-After': '0.5'})
+        with self.assertRaises(RateLimited) as ctx:
+            self.scheduler.call(self.TRACK_URL, mock.Mock(side_effect=throttled))
+        self.assertEqual(ctx.exception.retry_after, 0.5)
+        blocked_until = float(self.redis.get(BLOCKED_KEY))
+        self.assertAlmostEqual(blocked_until, time.time() + 0.5, delta=0.2)
+
+        # 較短的 Retry-After 不會縮短暫停時間
+        self.scheduler.on_throttled('tracks/:id', SpotifyException(429, -1, '', headers={'Retry-After': '0.1'}))
+        self.assertEqual(float(self.redis.get(BLOCKED_KEY)), blocked_until)
+
+        # 額度充足，但暫停期間使用者的請求超過可等待的時間
+        with self.assertRaises(RateLimited) as ctx:
+            self.scheduler.acquire('tracks/:id')
+        self.assertGreater(ctx.exception.retry_after, 0.2)
+        # 背景工作等到 blocked_until 之後才取得額度
+        with spotify_priority(BACKGROUND):
+            self.scheduler.acquire('tracks/:id')
+        self.assertGreaterEqual(time.time(), blocked_until)
+
+        metrics = self.scheduler.metrics()['endpoints']['tracks/:id']
+        # 被限流的那次呼叫也有取得額度
+        self.assertEqual((metrics['throttled'], metrics['rejected'], metrics['calls']), (2, 1, 2))
+
+    def test_throttle_without_retry_after_is_reraised(self):
+        # spotipy 重試用盡後的 429 沒有 Retry-After，不暫停其他 worker
+        with self.assertRaises(SpotifyException):
+            self.scheduler.call(self.TRACK_URL, mock.Mock(side_effect=SpotifyException(429, -1, '', headers={})))
+        self.assertIsNone(self.redis.get(BLOCKED_KEY))
@@ -0,0 +1,82 @@
+"""
+TMDB 回應的 HTTP 快取
+
+回應內容連同 ETag / Last-Modified 一起存放在共用快取，依端點設定不同的 TTL：
+- 未過期：直接回傳快取，不連線 TMDB
+- 已過期：先回傳舊資料（stale-while-revalidate），
+  再由單一 worker 在背景以條件式請求重新驗證，304 時只延長期限
+- 沒有快取：同步呼叫 TMDB
+只有 200 的回應會被快取。
+"""
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+# 依序比對路徑，第一個符合的規則決定 TTL
+TTL_RULES = [
+    (re.compile(r'^/trending/'), settings.TMDB_CACHE_TTL_TRENDING),
+    (re.compile(r'^/movie/(upcoming|now_playing|popular|top_rated)$'), settings.TMDB_CACHE_TTL_LISTS),
+    (re.compile(r'^/movie/\d+$'), settings.TMDB_CACHE_TTL_MOVIE),
+    (re.compile(r'^/configuration$'), settings.TMDB_CACHE_TTL_MOVIE),
+]
+
+REVALIDATE_LOCK_KEY = 'tmdb:http:revalidating:{key}'
+REVALIDATE_LOCK_TIMEOUT = 30  # 秒
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='tmdb-revalidate')
+
+tmdb_http_cache = ResultCache(
+    'tmdb:http',
+    ttl=settings.TMDB_CACHE_TTL_DEFAULT,
+    max_entries=settings.TMDB_CACHE_MAX_ENTRIES,
+    stale_ttl=settings.TMDB_CACHE_STALE_TTL,
+)
+
+
+def ttl_for(path):
+    for pattern, ttl in TTL_RULES:
+        if pattern.match(path):
+            return ttl
+    return settings.TMDB_CACHE_TTL_DEFAULT
+
+
+def conditional_headers(cached):
+    """依快取的驗證資訊產生條件式請求的 header"""
+    headers = {}
+    if cached and cached.get('etag'):
+        headers['If-None-Match'] = cached['etag']
+    if cached and cached.get('last_modified'):
+        headers['If-Modified-Since'] = cached['last_modified']
+    return headers
+
+
+def schedule_revalidation(key, func):
+    """在背景重新驗證已過期的資料，同一筆資料同一時間只有一個 worker 會執行"""
+    lock_key = REVALIDATE_LOCK_KEY.format(key=key)
+    try:
+        if not cache.add(lock_key, 1, timeout=REVALIDATE_LOCK_TIMEOUT):
+            return False
+    except Exception as e:
+        logger.warning(f"取得 TMDB 重新驗證鎖失敗: {str(e)}")
+        return False
+
+    def run():
+        try:
+            func()
+        except Exception as e:
+            logger.warning(f"背景重新驗證 TMDB 資料失敗: {str(e)}")
+        finally:
+            try:
+                cache.delete(lock_key)
+            except Exception:
+                pass  # 鎖本身有逾時
+
+    _executor.submit(run)
+    return True
@@ -9,6 +9,7 @@ from .views import (
     protected_view,
     spotify_search,
     get_preview_url,
+    get_preview_urls,
     PostViewSet,
     CommentViewSet,
     get_csrf_token,
@@ -18,6 +19,7 @@ from .views import (
     spotify_new_releases,
     tmdb_featured_lists,
     tmdb_movie_detail,
+    movie_search,
     set_refresh_token,
     clear_refresh_token,
     refresh_token,
@@ -52,10 +54,12 @@ urlpatterns = [
     path('protected/', protected_view, name='protected'),
     path('spotify/search/', spotify_search, name='spotify_search'),
     path('spotify/preview/<str:track_id>/', get_preview_url, name='get_preview_url'),
+    path('spotify/previews/', get_preview_urls, name='get_preview_urls'),
     path('spotify/new-releases/', spotify_new_releases, name='spotify_new_releases'),
     path('tmdb/featured-lists/', tmdb_featured_lists, name='tmdb_featured_lists'),
     path('tmdb/movies/<int:movie_id>/', tmdb_movie_detail, name='tmdb_movie_detail'),
     path('tmdb/trending-movies/', tmdb_trending_movies, name='tmdb_trending_movies'),
+    path('movies/search/', movie_search, name='movie_search'),
     path('playlists/<int:playlist_id>/cover/', PlaylistCoverUploadView.as_view(), name='playlist-cover-upload'),
     path('playlists/<int:playlist_id>/share/', PlaylistShareView.as_view(), name='playlist-share'),
     path('playlists/share/<str:share_code>/', PlaylistShareView.as_view(), name='playlist-share-view'),
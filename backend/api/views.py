@@ -10,14 +10,11 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
-import os
 from dotenv import load_dotenv
 import logging
 import base64
 import requests
-import time
+import math
 from .models import Post, Comment, Playlist, Watchlist, PlaylistTrack, PlaylistCollaborator, SmartPlaylist
 from .serializers import PostSerializer, CommentSerializer, PlaylistSerializer, WatchlistSerializer, PlaylistCreateSerializer, PlaylistTrackSerializer, PlaylistCollaboratorSerializer, SmartPlaylistSerializer, SmartPlaylistCreateSerializer
 from rest_framework import serializers
@@ -35,6 +32,20 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.views import APIView
 from django.utils.crypto import get_random_string
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from .cache import spotify_preview_cache, spotify_search_cache, wants_bypass
+from .catalog import playlist_catalog_updated_at, save_tracks
+from .movie_catalog import MAX_SEARCH_PAGE, movie_to_tmdb, record_movies, search_local
+from . import feed_cache, movie_snapshots, new_releases, outbound, post_search, posts, projections, search
+from .clients import spotify_client, tmdb_client
+from .conditional import ConditionalGetMixin, aggregate_validators, make_etag, user_key
+from .circuit import is_upstream_failure, spotify_breaker, tmdb_breaker
+from .exceptions import CircuitOpen, RateLimited, SpotifyUnavailable, UpstreamUnavailable
+from .pagination import HotKeysetPagination, KeysetPagination
+from .previews import MAX_IDS_PER_REQUEST, parse_track_ids, resolve_preview_urls
+from .ratelimit import spotify_scheduler
+from .tmdb_cache import tmdb_http_cache
+from datetime import datetime, timezone as dt_timezone
 
 # 配置日誌
 logger = logging.getLogger(__name__)
@@ -48,70 +59,6 @@ def generate_access_token(user):
 
 load_dotenv()
 
-# 檢查環境變數
-client_id = os.getenv('SPOTIFY_CLIENT_ID')
-client_secret = os.getenv('SPOTIFY_CLIENT_SECRET')
-
-logger.info(f"SPOTIFY_CLIENT_ID length: {len(client_id) if client_id else 0}")
-logger.info(f"SPOTIFY_CLIENT_SECRET length: {len(client_secret) if client_secret else 0}")
-
-# 全局變量
-spotify = None
-last_init_time = 0
-INIT_COOLDOWN = 5  # 冷卻時間（秒）
-
-def initialize_spotify_client():
-    """初始化 Spotify 客戶端，包含重試邏輯"""
-    global spotify, last_init_time
-    
-    current_time = time.time()
-    if current_time - last_init_time < INIT_COOLDOWN:
-        logger.warning("初始化請求過於頻繁，等待冷卻時間")
-        return False
-        
-    last_init_time = current_time
-    
-    # 詳細檢查憑證
-    if not client_id:
-        logger.error("缺少 SPOTIFY_CLIENT_ID")
-        return False
-    if not client_secret:
-        logger.error("缺少 SPOTIFY_CLIENT_SECRET")
-        return False
-        
-    logger.info(f"使用憑證 - Client ID: {client_id[:5]}... Secret: {client_secret[:5]}...")
-    
-    try:
-        # 使用 SpotifyClientCredentials 進行認證
-        client_credentials_manager = SpotifyClientCredentials(
-            client_id=client_id,
-            client_secret=client_secret
-        )
-        
-        # 初始化 Spotify 客戶端
-        spotify = spotipy.Spotify(
-            client_credentials_manager=client_credentials_manager,
-            requests_timeout=10,
-            retries=3
-        )
-        
-        # 測試搜索功能
-        logger.info("測試 Spotify API 連接...")
-        test_results = spotify.search(q='test', limit=1, type='track')
-        if not test_results or 'tracks' not in test_results:
-            logger.error("API 測試失敗: 無效的回應格式")
-            return False
-            
-        logger.info("Spotify 客戶端初始化成功")
-        return True
-        
-    except Exception as e:
-        logger.error(f"初始化過程中發生錯誤: {str(e)}")
-        return False
-
-# 初始化 Spotify 客戶端
-initialize_spotify_client()
-
 # ✅ 1. 用戶註冊 API
 @api_view(['POST'])
 def register_user(request):
@@ -221,12 +168,16 @@ def protected_view(request):
     return Response({"username": request.user.username})
 
 
-# Spotify 搜尋 API
+# Spotify 搜尋 API（以 cursor 分頁）
 @api_view(['GET'])
 def spotify_search(request):
-    global spotify
     query = request.GET.get('q', '').strip()
     search_type = request.GET.get('type', 'track')
+    market = request.GET.get('market') or None
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 50)
+    except ValueError:
+        limit = 20
     
     logger.info(f"接收到搜尋請求: query='{query}', type='{search_type}'")
     
@@ -236,19 +187,37 @@ def spotify_search(request):
             {"error": "搜尋查詢不能為空"},
             status=status.HTTP_400_BAD_REQUEST
         )
+    if search_type not in search.SEARCH_TYPES:
+        return Response(
+            {"error": f"不支援的搜尋類型，請使用 {', '.join(search.SEARCH_TYPES)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        offset = search.decode_cursor(request.GET.get('cursor'))
+    except ValueError as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    # 檢查並初始化 Spotify 客戶端
-    retry_count = 0
-    max_retries = 3
+    def respond(payload, cache_status):
+        # 背景預取下一頁，使用者捲動到下一頁時直接命中快取
+        search.schedule_prefetch(
+            spotify_client.get, query, search_type, market, limit, payload.get('next_cursor')
+        )
+        response = Response(payload)
+        response['X-Cache'] = cache_status
+        return response
     
-    while not spotify and retry_count < max_retries:
-        logger.info(f"嘗試初始化 Spotify 客戶端 (嘗試 {retry_count + 1}/{max_retries})")
-        if initialize_spotify_client():
-            break
-        retry_count += 1
-        if retry_count < max_retries:
-            time.sleep(1)
+    # 先查共用快取，命中時不需要連線 Spotify
+    cache_key = search.cache_key(query, search_type, market, limit, offset)
+    bypass = wants_bypass(request)
+    if not bypass:
+        cached = spotify_search_cache.get(cache_key)
+        if cached is not None:
+            return respond(cached, 'HIT')
     
+    spotify = spotify_client.get()
     if not spotify:
         error_msg = "無法初始化 Spotify 客戶端"
         logger.error(error_msg)
@@ -261,15 +230,26 @@ def spotify_search(request):
         )
     
     try:
-        results = spotify.search(q=query, type=search_type, limit=20)
-        tracks = results['tracks']['items']
-        return Response({
-            'tracks': {
-                'items': tracks,
-                'total': len(tracks)
-            }
-        })
+        payload = search.fetch_page(spotify, query, search_type, market, limit, offset)
+        spotify_search_cache.set(cache_key, payload)
+        return respond(payload, 'BYPASS' if bypass else 'MISS')
     except Exception as e:
+        # Spotify 故障或斷路器開啟時，改回傳已過期的快取資料
+        if isinstance(e, (CircuitOpen, RateLimited)) or is_upstream_failure(e):
+            stale = spotify_search_cache.get(cache_key, allow_stale=True)
+            if stale is not None:
+                logger.warning(f"Spotify 無法使用，回傳過期的搜尋結果: {str(e)}")
+                response = Response(stale)
+                response['X-Cache'] = 'STALE'
+                return response
+        if isinstance(e, (CircuitOpen, RateLimited)):
+            response = Response(
+                {"error": str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            if getattr(e, 'retry_after', None):
+                response['Retry-After'] = str(math.ceil(e.retry_after))
+            return response
         error_msg = f"搜尋過程中發生錯誤: {str(e)}"
         logger.error(error_msg)
         return Response(
@@ -280,79 +260,218 @@ def spotify_search(request):
 # 獲取音樂預覽 URL
 @api_view(['GET'])
 def get_preview_url(request, track_id):
-    global spotify
     logger.info(f"請求音樂預覽 URL: track_id={track_id}")
     
-    if not spotify and not initialize_spotify_client():
-        error_msg = "無法初始化 Spotify 客戶端"
+    try:
+        preview_url = resolve_preview_urls(spotify_client.get, [track_id]).get(track_id)
+    except UpstreamUnavailable as e:
+        logger.error(str(e))
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    except Exception as e:
+        error_msg = f"獲取預覽 URL 時發生錯誤: {str(e)}"
         logger.error(error_msg)
         return Response(
             {"error": error_msg},
-            status=status.HTTP_503_SERVICE_UNAVAILABLE
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    if not preview_url:
+        error_msg = "該歌曲無預覽版本"
+        logger.warning(error_msg)
+        return Response(
+            {"error": error_msg},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    return Response({"preview_url": preview_url})
+
+# 批次獲取音樂預覽 URL
+@api_view(['GET'])
+def get_preview_urls(request):
+    track_ids = parse_track_ids(request.GET.get('ids'))
+    
+    if not track_ids:
+        return Response(
+            {"error": "需要提供有效的 ids"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(track_ids) > MAX_IDS_PER_REQUEST:
+        return Response(
+            {"error": f"ids 最多 {MAX_IDS_PER_REQUEST} 個"},
+            status=status.HTTP_400_BAD_REQUEST
         )
     
     try:
-        track = spotify.track(track_id)
-        preview_url = track.get('preview_url')
-        
-        if not preview_url:
-            error_msg = "該歌曲無預覽版本"
-            logger.warning(error_msg)
-            return Response(
-                {"error": error_msg},
-                status=status.HTTP_404_NOT_FOUND
-            )
-            
-        logger.info(f"成功獲取預覽 URL: {preview_url}")
-        return Response({"preview_url": preview_url})
-        
+        previews = resolve_preview_urls(spotify_client.get, track_ids)
+    except UpstreamUnavailable as e:
+        logger.error(str(e))
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
     except Exception as e:
-        error_msg = f"獲取預覽 URL 時發生錯誤: {str(e)}"
+        error_msg = f"批次獲取預覽 URL 時發生錯誤: {str(e)}"
         logger.error(error_msg)
         return Response(
             {"error": error_msg},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+    
+    return Response({"previews": previews})
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        queryset = Post.objects.all()
         category = self.request.query_params.get('category', None)
-        if category and category != '全部':
-            queryset = queryset.filter(category=category)
-        return queryset
+        return posts.feed_queryset(self.request.user, category)
+
+    @property
+    def paginator(self):
+        # ordering=hot 時依熱門分數分頁，其餘依時間
+        if not hasattr(self, '_paginator'):
+            self._paginator = HotKeysetPagination() if self.feed_ordering() == 'hot' else self.pagination_class()
+        return self._paginator
+
+    def feed_ordering(self):
+        return 'hot' if self.request.query_params.get('ordering') == 'hot' else ''
+
+    def feed_page_key(self):
+        """目前列表頁面的快取鍵（同時作為 ETag），每個請求只讀取一次版本號"""
+        if not hasattr(self, '_feed_page_key'):
+            self._feed_page_key = feed_cache.page_key(
+                self.request.query_params.get('category', None),
+                self.request.query_params.get('cursor'),
+                self.paginator.get_page_size(self.request),
+                self.feed_ordering(),
+            )
+        return self._feed_page_key
+
+    def list_validators(self, request):
+        version = self.feed_page_key()
+        if version is None:
+            return None
+        return make_etag('posts', version, user_key(request)), None
+
+    def detail_validators(self, request, pk):
+        category = Post.objects.filter(pk=pk).values_list('category', flat=True).first()
+        if category is None:
+            return None
+        versions = feed_cache.versions(category)
+        if versions is None:
+            return None
+        return make_etag('post', pk, *versions, user_key(request)), None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, self.list_validators(request), self.cached_list)
+
+    def cached_list(self, request):
+        """
+        貼文列表：未登入版本的頁面存放在共用快取，
+        登入使用者再以一次查詢覆寫 is_liked
+        """
+        category = request.query_params.get('category', None)
+        ordering = self.feed_ordering()
+        cache_key = self.feed_page_key()
+        payload = None
+        if cache_key and not wants_bypass(request):
+            payload = feed_cache.post_feed_cache.get(cache_key)
+        cache_status = 'HIT' if payload is not None else 'MISS'
+        if payload is None:
+            if ordering == 'hot':
+                queryset = posts.hot_feed_queryset(None, category)
+            else:
+                queryset = posts.feed_queryset(None, category)
+            page = self.paginate_queryset(queryset)
+            payload = {
+                'results': self.get_serializer(page, many=True).data,
+                'next_cursor': self.paginator.next_cursor,
+            }
+            if cache_key:
+                feed_cache.post_feed_cache.set(cache_key, payload)
+
+        liked = posts.liked_post_ids(request.user, [post['id'] for post in payload['results']])
+        if liked:
+            payload['results'] = [
+                {**post, 'is_liked': post['id'] in liked} for post in payload['results']
+            ]
+        response = Response(payload)
+        response['X-Cache'] = cache_status
+        return response
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
-    @action(detail=True, methods=['post'])
-    def like(self, request, pk=None):
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """全文檢索貼文，依相關度排序並標示關鍵字"""
+        query = request.query_params.get('q', '').strip()
         try:
-            post = self.get_object()
-            if post.likes.filter(id=request.user.id).exists():
-                post.likes.remove(request.user)
-                return Response({'status': 'unliked'})
-            else:
-                post.likes.add(request.user)
-                return Response({'status': 'liked'})
-        except Exception as e:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 50)
+        except ValueError:
+            limit = 20
+
+        terms = post_search.query_terms(query)
+        if not terms:
             return Response(
-                {'error': str(e)},
+                {"error": "搜尋查詢不能為空"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        queryset = posts.feed_queryset(request.user, request.query_params.get('category'))
+        results = post_search.search_posts(queryset, terms, limit)
+        data = self.get_serializer(results, many=True).data
+        for item, post in zip(data, results):
+            item['rank'] = round(post.rank, 4)
+            item['highlight'] = {
+                'title': post_search.highlight(post.title, terms),
+                'content': post_search.snippet(post.content, terms),
+            }
+        return Response({
+            'results': data,
+            'total_results': len(data),
+        })
+
+    @action(detail=False, methods=['get'], url_path='like-status')
+    def like_status(self, request):
+        """多篇貼文的按讚數與目前使用者的按讚狀態，供快取的列表覆寫個人化欄位"""
+        try:
+            post_ids = posts.parse_post_ids(request.query_params.get('ids'))
+        except ValueError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        response = Response({'likes': posts.like_statuses(request.user, post_ids)})
+        # 內容依使用者而不同，不可被共用快取
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    @action(detail=True, methods=['post'])
+    def like(self, request, pk=None):
+        # 只確認貼文存在，不需要列表用的註記與評論
+        post = get_object_or_404(Post.objects.only('id'), pk=pk)
+        liked, like_count = posts.toggle_like(post.id, request.user.id)
+        return Response({
+            'status': 'liked' if liked else 'unliked',
+            'likes_count': like_count,
+        })
+
 class CommentViewSet(viewsets.ModelViewSet):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         try:
-            return Comment.objects.filter(post_id=self.kwargs['post_pk'])
+            return Comment.objects.filter(post_id=self.kwargs['post_pk']).select_related('author')
         except Exception as e:
             return Comment.objects.none()
 
@@ -390,7 +509,7 @@ def custom_500(request):
 def get_csrf_token(request):
     return Response({'detail': 'CSRF cookie set'})
 
-class PlaylistViewSet(viewsets.ModelViewSet):
+class PlaylistViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = PlaylistSerializer
     permission_classes = [permissions.AllowAny]  # 允許所有用戶訪問
 
@@ -401,16 +520,33 @@ class PlaylistViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         if not self.request.user.is_authenticated:
-            return Playlist.objects.filter(is_public=True)
-        return Playlist.objects.filter(
-            Q(owner=self.request.user) | Q(collaborators__user=self.request.user) | Q(is_public=True)
-        ).distinct()
+            queryset = Playlist.objects.filter(is_public=True)
+        else:
+            queryset = Playlist.objects.filter(
+                Q(owner=self.request.user) | Q(collaborators__user=self.request.user) | Q(is_public=True)
+            ).distinct()
+        # 固定查詢次數：曲目、協作者與歌曲資料各一次
+        return queryset.select_related('owner').prefetch_related(
+            'tracks__added_by', 'collaborators__user'
+        )
 
     def get_serializer_class(self):
         if self.action == 'create':
             return PlaylistCreateSerializer
         return PlaylistSerializer
 
+    def list_validators(self, request):
+        return aggregate_validators(
+            self.get_queryset(), 'playlists', user_key(request),
+            catalog_updated_at=playlist_catalog_updated_at(),
+        )
+
+    def detail_validators(self, request, pk):
+        return aggregate_validators(
+            self.get_queryset().filter(pk=pk), 'playlist', user_key(request),
+            catalog_updated_at=playlist_catalog_updated_at(),
+        )
+
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
@@ -567,10 +703,12 @@ class PlaylistViewSet(viewsets.ModelViewSet):
                 playlist=playlist,
                 track_id=track_id
             ).update(position=position)
+        # update() 不會觸發 signals，直接更新播放列表的 updated_at
+        playlist.touch()
 
         return Response(status=status.HTTP_200_OK)
 
-class WatchlistViewSet(viewsets.ModelViewSet):
+class WatchlistViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = WatchlistSerializer
     permission_classes = [permissions.AllowAny]  # 允許所有用戶訪問
 
@@ -587,6 +725,12 @@ class WatchlistViewSet(viewsets.ModelViewSet):
             models.Q(is_public=True)
         )
 
+    def list_validators(self, request):
+        return aggregate_validators(self.get_queryset(), 'watchlists', user_key(request))
+
+    def detail_validators(self, request, pk):
+        return aggregate_validators(self.get_queryset().filter(pk=pk), 'watchlist', user_key(request))
+
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
@@ -643,76 +787,31 @@ def google_login(request):
 @api_view(['GET'])
 @permission_classes([])
 def spotify_new_releases(request):
-    global spotify
-    logger.info("開始獲取最新音樂")
-    
-    # 檢查並初始化 Spotify 客戶端
-    retry_count = 0
-    max_retries = 3
-    
-    while not spotify and retry_count < max_retries:
-        logger.info(f"嘗試初始化 Spotify 客戶端 (嘗試 {retry_count + 1}/{max_retries})")
-        if initialize_spotify_client():
-            break
-        retry_count += 1
-        if retry_count < max_retries:
-            time.sleep(1)
+    market = (request.GET.get('market') or 'TW').upper()
+    if market not in new_releases.allowed_markets():
+        return Response(
+            {"error": f"不支援的 market: {market}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    logger.info(f"開始獲取最新音樂: market={market}")
     
-    if not spotify:
-        error_msg = "無法初始化 Spotify 客戶端"
-        logger.error(error_msg)
+    try:
+        snapshot = new_releases.get_snapshot(spotify_client.get, market)
+    except (CircuitOpen, RateLimited) as e:
+        logger.error(str(e))
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    except SpotifyUnavailable as e:
+        logger.error(str(e))
         return Response(
             {
-                "error": error_msg,
+                "error": str(e),
                 "details": "請確認 Spotify API 憑證是否正確"
             },
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
-    
-    try:
-        # 獲取最新發行的專輯
-        logger.info("正在獲取最新發行的專輯...")
-        new_releases = spotify.new_releases(limit=20, country='TW')
-        
-        if not new_releases or 'albums' not in new_releases:
-            logger.error("獲取最新發行專輯失敗：無效的回應格式")
-            return Response(
-                {"error": "無法獲取最新音樂"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-        
-        # 處理每個專輯的第一首歌曲
-        tracks = []
-        for album in new_releases['albums']['items']:
-            try:
-                # 獲取專輯的曲目
-                album_tracks = spotify.album_tracks(album['id'])
-                if album_tracks and album_tracks['items']:
-                    # 獲取第一首歌曲的完整信息
-                    track = album_tracks['items'][0]
-                    track_info = spotify.track(track['id'])
-                    
-                    if track_info:
-                        tracks.append({
-                            'id': track_info['id'],
-                            'name': track_info['name'],
-                            'artists': track_info['artists'],
-                            'album': {
-                                'id': album['id'],
-                                'name': album['name'],
-                                'images': album['images']
-                            },
-                            'preview_url': track_info['preview_url'],
-                            'external_urls': track_info['external_urls'],
-                            'duration_ms': track_info['duration_ms']
-                        })
-            except Exception as e:
-                logger.error(f"處理專輯 {album['id']} 時發生錯誤: {str(e)}")
-                continue
-        
-        logger.info(f"成功獲取 {len(tracks)} 首最新音樂")
-        return Response(tracks)
-        
     except Exception as e:
         error_msg = f"獲取最新音樂時發生錯誤: {str(e)}"
         logger.error(error_msg)
@@ -723,108 +822,34 @@ def spotify_new_releases(request):
             },
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+    
+    tracks = snapshot['tracks']
+    logger.info(f"成功獲取 {len(tracks)} 首最新音樂")
+    response = Response(tracks)
+    response['X-Snapshot-Age'] = str(new_releases.snapshot_age(snapshot))
+    response['X-Snapshot-Generated-At'] = datetime.fromtimestamp(
+        snapshot['generated_at'], tz=dt_timezone.utc
+    ).isoformat()
+    return response
 
-@api_view(['GET'])
-def tmdb_featured_lists(request):
-    """獲取 TMDB 即將上映的電影"""
-    if not settings.TMDB_API_KEY:
-        error_msg = "TMDB API Key 未設置"
-        logger.error(error_msg)
+def movie_snapshot_response(request, kind):
+    """回傳預先計算的電影快照，沒有快照時才即時向 TMDB 查詢"""
+    language = request.GET.get('language') or 'zh-TW'
+    region = (request.GET.get('region') or 'TW').upper()
+    if not movie_snapshots.is_allowed_locale(language, region):
         return Response(
-            {"error": error_msg},
-            status=status.HTTP_503_SERVICE_UNAVAILABLE
+            {"error": "不支援的 language 或 region"},
+            status=status.HTTP_400_BAD_REQUEST
         )
 
     try:
-        logger.info("獲取 TMDB 即將上映的電影")
-        # 使用 upcoming 端點獲取即將上映的電影
-        response = requests.get(
-            'https://api.themoviedb.org/3/movie/upcoming',
-            params={
-                'api_key': settings.TMDB_API_KEY,
-                'language': 'zh-TW',  # 使用繁體中文
-                'page': 1,
-                'region': 'TW'  # 獲取台灣地區的上映信息
-            }
+        snapshot = movie_snapshots.load_snapshot(tmdb_client.get, kind, language, region)
+    except (CircuitOpen, movie_snapshots.SnapshotError) as e:
+        logger.error(str(e))
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
         )
-        
-        if response.status_code == 401:
-            error_msg = "無效的 TMDB API Key"
-            logger.error(error_msg)
-            return Response(
-                {"error": error_msg},
-                status=status.HTTP_503_SERVICE_UNAVAILABLE
-            )
-            
-        if response.status_code == 404:
-            error_msg = "TMDB API 端點不存在"
-            logger.error(error_msg)
-            return Response(
-                {"error": error_msg},
-                status=status.HTTP_404_NOT_FOUND
-            )
-            
-        if response.status_code != 200:
-            error_msg = f"TMDB API 錯誤: {response.status_code}"
-            logger.error(f"{error_msg} - {response.text}")
-            return Response(
-                {"error": error_msg},
-                status=status.HTTP_503_SERVICE_UNAVAILABLE
-            )
-            
-        data = response.json()
-        
-        # 格式化電影資訊
-        formatted_movies = []
-        for movie in data.get('results', [])[:6]:  # 只取前 6 部電影
-            # 獲取電影詳細資訊，包括發行日期
-            movie_detail_response = requests.get(
-                f'https://api.themoviedb.org/3/movie/{movie["id"]}',
-                params={
-                    'api_key': settings.TMDB_API_KEY,
-                    'language': 'zh-TW',
-                    'append_to_response': 'release_dates'
-                }
-            )
-            
-            if movie_detail_response.status_code == 200:
-                movie_detail = movie_detail_response.json()
-                
-                # 獲取台灣的上映日期
-                tw_release_date = None
-                if 'release_dates' in movie_detail:
-                    for country in movie_detail['release_dates'].get('results', []):
-                        if country['iso_3166_1'] == 'TW':
-                            for date in country['release_dates']:
-                                if date.get('type') in [3, 2]:  # 3=theatrical, 2=limited
-                                    tw_release_date = date.get('release_date', '').split('T')[0]
-                                    break
-                            break
-                
-                formatted_movie = {
-                    'id': movie['id'],
-                    'title': movie['title'],
-                    'overview': movie['overview'],
-                    'poster_path': f"https://image.tmdb.org/t/p/w500{movie['poster_path']}" if movie['poster_path'] else None,
-                    'backdrop_path': f"https://image.tmdb.org/t/p/original{movie['backdrop_path']}" if movie['backdrop_path'] else None,
-                    'vote_average': movie['vote_average'],
-                    'vote_count': movie['vote_count'],
-                    'release_date': movie['release_date'],
-                    'tw_release_date': tw_release_date
-                }
-                formatted_movies.append(formatted_movie)
-        
-        # 按台灣上映日期排序（最近的在前）
-        formatted_movies.sort(key=lambda x: x['tw_release_date'] or x['release_date'])
-        
-        response_data = {
-            'results': formatted_movies,
-            'total_results': len(formatted_movies)
-        }
-        
-        logger.info(f"成功獲取 TMDB 即將上映的電影，共 {len(formatted_movies)} 部")
-        return Response(response_data)
-        
     except requests.exceptions.RequestException as e:
         error_msg = f"請求 TMDB API 時發生錯誤: {str(e)}"
         logger.error(error_msg)
@@ -832,7 +857,6 @@ def tmdb_featured_lists(request):
             {"error": error_msg},
             status=status.HTTP_503_SERVICE_UNAVAILABLE
         )
-        
     except Exception as e:
         error_msg = f"未預期的錯誤: {str(e)}"
         logger.error(error_msg)
@@ -840,11 +864,41 @@ def tmdb_featured_lists(request):
             {"error": error_msg},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
-    
+
+    schema = movie_snapshots.SCHEMAS[kind]
+    results = schema.project_many(
+        snapshot['data']['results'],
+        only=schema.select(projections.parse_fields(request.GET.get('fields'))),
+        image_sizes=projections.parse_image_sizes(request.GET),
+    )
+    generated_at = datetime.fromtimestamp(snapshot['generated_at'], tz=dt_timezone.utc).isoformat()
+    response = Response({
+        'results': results,
+        'total_results': len(results),
+        'generated_at': generated_at,
+    })
+    response['X-Snapshot-Age'] = str(movie_snapshots.snapshot_age(snapshot))
+    response['X-Snapshot-Generated-At'] = generated_at
+    # 所有使用者看到的內容相同，可由瀏覽器與 CDN 快取
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=settings.TMDB_SNAPSHOT_MAX_AGE,
+        stale_while_revalidate=settings.TMDB_SNAPSHOT_MAX_AGE,
+    )
+    return response
+
+@api_view(['GET'])
+def tmdb_featured_lists(request):
+    """獲取 TMDB 即將上映的電影（預先計算的快照）"""
+    logger.info("獲取 TMDB 即將上映的電影")
+    return movie_snapshot_response(request, movie_snapshots.UPCOMING)
+
 @api_view(['GET'])
 def tmdb_movie_detail(request, movie_id):
     """獲取 TMDB 電影詳細信息"""
-    if not settings.TMDB_API_KEY:
+    tmdb = tmdb_client.get()
+    if not tmdb:
         error_msg = "TMDB API Key 未設置"
         logger.error(error_msg)
         return Response(
@@ -856,10 +910,9 @@ def tmdb_movie_detail(request, movie_id):
         logger.info(f"獲取電影 ID {movie_id} 的詳細信息")
         
         # 獲取電影詳細信息
-        response = requests.get(
-            f'https://api.themoviedb.org/3/movie/{movie_id}',
+        response = tmdb.fetch(
+            f'/movie/{movie_id}',
             params={
-                'api_key': settings.TMDB_API_KEY,
                 'language': 'zh-TW',
                 'append_to_response': 'credits,videos,similar'
             }
@@ -890,65 +943,26 @@ def tmdb_movie_detail(request, movie_id):
             )
             
         movie_detail = response.json()
+        if not response.from_cache:
+            # 只有向 TMDB 取得新資料時才寫入本地電影資料，快取命中不需要再寫一次
+            record_movies([movie_detail, *(movie_detail.get('similar') or {}).get('results', [])])
         
-        # 處理演員信息
-        cast = []
-        if 'credits' in movie_detail and 'cast' in movie_detail['credits']:
-            cast = [{
-                'id': actor['id'],
-                'name': actor['name'],
-                'character': actor['character'],
-                'profile_path': f"https://image.tmdb.org/t/p/w185{actor['profile_path']}" if actor['profile_path'] else None
-            } for actor in movie_detail['credits']['cast'][:5]]  # 只取前5位演員
-        
-        # 處理預告片
-        videos = []
-        if 'videos' in movie_detail and 'results' in movie_detail['videos']:
-            videos = [{
-                'id': video['id'],
-                'key': video['key'],
-                'site': video['site'],
-                'type': video['type']
-            } for video in movie_detail['videos']['results'] if video['site'] == 'YouTube'][:2]  # 只取前2個YouTube預告片
-        
-        # 處理類似電影
-        similar_movies = []
-        if 'similar' in movie_detail and 'results' in movie_detail['similar']:
-            similar_movies = [{
-                'id': similar['id'],
-                'title': similar['title'],
-                'poster_path': f"https://image.tmdb.org/t/p/w200{similar['poster_path']}" if similar['poster_path'] else None,
-                'vote_average': round(float(similar['vote_average']), 1)
-            } for similar in movie_detail['similar']['results'][:6]]  # 只取前6部類似電影
-        
-        formatted_movie = {
-            'id': movie_detail['id'],
-            'title': movie_detail['title'],
-            'original_title': movie_detail.get('original_title'),
-            'overview': movie_detail['overview'],
-            'poster_path': f"https://image.tmdb.org/t/p/w500{movie_detail['poster_path']}" if movie_detail['poster_path'] else None,
-            'backdrop_path': f"https://image.tmdb.org/t/p/original{movie_detail['backdrop_path']}" if movie_detail['backdrop_path'] else None,
-            'vote_average': round(float(movie_detail['vote_average']), 1),
-            'vote_count': movie_detail['vote_count'],
-            'release_date': movie_detail['release_date'],
-            'release_year': movie_detail['release_date'][:4] if movie_detail['release_date'] else None,
-            'runtime': movie_detail.get('runtime'),
-            'genres': [genre['name'] for genre in movie_detail.get('genres', [])],
-            'production_countries': [country['name'] for country in movie_detail.get('production_countries', [])],
-            'spoken_languages': [lang['name'] for lang in movie_detail.get('spoken_languages', [])],
-            'budget': movie_detail.get('budget'),
-            'revenue': movie_detail.get('revenue'),
-            'cast': cast,
-            'videos': videos,
-            'similar_movies': similar_movies,
-            'status': movie_detail.get('status'),
-            'tagline': movie_detail.get('tagline'),
-            'popularity': movie_detail.get('popularity')
-        }
+        formatted_movie = projections.MOVIE_DETAIL.project(
+            movie_detail,
+            only=projections.MOVIE_DETAIL.select(projections.parse_fields(request.GET.get('fields'))),
+            image_sizes=projections.parse_image_sizes(request.GET),
+        )
         
         logger.info(f"成功獲取電影 {movie_id} 的詳細信息")
         return Response(formatted_movie)
         
+    except CircuitOpen as e:
+        logger.error(str(e))
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        
     except requests.exceptions.RequestException as e:
         error_msg = f"請求 TMDB API 時發生錯誤: {str(e)}"
         logger.error(error_msg)
@@ -965,6 +979,84 @@ def tmdb_movie_detail(request, movie_id):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def movie_search(request):
+    """
+    搜尋電影：先查本地索引，本地結果不足一頁時再向 TMDB 搜尋同一頁並補足
+
+    page 從 1 開始；TMDB 每頁固定 20 筆，超過 limit 的部分會被截斷。
+    """
+    query = request.GET.get('q', '').strip()
+    language = request.GET.get('language') or 'zh-TW'
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 50)
+    except ValueError:
+        limit = 20
+    try:
+        page = min(max(int(request.GET.get('page', 1)), 1), MAX_SEARCH_PAGE)
+    except ValueError:
+        page = 1
+
+    if not query:
+        return Response(
+            {"error": "搜尋查詢不能為空"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    schema = projections.MOVIE_SEARCH_RESULT
+    only = schema.select(projections.parse_fields(request.GET.get('fields')))
+    image_sizes = projections.parse_image_sizes(request.GET)
+
+    # 多取一筆判斷本地是否還有下一頁
+    local = [movie_to_tmdb(movie) for movie in search_local(query, limit + 1, (page - 1) * limit)]
+    movies = local[:limit]
+    source = 'local'
+    total_pages = page + 1 if len(local) > limit else page
+    if len(movies) < limit:
+        tmdb = tmdb_client.get()
+        if not tmdb:
+            return Response(
+                {"error": "TMDB API Key 未設置"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        try:
+            response = tmdb.fetch(
+                '/search/movie',
+                params={'query': query, 'language': language, 'page': page, 'include_adult': 'false'}
+            )
+        except (CircuitOpen, requests.exceptions.RequestException) as e:
+            logger.error(f"搜尋 TMDB 電影失敗: {str(e)}")
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        if response.status_code != 200:
+            error_msg = f"TMDB API 錯誤: {response.status_code}"
+            logger.error(error_msg)
+            return Response(
+                {"error": error_msg},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        data = response.json()
+        remote = data.get('results', [])
+        if not response.from_cache:
+            record_movies(remote)
+        seen = {movie['id'] for movie in movies}
+        movies += [movie for movie in remote if movie.get('id') not in seen][:limit - len(movies)]
+        source = 'mixed' if local else 'tmdb'
+        total_pages = max(total_pages, min(data.get('total_pages') or page, MAX_SEARCH_PAGE))
+
+    results = schema.project_many(movies, only=only, image_sizes=image_sizes)
+    logger.info(f"電影搜尋: query='{query}', page={page}, source={source}, {len(results)} 部")
+    return Response({
+        'results': results,
+        'total_results': len(results),
+        'page': page,
+        'total_pages': total_pages,
+        'source': source,
+    })
+
 @api_view(['POST'])
 def set_refresh_token(request):
     try:
@@ -1137,7 +1229,7 @@ def smart_playlist_list(request):
     if request.method == 'GET':
         playlists = SmartPlaylist.objects.filter(
             Q(owner=request.user) | Q(is_public=True)
-        )
+        ).select_related('owner')
         serializer = SmartPlaylistSerializer(playlists, many=True)
         return Response(serializer.data)
     
@@ -1184,6 +1276,9 @@ def update_smart_playlist(playlist):
     根據智能播放列表的條件更新其內容
     """
     try:
+        spotify = spotify_client.get()
+        if not spotify:
+            raise SpotifyUnavailable("無法初始化 Spotify 客戶端")
         criteria = playlist.criteria
         # 使用 Spotify API 根據條件搜索歌曲
         tracks = spotify.search(
@@ -1192,18 +1287,12 @@ def update_smart_playlist(playlist):
             limit=50,
             market='TW'
         )
+        items = [track for track in tracks['tracks']['items'] if track]
         
-        # 清空現有曲目
-        playlist.tracks.all().delete()
-        
-        # 添加新曲目
-        for track in tracks['tracks']['items']:
-            PlaylistTrack.objects.create(
-                playlist=playlist,
-                track_id=track['id'],
-                added_by=playlist.owner
-            )
+        # 搜尋結果已包含完整歌曲資料，直接寫入本地資料
+        save_tracks(items)
         
+        playlist.track_ids = [track['id'] for track in items]
         playlist.last_updated = timezone.now()
         playlist.save()
         
@@ -1223,6 +1312,20 @@ def health_check(request):
         
         return Response({
             'status': 'healthy',
+            'caches': {
+                'spotify_search': spotify_search_cache.stats(),
+                'spotify_preview': spotify_preview_cache.stats(),
+                'tmdb_http': tmdb_http_cache.stats(),
+                'post_feed': feed_cache.post_feed_cache.stats(),
+            },
+            'circuits': {
+                'spotify': spotify_breaker.status(),
+                'tmdb': tmdb_breaker.status(),
+            },
+            'rate_limits': {
+                'spotify': spotify_scheduler.metrics(),
+            },
+            'outbound': outbound.metrics(),
             'timestamp': timezone.now().isoformat()
         })
     except Exception as e:
@@ -1237,35 +1340,6 @@ def health_check(request):
 @permission_classes([AllowAny])
 def tmdb_trending_movies(request):
     """
-    獲取 TMDB 熱門電影
+    獲取 TMDB 熱門電影（預先計算的快照）
     """
-    try:
-        api_key = os.getenv('TMDB_API_KEY')
-        if not api_key:
-            return Response(
-                {'error': 'TMDB API key not configured'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-
-        url = f'https://api.themoviedb.org/3/trending/movie/week'
-        params = {
-            'api_key': api_key,
-            'language': 'zh-TW'
-        }
-
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-
-        data = response.json()
-        return Response(data)
-
-    except requests.RequestException as e:
-        return Response(
-            {'error': f'Error fetching trending movies: {str(e)}'},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
-    except Exception as e:
-        return Response(
-            {'error': f'Unexpected error: {str(e)}'},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
+    return movie_snapshot_response(request, movie_snapshots.TRENDING)
@@ -72,6 +72,14 @@ CORS_ALLOW_HEADERS = [
     'access-control-allow-headers',
     'access-control-allow-methods',
     'access-control-allow-credentials',
+    'x-cache-bypass',
+]
+
+# 允許前端讀取的回應標頭
+CORS_EXPOSE_HEADERS = [
+    'x-cache',
+    'x-snapshot-age',
+    'x-snapshot-generated-at',
 ]
 
 # REST Framework 配置
@@ -121,6 +129,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'whitenoise',
     'rest_framework',
     'rest_framework_simplejwt',
@@ -321,3 +330,88 @@ CHANNEL_LAYERS = {
         },
     },
 }
+
+# Redis 快取配置（所有 worker 共用）
+REDIS_URL = os.getenv(
+    'REDIS_URL',
+    f"redis://{os.getenv('REDIS_HOST', 'redis')}:{os.getenv('REDIS_PORT', 6379)}/1",
+)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'sonicvision',
+    }
+}
+
+# Spotify 搜尋結果快取
+SPOTIFY_SEARCH_CACHE_TTL = int(os.getenv('SPOTIFY_SEARCH_CACHE_TTL', 600))  # 秒
+SPOTIFY_SEARCH_CACHE_MAX_ENTRIES = int(os.getenv('SPOTIFY_SEARCH_CACHE_MAX_ENTRIES', 5000))
+SPOTIFY_SEARCH_CACHE_STALE_TTL = int(os.getenv('SPOTIFY_SEARCH_CACHE_STALE_TTL', 60 * 60 * 6))  # Spotify 故障時可回傳的舊資料
+
+# Spotify 最新音樂快照
+SPOTIFY_NEW_RELEASES_MARKETS = os.getenv('SPOTIFY_NEW_RELEASES_MARKETS', 'TW')  # 允許查詢的市場，以逗號分隔
+SPOTIFY_NEW_RELEASES_REFRESH_INTERVAL = int(os.getenv('SPOTIFY_NEW_RELEASES_REFRESH_INTERVAL', 900))  # 超過此秒數在背景更新
+SPOTIFY_NEW_RELEASES_SNAPSHOT_TTL = int(os.getenv('SPOTIFY_NEW_RELEASES_SNAPSHOT_TTL', 60 * 60 * 24))
+
+# Spotify 預覽網址快取（無預覽的結果使用較短的 TTL）
+SPOTIFY_PREVIEW_CACHE_TTL = int(os.getenv('SPOTIFY_PREVIEW_CACHE_TTL', 60 * 60 * 24))
+SPOTIFY_PREVIEW_NEGATIVE_CACHE_TTL = int(os.getenv('SPOTIFY_PREVIEW_NEGATIVE_CACHE_TTL', 60 * 60))
+SPOTIFY_PREVIEW_CACHE_MAX_ENTRIES = int(os.getenv('SPOTIFY_PREVIEW_CACHE_MAX_ENTRIES', 50000))
+
+# Spotify access token 共用快取
+SPOTIFY_TOKEN_REFRESH_MARGIN = int(os.getenv('SPOTIFY_TOKEN_REFRESH_MARGIN', 300))  # 到期前幾秒開始背景換發
+SPOTIFY_TOKEN_CACHE_DIR = os.getenv('SPOTIFY_TOKEN_CACHE_DIR', '')  # Redis 無法使用時的備援目錄，預設為系統暫存目錄
+
+# 外部服務斷路器
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_BREAKER_FAILURE_THRESHOLD', 5))  # 視窗內連續失敗幾次後開啟
+CIRCUIT_BREAKER_FAILURE_WINDOW = int(os.getenv('CIRCUIT_BREAKER_FAILURE_WINDOW', 60))  # 秒
+CIRCUIT_BREAKER_RECOVERY_TIMEOUT = int(os.getenv('CIRCUIT_BREAKER_RECOVERY_TIMEOUT', 30))  # 開啟多久後允許試探請求
+
+# 對外 HTTP 請求（api/outbound.py）
+OUTBOUND_CONNECT_TIMEOUT = float(os.getenv('OUTBOUND_CONNECT_TIMEOUT', 3.05))  # 秒
+OUTBOUND_READ_TIMEOUT = float(os.getenv('OUTBOUND_READ_TIMEOUT', 10))  # 秒
+OUTBOUND_RETRIES = int(os.getenv('OUTBOUND_RETRIES', 2))
+OUTBOUND_BACKOFF_FACTOR = float(os.getenv('OUTBOUND_BACKOFF_FACTOR', 0.3))
+OUTBOUND_BACKOFF_JITTER = float(os.getenv('OUTBOUND_BACKOFF_JITTER', 0.3))  # 每次重試額外等待 0 到此秒數
+OUTBOUND_POOL_MAXSIZE = int(os.getenv('OUTBOUND_POOL_MAXSIZE', 20))  # 每個 host 的連線池大小
+
+# TMDB 回應快取（依端點設定 TTL，過期後保留 stale 期間供背景重新驗證）
+TMDB_CACHE_TTL_DEFAULT = int(os.getenv('TMDB_CACHE_TTL_DEFAULT', 60 * 10))
+TMDB_CACHE_TTL_TRENDING = int(os.getenv('TMDB_CACHE_TTL_TRENDING', 60 * 60))
+TMDB_CACHE_TTL_LISTS = int(os.getenv('TMDB_CACHE_TTL_LISTS', 60 * 60 * 3))
+TMDB_CACHE_TTL_MOVIE = int(os.getenv('TMDB_CACHE_TTL_MOVIE', 60 * 60 * 24))
+TMDB_CACHE_STALE_TTL = int(os.getenv('TMDB_CACHE_STALE_TTL', 60 * 60 * 24))
+TMDB_CACHE_MAX_ENTRIES = int(os.getenv('TMDB_CACHE_MAX_ENTRIES', 20000))
+
+# TMDB 精選電影：詳細資料並行查詢
+TMDB_DETAIL_CONCURRENCY = int(os.getenv('TMDB_DETAIL_CONCURRENCY', 6))
+TMDB_DETAIL_TIMEOUT = float(os.getenv('TMDB_DETAIL_TIMEOUT', 3))  # 單一請求逾時（秒）
+TMDB_FEATURED_DEADLINE = float(os.getenv('TMDB_FEATURED_DEADLINE', 5))  # 所有詳細資料的總等待時間（秒）
+
+# TMDB 熱門 / 即將上映電影快照（由 build_movie_snapshots 指令建立）
+TMDB_SNAPSHOT_LOCALES = os.getenv('TMDB_SNAPSHOT_LOCALES', 'zh-TW:TW')  # language:region，以逗號分隔
+TMDB_SNAPSHOT_TTL = int(os.getenv('TMDB_SNAPSHOT_TTL', 60 * 60 * 48))
+TMDB_SNAPSHOT_STALE_AFTER = int(os.getenv('TMDB_SNAPSHOT_STALE_AFTER', 60 * 60 * 2))  # 超過此秒數由請求觸發背景重建
+TMDB_SNAPSHOT_MAX_AGE = int(os.getenv('TMDB_SNAPSHOT_MAX_AGE', 60 * 10))  # Cache-Control max-age
+
+# Spotify 全域流量控制（所有 worker 共用同一個 token bucket）
+SPOTIFY_RATE_LIMIT_PER_SECOND = float(os.getenv('SPOTIFY_RATE_LIMIT_PER_SECOND', 10))
+SPOTIFY_RATE_LIMIT_BURST = int(os.getenv('SPOTIFY_RATE_LIMIT_BURST', 20))
+SPOTIFY_RATE_LIMIT_BACKGROUND_RESERVE = float(os.getenv('SPOTIFY_RATE_LIMIT_BACKGROUND_RESERVE', 0.3))  # 背景工作不可使用的額度比例，保留給使用者
+SPOTIFY_RATE_LIMIT_INTERACTIVE_MAX_WAIT = float(os.getenv('SPOTIFY_RATE_LIMIT_INTERACTIVE_MAX_WAIT', 2))  # 秒
+SPOTIFY_RATE_LIMIT_BACKGROUND_MAX_WAIT = float(os.getenv('SPOTIFY_RATE_LIMIT_BACKGROUND_MAX_WAIT', 30))  # 秒
+
+# 本地歌曲資料超過此秒數視為過舊，由 hydrator 重新向 Spotify 取得
+TRACK_CATALOG_MAX_AGE = int(os.getenv('TRACK_CATALOG_MAX_AGE', 60 * 60 * 24 * 7))
+
+# 社群貼文列表每篇貼文內嵌的最新評論數，完整評論由 /posts/<id>/comments/ 分頁取得
+POST_FEED_COMMENTS = int(os.getenv('POST_FEED_COMMENTS', 3))
+
+# 社群貼文列表共用快取（未登入版本，依分類與 cursor 分開；資料變更時以版本號失效）
+POST_FEED_CACHE_TTL = int(os.getenv('POST_FEED_CACHE_TTL', 300))  # 秒
+POST_FEED_CACHE_MAX_ENTRIES = int(os.getenv('POST_FEED_CACHE_MAX_ENTRIES', 2000))
+
+# 社群貼文熱門排序（由 update_hot_scores 指令計算，見 api/hot_ranking.py）
+POST_HOT_HALF_LIFE_HOURS = float(os.getenv('POST_HOT_HALF_LIFE_HOURS', 24))  # 互動的權重每經過此時數減半
+POST_HOT_COMMENT_WEIGHT = float(os.getenv('POST_HOT_COMMENT_WEIGHT', 2))  # 一則評論相當於幾個讚
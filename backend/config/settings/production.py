@@ -39,6 +39,7 @@ CORS_ALLOW_HEADERS = [
     'access-control-allow-headers',
     'access-control-allow-methods',
     'access-control-allow-credentials',
+    'x-cache-bypass',
 ]
 
 # 允許憑證
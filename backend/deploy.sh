@@ -23,13 +23,25 @@ python manage.py collectstatic --noinput
 # 數據庫遷移
 python manage.py migrate
 
+# 預先建立電影快照（失敗時由第一個請求即時建立）
+python manage.py build_movie_snapshots || true
+
+# 重新計算貼文熱門分數（之後由 sonicvision-hot-ranking 服務定期更新有新互動的貼文）
+python manage.py update_hot_scores --full || true
+
+# 安裝熱門分數更新服務
+sudo cp ../sonicvision-hot-ranking.service /etc/systemd/system/sonicvision-hot-ranking.service
+
 # 重啟服務
 sudo systemctl daemon-reload
+sudo systemctl enable sonicvision-hot-ranking
 sudo systemctl start sonicvision
+sudo systemctl restart sonicvision-hot-ranking
 sudo systemctl restart nginx
 
 # 檢查服務狀態
 sudo systemctl status sonicvision
+sudo systemctl status sonicvision-hot-ranking
 sudo systemctl status nginx
 
 # 檢查日誌
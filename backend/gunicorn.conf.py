@@ -38,4 +38,14 @@ def on_starting(server):
     服務啟動時的回調函數
     """
     # 確保日誌目錄存在
-    os.makedirs("/var/log/sonicvision", exist_ok=True) 
\ No newline at end of file
+    os.makedirs("/var/log/sonicvision", exist_ok=True)
+
+def post_worker_init(worker):
+    """
+    worker 啟動後在背景預先建立 Spotify / TMDB 客戶端，
+    不阻塞 worker 開始接收請求
+    """
+    import threading
+    from api.clients import warm_all
+
+    threading.Thread(target=warm_all, name='warm-clients', daemon=True).start()
@@ -56,6 +56,8 @@ export interface SpotifySearchResponse {
         items: SpotifyTrack[];
         total: number;
     };
+    // 下一頁的 cursor，沒有下一頁時為 null
+    next_cursor: string | null;
 }
 
 export const spotifyAPI = {
@@ -70,12 +72,34 @@ export const spotifyAPI = {
         return response.data.tracks.items;
     },
 
+    // 分頁搜索歌曲，帶入上一頁的 next_cursor 取得下一頁
+    searchTracksPage: async (query: string, cursor?: string | null): Promise<SpotifySearchResponse> => {
+        const response = await api.get<SpotifySearchResponse>('/api/spotify/search/', {
+            params: {
+                q: query,
+                type: 'track',
+                ...(cursor ? { cursor } : {})
+            }
+        });
+        return response.data;
+    },
+
     // 獲取歌曲預覽 URL
     getPreviewUrl: async (trackId: string): Promise<string> => {
         const response = await api.get<{ preview_url: string }>(`/api/spotify/preview/${trackId}/`);
         return response.data.preview_url;
     },
 
+    // 批次獲取歌曲預覽 URL（無預覽的歌曲為 null）
+    getPreviewUrls: async (trackIds: string[]): Promise<Record<string, string | null>> => {
+        const response = await api.get<{ previews: Record<string, string | null> }>('/api/spotify/previews/', {
+            params: {
+                ids: trackIds.join(',')
+            }
+        });
+        return response.data.previews;
+    },
+
     // 獲取熱門音樂
     getTrendingMusic: async (): Promise<SpotifyTrack[]> => {
         try {
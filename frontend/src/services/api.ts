@@ -563,15 +563,30 @@ export async function searchMusic(query: string): Promise<Music[]> {
 }
 
 export const community = {
-    getPosts: async () => {
+    getPosts: async (cursor?: string | null, category?: string, ordering?: 'hot') => {
         try {
-            const response = await apiClient.get('/posts/');
+            const params: Record<string, string> = {};
+            if (cursor) params.cursor = cursor;
+            if (category) params.category = category;
+            if (ordering) params.ordering = ordering;
+            const response = await apiClient.get('/posts/', { params });
             return response.data;
         } catch (error) {
             console.error('獲取貼文列表失敗:', error);
             throw error;
         }
     },
+    searchPosts: async (query: string, category?: string) => {
+        try {
+            const params: Record<string, string> = { q: query };
+            if (category) params.category = category;
+            const response = await apiClient.get('/posts/search/', { params });
+            return response.data;
+        } catch (error) {
+            console.error('搜尋貼文失敗:', error);
+            throw error;
+        }
+    },
     createPost: async (postData: NewPost) => {
         try {
             const response = await apiClient.post('/posts/', postData);
@@ -584,6 +599,17 @@ export const community = {
             throw error;
         }
     },
+    getLikeStatus: async (postIds: number[]) => {
+        try {
+            const response = await apiClient.get('/posts/like-status/', {
+                params: { ids: postIds.join(',') }
+            });
+            return response.data.likes as Record<string, { is_liked: boolean; likes_count: number }>;
+        } catch (error) {
+            console.error('獲取按讚狀態失敗:', error);
+            throw error;
+        }
+    },
     likePost: async (postId: number) => {
         try {
             const response = await apiClient.post(`/posts/${postId}/like/`);
@@ -608,6 +634,17 @@ export const community = {
             throw error;
         }
     },
+    getComments: async (postId: number, cursor?: string | null) => {
+        try {
+            const response = await apiClient.get(`/posts/${postId}/comments/`, {
+                params: cursor ? { cursor } : {}
+            });
+            return response.data;
+        } catch (error) {
+            console.error('獲取評論失敗:', error);
+            throw error;
+        }
+    },
     addComment: async (postId: number, content: string) => {
         try {
             const response = await apiClient.post(`/posts/${postId}/comments/`, { content });
@@ -5,6 +5,8 @@ interface TMDBMovie {
     id: number;
     title: string;
     poster_path: string;
+    // 後端已組好的海報網址（熱門電影）
+    poster_url?: string | null;
     vote_average: number;
     director?: string;
     release_date: string;
@@ -64,12 +66,14 @@ const tmdbClient = axios.create({
 
 export const getTrendingMovies = async (): Promise<Movie[]> => {
     try {
-        const response = await tmdbClient.get<TMDBResponse>('/tmdb/movies/trending/');
+        const response = await tmdbClient.get<TMDBResponse>('/tmdb/trending-movies/', {
+            params: { poster_size: 'w500' }
+        });
         return response.data.results.map(movie => ({
             id: movie.id,
             title: movie.title,
             overview: movie.overview,
-            posterPath: movie.poster_path ? `https://image.tmdb.org/t/p/w500${movie.poster_path}` : '/images/no-poster.png',
+            posterPath: movie.poster_url || '/images/no-poster.png',
             releaseDate: movie.release_date,
             voteAverage: movie.vote_average
         }));
@@ -81,19 +85,20 @@ export const getTrendingMovies = async (): Promise<Movie[]> => {
 
 export const searchMovies = async (query: string, page = 1): Promise<{ results: Movie[]; total_pages: number }> => {
     try {
-        const response = await tmdbClient.get<TMDBResponse>('/tmdb/search-movies/', {
-            params: { query, page }
+        // 先查本站的電影索引，本地結果不足一頁時後端才會向 TMDB 搜尋補足
+        const response = await tmdbClient.get<TMDBResponse>('/movies/search/', {
+            params: { q: query, page, poster_size: 'w500' }
         });
         return {
             results: response.data.results.map(movie => ({
                 id: movie.id,
                 title: movie.title,
                 overview: movie.overview,
-                posterPath: movie.poster_path ? `https://image.tmdb.org/t/p/w500${movie.poster_path}` : '/images/no-poster.png',
+                posterPath: movie.poster_url || '/images/no-poster.png',
                 releaseDate: movie.release_date,
                 voteAverage: movie.vote_average
             })),
-            total_pages: response.data.total_pages
+            total_pages: response.data.total_pages ?? 1
         };
     } catch (error) {
         console.error('搜索電影失敗:', error);
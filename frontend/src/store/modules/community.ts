@@ -5,15 +5,17 @@ import { ref } from 'vue';
 
 export const useCommunityStore = defineStore('community', () => {
     const posts = ref<Post[]>([]);
+    const nextCursor = ref<string | null>(null);
     const isLoading = ref(false);
     const error = ref<string | null>(null);
 
-    const fetchPosts = async () => {
+    const fetchPosts = async (more = false) => {
         isLoading.value = true;
         error.value = null;
         try {
-            const response = await community.getPosts();
-            posts.value = response.data;
+            const response = await community.getPosts(more ? nextCursor.value : null);
+            posts.value = more ? [...posts.value, ...response.results] : response.results;
+            nextCursor.value = response.next_cursor;
         } catch (err) {
             error.value = '獲取貼文列表失敗';
             console.error('獲取貼文列表失敗:', err);
@@ -66,6 +68,7 @@ export const useCommunityStore = defineStore('community', () => {
 
     return {
         posts,
+        nextCursor,
         isLoading,
         error,
         fetchPosts,
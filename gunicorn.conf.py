@@ -40,6 +40,16 @@ def on_starting(server):
     # 確保日誌目錄存在
     os.makedirs("/app/logs", exist_ok=True)
 
+def post_worker_init(worker):
+    """
+    worker 啟動後在背景預先建立 Spotify / TMDB 客戶端，
+    不阻塞 worker 開始接收請求
+    """
+    import threading
+    from api.clients import warm_all
+
+    threading.Thread(target=warm_all, name='warm-clients', daemon=True).start()
+
 # 守護進程模式
 daemon = True
 